@@ -0,0 +1,72 @@
+"""
+Compare the targeted parsers in wiki_parser against parsing whole pages with
+beautiful soup.
+
+Run from the top of the repository with:
+    python -m benchmarks.bench_parsing
+"""
+import re
+import timeit
+
+from bs4 import BeautifulSoup as soup
+
+from benchmarks.fixtures import film_article, load_fixture, remake_list_page
+from wiki_parser import (find_imdb_number, find_imdb_numbers,
+                         parse_remake_tables)
+
+
+def find_imdb_number_full_parse(page_html):
+    # the original approach: parse the whole page, then check every link
+    imdb_number = "NONE"
+    wiki_page = soup(page_html, "html.parser")
+    for link in wiki_page.find_all("a", class_="external text"):
+        if "https://www.imdb.com/title/" in link.get("href"):
+            imdb_number = re.search(r"\d+", link.get("href")).group()
+    return imdb_number
+
+
+def remake_tables_full_parse(page_html):
+    return soup(page_html, "html.parser").find_all("table")
+
+
+def best_time(function, repeat=5):
+    # best time of a single call, in milliseconds
+    return min(timeit.repeat(function, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    article = load_fixture("film_article.html", lambda: film_article(1234567))
+    list_page = load_fixture("remake_list.html", remake_list_page)
+    articles = [load_fixture("film_article_%d.html" % n,
+                             lambda n=n: film_article(n))
+                for n in range(32)]
+
+    # make sure the fast parsers give the same answers
+    assert find_imdb_number(article) == find_imdb_number_full_parse(article)
+    fast_tables = parse_remake_tables(list_page)
+    full_tables = remake_tables_full_parse(list_page)
+    assert [len(t.find_all("tr")) for t in fast_tables] == \
+        [len(t.find_all("tr")) for t in full_tables]
+
+    results = [
+        ("film article, full parse", best_time(
+            lambda: find_imdb_number_full_parse(article))),
+        ("film article, targeted", best_time(
+            lambda: find_imdb_number(article))),
+        ("remake list, full parse", best_time(
+            lambda: remake_tables_full_parse(list_page))),
+        ("remake list, tables only", best_time(
+            lambda: parse_remake_tables(list_page))),
+        ("32 articles, full parse", best_time(
+            lambda: [find_imdb_number_full_parse(a) for a in articles], 1)),
+        ("32 articles, targeted", best_time(
+            lambda: find_imdb_numbers(articles))),
+    ]
+    print("%-40s %10s" % ("benchmark", "time (ms)"))
+    for name, milliseconds in results:
+        print("%-40s %10.2f" % (name, milliseconds))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Measure the scraper against a local fake server, and clean_dataframe,
+find_popular_genres and every graph on synthetic datasets of each size.
+
+Run from the top of the repository with:
+    python -m benchmarks.bench_suite --sizes 1000,100000 --save base.json
+and later compare a new run with the saved one:
+    python -m benchmarks.bench_suite --sizes 1000,100000 --compare base.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import time
+
+import matplotlib
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_parsing import best_time
+from benchmarks.fake_server import FakeServer
+from benchmarks.synthetic import make_movie_data
+from graph_data import find_popular_genres
+from movie_scraper import (clean_dataframe, get_imdb_numbers, get_movie_data,
+                           get_wiki_links)
+from movie_store import MovieStore
+from report import GRAPHS, SCATTER_GRAPHS
+
+
+def scrape(server, max_workers=8):
+    # every step of the scraper, from the remake lists to the movie table
+    with server.fetcher(max_workers=max_workers) as fetcher:
+        wiki_dataframe = clean_dataframe(get_wiki_links(fetcher))
+        imdb_dataframe = get_imdb_numbers(wiki_dataframe, fetcher)
+    return clean_dataframe(get_movie_data(
+        imdb_dataframe, store=MovieStore(), max_workers=max_workers,
+        fetch=server.fetch_record))
+
+
+def draw(name, movie_data, options):
+    """
+    Draw one graph on its own figure and save it as a png in memory, which
+    is when matplotlib does most of the drawing.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    import graph_data
+
+    figure = Figure(figsize=(10, 6))
+    FigureCanvasAgg(figure)
+    getattr(graph_data, GRAPHS[name])(movie_data, ax=figure.subplots(),
+                                      **options)
+    figure.savefig(io.BytesIO(), format="png")
+
+
+def run_benchmarks(sizes, scrape_pairs=500, latency=0.005, repeat=3,
+                   mode="points", max_points=None):
+    """
+    Run every benchmark.
+
+    Args:
+        sizes::list of int
+            Numbers of remake pairs in the synthetic datasets.
+        scrape_pairs::int
+            Number of remake pairs served to the scraper. 0 skips the
+            scraper.
+        latency::float
+            Seconds the fake server waits before every response.
+        repeat::int
+            Times each benchmark is run. The best time is kept.
+        mode::str
+            How the scatter plots draw the movies, "points" or "density".
+        max_points::int
+            Most movies drawn by the scatter plots in "points" mode.
+    Returns:
+        results::list of dict
+            One result per benchmark and size, with the keys "benchmark",
+            "size" and "seconds". The scraper's result also has
+            "pairs_per_second".
+    """
+    results = []
+    if scrape_pairs:
+        movie_data = make_movie_data(scrape_pairs)
+        with FakeServer(movie_data, latency=latency) as server:
+            start = time.perf_counter()
+            scraped = scrape(server)
+            seconds = time.perf_counter() - start
+        assert len(scraped) == scrape_pairs
+        results.append({"benchmark": "scraper", "size": scrape_pairs,
+                        "seconds": seconds,
+                        "pairs_per_second": scrape_pairs / seconds})
+
+    matplotlib.use("Agg")
+    # draw every graph once first, so the first one timed doesn't pay for
+    # importing and loading fonts
+    warm_up = clean_dataframe(make_movie_data(100)).to_numpy()
+    for name in GRAPHS:
+        draw(name, warm_up, {})
+
+    for size in sizes:
+        raw_data = make_movie_data(size, missing=0.05)
+        movie_data = clean_dataframe(raw_data).to_numpy()
+        benchmarks = [
+            ("clean_dataframe", lambda: clean_dataframe(raw_data)),
+            ("find_popular_genres",
+             lambda: find_popular_genres(movie_data, 8))]
+        for name in GRAPHS:
+            options = {"mode": mode, "max_points": max_points} \
+                if name in SCATTER_GRAPHS else {}
+            benchmarks.append((GRAPHS[name],
+                               lambda name=name, options=options:
+                               draw(name, movie_data, options)))
+        for name, function in benchmarks:
+            results.append({"benchmark": name, "size": size,
+                            "seconds": best_time(function, repeat) / 1000})
+        del raw_data, movie_data
+    return results
+
+
+def environment():
+    # what the results depend on besides the code
+    return {"python": platform.python_version(), "numpy": np.__version__,
+            "pandas": pd.__version__, "matplotlib": matplotlib.__version__,
+            "machine": platform.machine(), "cpus": os.cpu_count(),
+            "date": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Compare results with the results of an earlier run.
+
+    Args:
+        results::list of dict
+            Results of run_benchmarks.
+        baseline::list of dict
+            Results of an earlier run.
+        tolerance::float
+            How much slower a benchmark can get before it counts as a
+            regression. Default is 20%.
+    Returns:
+        rows::list of tuple
+            The benchmark, size, earlier and new seconds, and the ratio of
+            new to earlier time, for every benchmark in both runs.
+        regressions::list of tuple
+            The rows that got slower by more than tolerance.
+    """
+    earlier = {(result["benchmark"], result["size"]): result["seconds"]
+               for result in baseline}
+    rows = []
+    for result in results:
+        key = (result["benchmark"], result["size"])
+        if key in earlier:
+            rows.append(key + (earlier[key], result["seconds"],
+                               result["seconds"] / earlier[key]))
+    regressions = [row for row in rows if row[4] > 1 + tolerance]
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        "\n\n")[0])
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma separated numbers of remake pairs "
+                             "(default 1000,10000,100000)")
+    parser.add_argument("--scrape-pairs", type=int, default=500,
+                        help="remake pairs served to the scraper, 0 to skip "
+                             "it (default 500)")
+    parser.add_argument("--latency", type=float, default=0.005,
+                        help="seconds the fake server waits before every "
+                             "response (default 0.005)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="times each benchmark is run (default 3)")
+    parser.add_argument("--mode", default="points",
+                        choices=["points", "density"],
+                        help="how the scatter plots draw the movies")
+    parser.add_argument("--max-points", type=int, default=None,
+                        help="most movies drawn by the scatter plots")
+    parser.add_argument("--save", help="file to save the results in")
+    parser.add_argument("--compare",
+                        help="file of earlier results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="slow down that counts as a regression "
+                             "(default 0.2)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    results = run_benchmarks(sizes, args.scrape_pairs, args.latency,
+                             args.repeat, args.mode, args.max_points)
+    print("%-40s %10s %10s" % ("benchmark", "size", "time (s)"))
+    for result in results:
+        print("%-40s %10d %10.3f" % (result["benchmark"], result["size"],
+                                     result["seconds"]))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f,
+                      indent=1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        rows, regressions = compare(results, baseline, args.tolerance)
+        print()
+        print("%-40s %10s %10s %10s %7s" % ("benchmark", "size", "before",
+                                             "after", "ratio"))
+        for row in rows:
+            print("%-40s %10d %10.3f %10.3f %7.2f%s" % (
+                row + (" slower" if row in regressions else "",)))
+        if regressions:
+            raise SystemExit("%d benchmarks got slower" % len(regressions))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Serve generated "List of film remakes" pages, film articles and IMDb records
+from a local HTTP server, so the scraper can be measured without touching
+Wikipedia or IMDb.
+"""
+import json
+import multiprocessing
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.fixtures import ROW, film_article
+from movie_scraper import BASE_URL, MOVIE_COLUMNS, REMAKE_LIST_URLS
+from page_fetcher import PageFetcher, make_session
+
+FILM_PATH = re.compile(r"/wiki/Film_(\d+)(_remake)?$")
+TITLE_PATH = re.compile(r"/title/tt(\d+)/$")
+
+
+def imdb_number(row, remake=False):
+    # originals and remakes take turns, so every movie has its own number
+    return 2 * row + remake
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep connections alive between requests, like the real servers
+    protocol_version = "HTTP/1.1"
+    # headers and body are sent separately, which would otherwise wait for
+    # the client to acknowledge the headers
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        site = self.server.site
+        if site.latency:
+            time.sleep(site.latency)
+        body, content_type = site.page(self.path)
+        self.send_response(200 if body is not None else 404)
+        body = body.encode("utf-8") if body is not None else b""
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Site:
+    # the pages served for a table of movies
+    def __init__(self, movie_data, latency, paragraphs, rows):
+        self.movie_data = movie_data
+        self.latency = latency
+        self.paragraphs = paragraphs
+        self.rows = rows
+        self._list_pages = {}
+
+    def _list_page(self, half):
+        # pairs of the first or second list page, made once
+        if half not in self._list_pages:
+            middle = (len(self.movie_data) + 1) // 2
+            start, stop = (0, middle) if half == 0 else \
+                (middle, len(self.movie_data))
+            years = self.movie_data[[MOVIE_COLUMNS[1],
+                                     MOVIE_COLUMNS[6]]].to_numpy()
+            parts = ["<html><body><table class=\"box\"><tr><td>Notice</td>"
+                     "</tr></table>"]
+            for table in range(start, stop, self.rows):
+                parts.append("<table class=\"wikitable\"><tr><th>Original</th>"
+                             "<th>Remake</th></tr>")
+                for row in range(table, min(table + self.rows, stop)):
+                    parts.append(ROW.format(row, *years[row]))
+                parts.append("</table>")
+            parts.append("</body></html>")
+            self._list_pages[half] = "".join(parts)
+        return self._list_pages[half]
+
+    def _record(self, number):
+        row, remake = divmod(number, 2)
+        if row >= len(self.movie_data):
+            return None
+        movie = self.movie_data.iloc[row, 5 * remake:5 * remake + 5]
+        title, year, genres, rating, votes = movie.tolist()
+        return {"title": title, "year": int(year), "genres": list(genres),
+                "rating": float(rating), "votes": int(votes)}
+
+    def page(self, path):
+        """
+        Args:
+            path::str
+                Path of the requested url.
+        Returns:
+            body::str
+                Body of the page, or None if there is no such page.
+            content_type::str
+        """
+        for half, url in enumerate(REMAKE_LIST_URLS):
+            if path == url[len(BASE_URL):]:
+                return self._list_page(half), "text/html; charset=utf-8"
+        match = FILM_PATH.match(path)
+        if match and int(match.group(1)) < len(self.movie_data):
+            number = imdb_number(int(match.group(1)), bool(match.group(2)))
+            return film_article(number, self.paragraphs), \
+                "text/html; charset=utf-8"
+        match = TITLE_PATH.match(path)
+        if match:
+            record = self._record(int(match.group(1)))
+            if record is not None:
+                return json.dumps(record), "application/json"
+        return None, "text/plain"
+
+
+def _serve(site, connection):
+    # run in the server's own process, so serving pages doesn't take time
+    # away from the scraper being measured
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.site = site
+    connection.send(server.server_address[1])
+    server.serve_forever()
+
+
+class FakeServer:
+    """
+    Local stand-in for Wikipedia and IMDb, serving the movies of a table
+    from its own process.
+
+    The remake pairs are split between the two list pages, in tables of up to
+    rows pairs each. Pair n links to the articles /wiki/Film_n and
+    /wiki/Film_n_remake, which link to the IMDb numbers given by
+    imdb_number. IMDb records are served as JSON from /title/tt<number>/.
+
+    Args:
+        movie_data::pandas DataFrame
+            The movie data, with the 10 columns in MOVIE_COLUMNS.
+        latency::float
+            Seconds the server waits before every response.
+        paragraphs::int
+            Number of paragraphs in each film article.
+        rows::int
+            Most pairs in each table of a list page.
+    """
+
+    def __init__(self, movie_data, latency=0.0, paragraphs=40, rows=150):
+        site = _Site(movie_data, latency, paragraphs, rows)
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(target=_serve,
+                                                args=(site, sender),
+                                                daemon=True)
+        self._process.start()
+        self.url = "http://127.0.0.1:%d" % receiver.recv()
+        self._local = threading.local()
+
+    def fetcher(self, **kwargs):
+        """
+        Make a PageFetcher that downloads Wikipedia pages from this server.
+        Pages keep their Wikipedia urls, so the scraper can't tell the
+        difference.
+
+        Args:
+            **kwargs
+                Arguments of PageFetcher.
+        Returns:
+            fetcher::PageFetcher
+        """
+        return _LocalFetcher(self.url, **kwargs)
+
+    def fetch_record(self, imdb_number):
+        """
+        Look up a movie on this server instead of IMDb. Can be passed to
+        get_movie_data as fetch.
+
+        Args:
+            imdb_number::str
+                IMDb number of the movie.
+        Returns:
+            record::dict
+                The movie's record, or None if there is no such movie.
+        """
+        if not hasattr(self._local, "session"):
+            self._local.session = make_session()
+        response = self._local.session.get(
+            "%s/title/tt%s/" % (self.url, imdb_number))
+        if response.status_code != 200:
+            return None
+        return response.json()
+
+    def close(self):
+        self._process.terminate()
+        self._process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _LocalFetcher(PageFetcher):
+    # sends requests for Wikipedia pages to the fake server
+    def __init__(self, url, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+
+    def _send(self, url, headers):
+        if url.startswith(BASE_URL):
+            url = self.url + url[len(BASE_URL):]
+        return super()._send(url, headers)
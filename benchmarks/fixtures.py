@@ -0,0 +1,70 @@
+import os
+import random
+
+# saved pages live next to this file
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "fixtures")
+
+PARAGRAPH = ("<p>The film was a critical and commercial success, and is "
+             "regarded as one of the <a href=\"/wiki/Genre_{0}\" title=\""
+             "Genre\">best films</a> of its decade.<sup class=\"reference\">"
+             "<a href=\"#cite_note-{0}\">[{0}]</a></sup></p>\n")
+REFERENCE = ("<li id=\"cite_note-{0}\"><cite><a rel=\"nofollow\" "
+             "class=\"external text\" href=\"https://www.example.com/review/"
+             "{0}\">Review {0}</a></cite></li>\n")
+ROW = ("<tr><td><i><a href=\"/wiki/Film_{0}\" title=\"Film {0}\">Film {0}</a>"
+       "</i> ({1})</td><td><i><a href=\"/wiki/Film_{0}_remake\" title=\""
+       "Film {0} remake\">Film {0}</a></i> ({2})</td></tr>\n")
+
+
+def film_article(seed, paragraphs=400, references=150):
+    """
+    Make html shaped like a Wikipedia film article: a long body full of
+    internal links, a reference list of external links, and an IMDb link in
+    the external links section near the bottom.
+    """
+    rng = random.Random(seed)
+    parts = ["<html><head><title>Film</title></head><body>",
+             "<table class=\"infobox\"><tr><td>Directed by</td></tr></table>"]
+    parts += [PARAGRAPH.format(rng.randrange(10000))
+              for paragraph in range(paragraphs)]
+    parts.append("<ol class=\"references\">")
+    parts += [REFERENCE.format(n) for n in range(references)]
+    parts.append("</ol><h2>External links</h2><ul><li><a rel=\"nofollow\" "
+                 "class=\"external text\" href=\"https://www.imdb.com/title/"
+                 "tt%07d/\">Film</a> at IMDb</li></ul>" % seed)
+    parts.append("<div class=\"navbox\">%s</div></body></html>"
+                 % "".join("<a href=\"/wiki/Nav_%d\">Nav</a>" % n
+                           for n in range(300)))
+    return "".join(parts)
+
+
+def remake_list_page(letters=13, rows=150):
+    """
+    Make html shaped like a "List of film remakes" page: an introduction
+    table followed by one table of remakes per letter.
+    """
+    parts = ["<html><body><table class=\"box\"><tr><td>Notice</td></tr>"
+             "</table>"]
+    for letter in range(letters):
+        parts.append("<h2>%s</h2><p>Intro with <a href=\"/wiki/X\">links</a>"
+                     "</p><table class=\"wikitable\"><tr><th>Original</th>"
+                     "<th>Remake</th></tr>" % chr(65 + letter))
+        parts += [ROW.format(letter * rows + row, 1930 + row % 60,
+                             1960 + row % 60) for row in range(rows)]
+        parts.append("</table>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def load_fixture(name, make):
+    """
+    Read a saved fixture page, making and saving it first if needed.
+    """
+    path = os.path.join(FIXTURE_DIR, name)
+    if not os.path.exists(path):
+        os.makedirs(FIXTURE_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(make())
+    with open(path, encoding="utf-8") as f:
+        return f.read()
@@ -0,0 +1,115 @@
+"""
+Make synthetic movie remake datasets of any size, shaped like the scraped
+data.
+"""
+import numpy as np
+import pandas as pd
+
+from movie_scraper import MOVIE_COLUMNS
+
+# rough share of each genre among the genres of feature films on IMDb
+GENRE_WEIGHTS = {"Drama": 0.22, "Comedy": 0.13, "Romance": 0.07,
+                 "Thriller": 0.06, "Action": 0.06, "Crime": 0.055,
+                 "Horror": 0.05, "Adventure": 0.04, "Mystery": 0.03,
+                 "Family": 0.025, "Fantasy": 0.025, "Sci-Fi": 0.025,
+                 "Biography": 0.02, "History": 0.02, "Music": 0.02,
+                 "War": 0.015, "Musical": 0.015, "Animation": 0.015,
+                 "Western": 0.015, "Sport": 0.01, "Documentary": 0.01,
+                 "Film-Noir": 0.005}
+# share of movies with 1, 2 and 3 genres. IMDb lists at most 3
+GENRE_COUNTS = [0.3, 0.35, 0.35]
+# share of remakes that keep the genres of their original
+SAME_GENRES = 0.7
+
+# movies made in one go, which bounds the memory used while drawing genres
+CHUNK_SIZE = 10 ** 6
+
+
+def _draw_genres(rng, rows):
+    """
+    Draw 1 to 3 different genres for each of rows movies, with popular genres
+    drawn more often. Returns the genre codes, sorted by how early each genre
+    was drawn, and how many of them each movie has.
+    """
+    weights = np.array(list(GENRE_WEIGHTS.values()))
+    log_weights = np.log(weights / weights.sum()).astype(np.float32)
+    codes = np.empty((rows, len(GENRE_COUNTS)), dtype=np.int8)
+    for start in range(0, rows, CHUNK_SIZE):
+        stop = min(start + CHUNK_SIZE, rows)
+        # the largest weights plus gumbel noise are a weighted draw without
+        # replacement
+        keys = log_weights + rng.gumbel(
+            size=(stop - start, len(weights))).astype(np.float32)
+        codes[start:stop] = np.argsort(-keys, axis=1)[:, :len(GENRE_COUNTS)]
+    counts = rng.choice(np.arange(1, len(GENRE_COUNTS) + 1), size=rows,
+                        p=GENRE_COUNTS)
+    return codes, counts
+
+
+def _genre_lists(codes, counts):
+    names = np.array(list(GENRE_WEIGHTS), dtype=object)[codes].tolist()
+    return [genres[:count] for genres, count in zip(names, counts.tolist())]
+
+
+def make_movie_data(pairs, seed=0, missing=0.0):
+    """
+    Make a random table of remakes in the same layout as the scraped data.
+
+    Genres follow their share on IMDb and most remakes keep the genres of
+    their original. Originals come out between 1910 and 2015, remakes a few
+    to several decades later, and remakes are rated a little lower on
+    average, more so the longer after the original they were made. Votes
+    follow a long tailed distribution.
+
+    A table of 10**7 pairs takes several GB of memory.
+
+    Args:
+        pairs::int
+            Number of original and remake pairs.
+        seed::int
+            Seed of the random data. The same seed gives the same table.
+        missing::float
+            Share of rows with a "NONE" title or a missing rating, like rows
+            the scraper couldn't complete.
+    Returns:
+        movie_data::pandas DataFrame
+            The movie data, with the 10 columns in MOVIE_COLUMNS.
+    """
+    rng = np.random.default_rng(seed)
+    original_year = np.clip(rng.normal(1965, 22, pairs), 1910, 2015)
+    original_year = original_year.astype(np.int64)
+    gap = 1 + rng.gamma(2.0, 12.0, pairs).astype(np.int64)
+    remake_year = np.minimum(original_year + gap, 2025)
+
+    original_rating = np.clip(rng.normal(6.6, 1.0, pairs), 1, 10)
+    remake_rating = original_rating - 0.3 - 0.01 * (remake_year
+                                                     - original_year)
+    remake_rating = np.clip(remake_rating + rng.normal(0, 1.0, pairs), 1, 10)
+
+    original_codes, original_counts = _draw_genres(rng, pairs)
+    remake_codes, remake_counts = _draw_genres(rng, pairs)
+    same = rng.random(pairs) < SAME_GENRES
+    remake_codes[same] = original_codes[same]
+    remake_counts[same] = original_counts[same]
+
+    titles = ["Film %d" % n for n in range(pairs)]
+    movie_data = pd.DataFrame({
+        MOVIE_COLUMNS[0]: pd.Series(titles, dtype=object),
+        MOVIE_COLUMNS[1]: original_year,
+        MOVIE_COLUMNS[2]: _genre_lists(original_codes, original_counts),
+        MOVIE_COLUMNS[3]: original_rating.round(1),
+        MOVIE_COLUMNS[4]: rng.lognormal(7, 1.8, pairs).astype(np.int64) + 5,
+        MOVIE_COLUMNS[5]: pd.Series(titles, dtype=object),
+        MOVIE_COLUMNS[6]: remake_year,
+        MOVIE_COLUMNS[7]: _genre_lists(remake_codes, remake_counts),
+        MOVIE_COLUMNS[8]: remake_rating.round(1),
+        MOVIE_COLUMNS[9]: rng.lognormal(6.5, 1.8, pairs).astype(np.int64) + 5,
+    })
+
+    if missing:
+        rows = np.flatnonzero(rng.random(pairs) < missing)
+        # half lost their title, half their rating
+        movie_data.loc[rows[::2], MOVIE_COLUMNS[5]] = "NONE"
+        movie_data.loc[rows[1::2], MOVIE_COLUMNS[3]] = np.nan
+    return movie_data
+
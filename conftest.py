@@ -0,0 +1,158 @@
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import matplotlib
+import numpy as np
+import pytest
+
+from movie_store import MovieStore
+from page_fetcher import Page
+
+# draw graphs without a display. Set before any test imports pyplot
+matplotlib.use("Agg")
+
+WIKI = "https://en.wikipedia.org"
+LIST_URLS = [WIKI + "/wiki/List_of_film_remakes_(A%E2%80%93M)",
+             WIKI + "/wiki/List_of_film_remakes_(N%E2%80%93Z)"]
+ROW = '<tr><td><a href="/wiki/Film_{0}">A</a></td>' \
+      '<td><a href="/wiki/Film_{1}">B</a></td></tr>'
+ARTICLE = '<a class="external text" href="https://www.imdb.com/title/tt{0}/">'
+
+GENRES = ["Drama", "Comedy", "Horror", "Crime", "Romance", "Sci-Fi", "War"]
+
+
+def _make_movie_data(rows=300, seed=0):
+    # random dataset in the same layout as movie_data.pkl
+    rng = random.Random(seed)
+    data = []
+    for row in range(rows):
+        data.append(["Original", rng.randint(1920, 1990),
+                     rng.sample(GENRES, rng.randint(1, 3)),
+                     rng.randint(10, 100) / 10, 100,
+                     "Remake", rng.randint(1990, 2020),
+                     rng.sample(GENRES, rng.randint(1, 3)),
+                     rng.randint(10, 100) / 10, 100])
+    return np.array(data, dtype=object)
+
+
+@pytest.fixture
+def make_movie_data():
+    # make_movie_data(rows=300, seed=0) makes a random movie data array
+    return _make_movie_data
+
+
+def _list_page(pairs):
+    rows = "".join(ROW.format(*pair) for pair in pairs)
+    return "<table></table><table><tr><th>Film</th></tr>%s</table>" % rows
+
+
+class FakeFetcher:
+    # serves list pages of remake pairs and an article for every film. The
+    # articles of the films in missing can't be downloaded, and every article
+    # takes delay seconds
+    def __init__(self, pairs, missing=(), delay=0.0):
+        self.pairs = pairs
+        self.missing = set(missing)
+        self.delay = delay
+        self.requested = []
+
+    def get(self, url):
+        self.requested.append(url)
+        if url == LIST_URLS[0]:
+            return Page(url, 200, _list_page(self.pairs))
+        if url == LIST_URLS[1]:
+            return Page(url, 200, _list_page([]))
+        if self.delay:
+            time.sleep(self.delay)
+        film = url.rsplit("_", 1)[1]
+        if int(film) in self.missing:
+            return Page(url, 404, "")
+        return Page(url, 200, ARTICLE.format(film))
+
+    def get_many(self, urls):
+        return {url: self.get(url) for url in dict.fromkeys(urls)}
+
+
+class FakeStore(MovieStore):
+    # looks up every movie locally, skipping movies without an imdb number
+    # like MovieStore. Crashes once crash_after movies were looked up, and
+    # takes delay seconds to answer the first lookup
+    def __init__(self, crash_after=None, delay=0.0):
+        super().__init__()
+        self.crash_after = crash_after
+        self.delay = delay
+        self.looked_up = []
+        self.calls = 0
+
+    def lookup(self, imdb_numbers, **kwargs):
+        imdb_numbers = [n for n in imdb_numbers if n != "NONE"]
+        if self.crash_after is not None and \
+                len(self.looked_up) >= self.crash_after:
+            raise ConnectionError("throttled")
+        if self.delay and not self.calls:
+            time.sleep(self.delay)
+        self.calls += 1
+        self.looked_up += imdb_numbers
+        return {n: {"title": "Film " + n, "year": 1900 + int(n),
+                    "genres": ["Drama"], "rating": 5.0, "votes": 10}
+                for n in imdb_numbers}
+
+
+@pytest.fixture
+def fake_fetcher():
+    # fake_fetcher(pairs, missing=(), delay=0.0) makes a FakeFetcher
+    return FakeFetcher
+
+
+@pytest.fixture
+def fake_store():
+    # fake_store(crash_after=None, delay=0.0) makes a FakeStore
+    return FakeStore
+
+
+class _ETagHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = self.server.pages[self.path].encode()
+        etag = '"%d"' % hash(body)
+        if self.headers.get("If-None-Match") == etag:
+            self.server.responses.append(304)
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.server.responses.append(200)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ETagServer:
+    # stand-in server of the pages in pages, whose ETag changes with their
+    # contents. The status of every response is added to responses
+    def __init__(self):
+        self.pages = {}
+        self.responses = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _ETagHandler)
+        self._server.pages = self.pages
+        self._server.responses = self.responses
+        threading.Thread(target=self._server.serve_forever,
+                         daemon=True).start()
+        self.url = "http://127.0.0.1:%d" % self._server.server_address[1]
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def server():
+    server = ETagServer()
+    yield server
+    server.close()
@@ -0,0 +1,340 @@
+"""
+Save movie data tables as folders of columns, and load them again.
+
+Convert a movie_data.pkl from the original scraper with:
+    python dataset_io.py ./movie_data.pkl ./movie_data
+"""
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from genre_index import GenreIndex
+from movie_scraper import MOVIE_COLUMNS
+
+FORMAT_VERSION = 1
+
+# file name and kind of data of each column of the movie table
+COLUMN_FILES = ["original_title", "original_year", "original_genres",
+                "original_rating", "original_votes", "remake_title",
+                "remake_year", "remake_genres", "remake_rating",
+                "remake_votes"]
+COLUMN_KINDS = ["text", "Int16", "genres", "float32", "Int32"] * 2
+
+
+def _load_array(path, name, mmap):
+    return np.load(os.path.join(path, name + ".npy"),
+                   mmap_mode="r" if mmap else None)
+
+
+def save_movie_table(movie_data, path):
+    """
+    Save a movie data table as a folder of columns that can be memory mapped.
+
+    Every column is saved as its own numpy file, so a column can be read
+    without reading the rest of the table:
+        years, ratings and votes are arrays of numbers, with a separate array
+        marking missing values if there are any.
+        titles are a single array of utf-8 bytes, plus the offset where each
+        title starts.
+        genres are a single array of genre codes, plus the offset where each
+        movie's genres start. The genre names are in meta.json.
+
+    Args:
+        movie_data::pandas DataFrame
+            The movie data, with the 10 columns in MOVIE_COLUMNS.
+        path::str
+            Folder to save the table in. Anything already there is replaced,
+            but only once the new table is saved in full.
+    """
+    with MovieTableWriter(path) as writer:
+        writer.append(movie_data)
+
+
+class MovieTableWriter:
+    """
+    Save a movie data table in the format of save_movie_table a part at a
+    time, so the whole table never has to be in memory.
+
+    Each part is added to the end of the column files in a temporary folder,
+    which replaces the folder at path once the writer is closed. Leaving a
+    with block because of an error throws the unfinished table away instead.
+
+    Args:
+        path::str
+            Folder to save the table in. Anything already there is replaced,
+            but only once the new table is saved in full.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._temp_path = path.rstrip("/\\") + ".tmp"
+        shutil.rmtree(self._temp_path, ignore_errors=True)
+        os.makedirs(self._temp_path)
+        # genres of originals and remakes share the same codes
+        self._genre_names = {}
+        # kind of number in each array, and where the last title or genre
+        # list of each column ends
+        self._dtypes = {}
+        self._ends = {}
+        self._missing = set()
+        for name, kind in zip(COLUMN_FILES, COLUMN_KINDS):
+            if kind in ["text", "genres"]:
+                self._ends[name] = 0
+                self._write(name + ".offsets", np.zeros(1, dtype=np.int64))
+
+    def _write(self, name, values):
+        # add values to the end of an array that is saved as raw bytes
+        # until the table is closed
+        self._dtypes[name] = values.dtype
+        with open(os.path.join(self._temp_path, name + ".raw"), "ab") as f:
+            f.write(values.tobytes())
+
+    def _write_offsets(self, name, lengths):
+        offsets = self._ends[name] + np.cumsum(lengths, dtype=np.int64)
+        self._write(name + ".offsets", offsets)
+        if len(offsets):
+            self._ends[name] = int(offsets[-1])
+
+    def append(self, movie_data):
+        """
+        Add rows to the end of the table.
+
+        Args:
+            movie_data::pandas DataFrame
+                The rows, with the 10 columns in MOVIE_COLUMNS.
+        """
+        for column, name, kind in zip(MOVIE_COLUMNS, COLUMN_FILES,
+                                      COLUMN_KINDS):
+            values = movie_data[column]
+            if kind == "text":
+                values = values.astype("string")
+                missing = values.isna().to_numpy()
+                encoded = [b"" if is_missing else text.encode("utf-8")
+                           for text, is_missing in zip(values, missing)]
+                self._write(name + ".bytes",
+                            np.frombuffer(b"".join(encoded), dtype=np.uint8))
+                self._write_offsets(name, [len(text) for text in encoded])
+            elif kind == "genres":
+                missing = values.isna().to_numpy()
+                genre_lists = [[] if is_missing else genres
+                               for genres, is_missing in zip(values, missing)]
+                genre_names = self._genre_names
+                codes = [genre_names.setdefault(genre, len(genre_names))
+                         for genres in genre_lists for genre in genres]
+                self._write(name + ".codes", np.array(codes, dtype=np.int16))
+                self._write_offsets(name, [len(genres)
+                                           for genres in genre_lists])
+            else:
+                values = pd.array(values, dtype=kind)
+                if kind == "float32":
+                    numbers = values.to_numpy(dtype=np.float32,
+                                              na_value=np.nan)
+                    missing = np.isnan(numbers)
+                else:
+                    numbers = values.to_numpy(dtype=kind.lower(), na_value=0)
+                    missing = values.isna()
+                self._write(name, numbers)
+            self._write(name + ".missing", np.asarray(missing, dtype=bool))
+            if missing.any():
+                self._missing.add(name)
+        self.rows += len(movie_data)
+
+    def close(self):
+        """
+        Finish the table and move it into place.
+        """
+        for name, dtype in self._dtypes.items():
+            raw_path = os.path.join(self._temp_path, name + ".raw")
+            # columns without missing values have no missing array
+            if name.endswith(".missing") and \
+                    name[:-len(".missing")] not in self._missing:
+                os.remove(raw_path)
+                continue
+            header = {"descr": np.lib.format.dtype_to_descr(dtype),
+                      "fortran_order": False,
+                      "shape": (os.path.getsize(raw_path) // dtype.itemsize,)}
+            with open(os.path.join(self._temp_path, name + ".npy"),
+                      "wb") as f:
+                np.lib.format.write_array_header_1_0(f, header)
+                with open(raw_path, "rb") as raw:
+                    shutil.copyfileobj(raw, f)
+            os.remove(raw_path)
+
+        with open(os.path.join(self._temp_path, "meta.json"), "w") as f:
+            json.dump({"version": FORMAT_VERSION, "rows": self.rows,
+                       "columns": MOVIE_COLUMNS,
+                       "genres": list(self._genre_names)}, f)
+
+        # swap the finished folder into place
+        replace_folder(self._temp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        if error_type is None:
+            self.close()
+        else:
+            shutil.rmtree(self._temp_path, ignore_errors=True)
+
+
+def replace_folder(new_path, path):
+    """
+    Move a finished folder into place, replacing the folder at path.
+
+    The old folder is moved aside to path + ".old" before the new one is
+    moved in, and only deleted afterwards. Calling replace_folder again
+    after a crash part way through finishes the job.
+
+    Args:
+        new_path::str
+            Folder to move. Nothing is moved if it doesn't exist.
+        path::str
+            Where to move it.
+    """
+    old_path = path.rstrip("/\\") + ".old"
+    if os.path.exists(new_path):
+        if os.path.exists(path):
+            shutil.rmtree(old_path, ignore_errors=True)
+            os.replace(path, old_path)
+        os.replace(new_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def _read_meta(path):
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta["version"] != FORMAT_VERSION:
+        raise ValueError("%s has unsupported format version %s"
+                         % (path, meta["version"]))
+    return meta
+
+
+def load_movie_table(path, columns=None, mmap=True):
+    """
+    Load a movie data table saved by save_movie_table.
+
+    Only the requested columns are read. With mmap, years, ratings and votes
+    are memory mapped rather than read, so they take no time to open and
+    only the parts that are used are read from disk. Titles and genres can't
+    be memory mapped: every title and genre list is decoded into a python
+    object when the table is loaded, which takes longer the more movies
+    there are. Leave those columns out, or use load_genre_index, when only
+    the numbers are needed.
+
+    Args:
+        path::str
+            Folder the table was saved in.
+        columns::list of str
+            Names of the columns to load. Default is every column.
+        mmap::bool
+            If True, memory map the numeric columns. Default is True.
+    Returns:
+        movie_data::pandas DataFrame
+            The movie data. Years and votes are nullable integers, ratings are
+            32 bit floats, titles are strings and genres are lists of strings.
+    """
+    meta = _read_meta(path)
+    if columns is None:
+        columns = MOVIE_COLUMNS
+    table = {}
+    for column in columns:
+        position = MOVIE_COLUMNS.index(column)
+        name = COLUMN_FILES[position]
+        kind = COLUMN_KINDS[position]
+        missing_path = os.path.join(path, name + ".missing.npy")
+        missing = np.load(missing_path) if os.path.exists(missing_path) \
+            else None
+
+        if kind == "text":
+            data = bytes(_load_array(path, name + ".bytes", mmap))
+            offsets = _load_array(path, name + ".offsets", False).tolist()
+            texts = [data[start:end].decode("utf-8")
+                     for start, end in zip(offsets[:-1], offsets[1:])]
+            values = pd.array(texts, dtype="string")
+            if missing is not None:
+                values[missing] = pd.NA
+        elif kind == "genres":
+            codes = _load_array(path, name + ".codes", mmap).tolist()
+            offsets = _load_array(path, name + ".offsets", False).tolist()
+            names = [meta["genres"][code] for code in codes]
+            values = pd.Series([names[start:end] for start, end
+                                in zip(offsets[:-1], offsets[1:])],
+                               dtype=object)
+            if missing is not None:
+                values[missing] = None
+        else:
+            data = _load_array(path, name, mmap)
+            if kind == "float32":
+                values = data
+            else:
+                # nullable integers wrap the data without copying it
+                if missing is None:
+                    missing = np.zeros(len(data), dtype=bool)
+                values = pd.arrays.IntegerArray(data, missing)
+        table[column] = values
+    return pd.DataFrame(table, columns=columns, copy=False)
+
+
+def load_genre_index(path, movie="original"):
+    """
+    Index the genres of a saved movie table without building any lists.
+
+    Args:
+        path::str
+            Folder the table was saved in.
+        movie::str
+            "original" or "remake", whose genres to index.
+    Returns:
+        genre_index::GenreIndex
+    """
+    meta = _read_meta(path)
+    codes = _load_array(path, movie + "_genres.codes", True)
+    offsets = _load_array(path, movie + "_genres.offsets", True)
+    rows = np.repeat(np.arange(meta["rows"], dtype=np.int64),
+                     np.diff(offsets))
+    return GenreIndex.from_codes(meta["genres"], rows, codes, meta["rows"])
+
+
+def convert_pickle(pickle_path="./movie_data.pkl", path="./movie_data"):
+    """
+    Save a movie data table pickled by the original scraper in the format of
+    save_movie_table, so that load_movie_table can read it.
+
+    Args:
+        pickle_path::str
+            Pickle file of the movie data, such as movie_data.pkl.
+        path::str
+            Folder to save the table in.
+    Returns:
+        movie_data::pandas DataFrame
+            The movie data that was saved.
+    """
+    movie_data = pd.read_pickle(pickle_path)
+    # the original scraper marked missing values with "NONE"
+    movie_data = movie_data.mask(movie_data == "NONE")
+    save_movie_table(movie_data, path)
+    return movie_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        "\n\n")[0])
+    parser.add_argument("pickle", nargs="?", default="./movie_data.pkl",
+                        help="pickled movie data (default ./movie_data.pkl)")
+    parser.add_argument("path", nargs="?", default="./movie_data",
+                        help="folder to save the table in "
+                             "(default ./movie_data)")
+    args = parser.parse_args()
+
+    movie_data = convert_pickle(args.pickle, args.path)
+    print("saved %d movies to %s" % (len(movie_data), args.path))
+
+
+if __name__ == "__main__":
+    main()
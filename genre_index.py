@@ -0,0 +1,166 @@
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+
+class GenreIndex:
+    """
+    Which genres each movie in a dataset belongs to.
+
+    Membership is stored sparsely, grouped by genre: rows holds the row
+    numbers of every movie in the first genre, then every movie in the second
+    genre, and so on, with indptr marking where each genre starts. Counting
+    genres and averaging values by genre are then a few numpy operations
+    instead of a loop over every movie.
+
+    Build an index with GenreIndex.from_lists.
+
+    Args:
+        genres::list of str
+            Names of the genres, in order of first appearance.
+        rows::numpy array
+            Row numbers of the movies in each genre, grouped by genre.
+        indptr::numpy array
+            The movies of genre i are rows[indptr[i]:indptr[i + 1]].
+        n_rows::int
+            Number of movies in the dataset.
+    """
+
+    def __init__(self, genres, rows, indptr, n_rows):
+        self.genres = list(genres)
+        self.rows = rows
+        self.indptr = indptr
+        self.n_rows = n_rows
+        self._codes = {genre: code for code, genre in enumerate(self.genres)}
+
+    @classmethod
+    def from_lists(cls, genre_lists):
+        """
+        Build an index from a list of genres for every movie.
+
+        Args:
+            genre_lists::sequence of lists
+                The genres of each movie, such as a genre column of the movie
+                data.
+        Returns:
+            genre_index::GenreIndex
+        """
+        n_rows = len(genre_lists)
+        lengths = np.fromiter(map(len, genre_lists), dtype=np.int64,
+                              count=n_rows)
+        flat = pd.Series(list(chain.from_iterable(genre_lists)), dtype=object)
+        codes, genres = pd.factorize(flat)
+        rows = np.repeat(np.arange(n_rows, dtype=np.int64), lengths)
+        return cls.from_codes(list(genres), rows, codes, n_rows)
+
+    @classmethod
+    def from_codes(cls, genres, rows, codes, n_rows):
+        """
+        Build an index from pairs of row numbers and genre codes.
+
+        Args:
+            genres::list of str
+                Names of the genres. Genre code i is genres[i].
+            rows::numpy array
+                Row number of each pair.
+            codes::numpy array
+                Genre code of each pair.
+            n_rows::int
+                Number of movies in the dataset.
+        Returns:
+            genre_index::GenreIndex
+        """
+        # a movie listed twice under the same genre only counts once
+        pairs = np.sort(np.asarray(codes, dtype=np.int64) * n_rows
+                        + np.asarray(rows, dtype=np.int64))
+        if len(pairs):
+            pairs = pairs[np.concatenate([[True], pairs[1:] != pairs[:-1]])]
+        sorted_codes = pairs // max(n_rows, 1)
+        indptr = np.zeros(len(genres) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sorted_codes, minlength=len(genres)),
+                  out=indptr[1:])
+        return cls(genres, pairs % max(n_rows, 1), indptr, n_rows)
+
+    def _row_codes(self):
+        # genre code of every entry in rows
+        return np.repeat(np.arange(len(self.genres)), self.counts())
+
+    def counts(self):
+        """
+        Returns:
+            counts::numpy array
+                Number of movies in each genre.
+        """
+        return np.diff(self.indptr)
+
+    def popular(self, number=None):
+        """
+        Find the most popular genres.
+
+        Args:
+            number::int
+                Number of genres to return. Default is every genre.
+        Returns:
+            genres::list of str
+                Genres sorted from most to least movies. Genres with the same
+                number of movies are in order of first appearance.
+        """
+        order = np.argsort(-self.counts(), kind="stable")
+        return [self.genres[code] for code in order[:number]]
+
+    def rows_with(self, genre):
+        """
+        Args:
+            genre::str
+                Name of a genre.
+        Returns:
+            rows::numpy array
+                Row numbers of the movies in the genre, in increasing order.
+        """
+        code = self._codes.get(genre)
+        if code is None:
+            return self.rows[:0]
+        return self.rows[self.indptr[code]:self.indptr[code + 1]]
+
+    def sums(self, values):
+        """
+        Add up a value for the movies in each genre.
+
+        Args:
+            values::numpy array
+                One value per movie.
+        Returns:
+            sums::numpy array
+                Sum of the values of the movies in each genre.
+        """
+        values = np.asarray(values, dtype=np.float64)[self.rows]
+        return np.bincount(self._row_codes(), weights=values,
+                           minlength=len(self.genres))
+
+    def means(self, values):
+        """
+        Average a value over the movies in each genre.
+
+        Args:
+            values::numpy array
+                One value per movie.
+        Returns:
+            means::numpy array
+                Mean value of the movies in each genre. Genres without any
+                movies are NaN.
+        """
+        counts = self.counts()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.sums(values) / counts
+
+    def matrix(self):
+        """
+        Returns:
+            matrix::numpy array
+                Dense multi-hot matrix with one row per movie and one column
+                per genre, True where the movie is in the genre.
+        """
+        matrix = np.zeros((self.n_rows, len(self.genres)), dtype=bool)
+        matrix[self.rows, self._row_codes()] = True
+        return matrix
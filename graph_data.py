@@ -1,7 +1,11 @@
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
+from genre_index import GenreIndex
+from movie_scraper import MOVIE_COLUMNS
+from rating_aggregates import RatingAggregates
+from rating_stats import bootstrap_intervals
+
 # dictionary to store column names
 col = {"original_name": 0, "original_date": 1, "original_genre": 2,
        "original_rating": 3, "original_votes": 4, "remake_name": 5,
@@ -9,7 +13,61 @@ col = {"original_name": 0, "original_date": 1, "original_genre": 2,
        "remake_votes": 9}
 
 
-def graph_rating_change_by_time(movie_data, col=col):
+def _axes(ax):
+    """
+    Get the axes to draw on: ax, or the current pyplot axes if ax is None.
+    pyplot is only imported when it is used, so drawing on axes of a Figure
+    made without it needs neither pyplot nor its global state.
+    """
+    if ax is None:
+        import matplotlib.pyplot as plt
+        ax = plt.gca()
+    return ax
+
+
+def _downsample(x, number, seed=0):
+    """
+    Pick about number positions of x at random, keeping the same share of
+    every different value of x so that sparse years are not lost.
+    """
+    if number is None or number >= len(x):
+        return np.arange(len(x))
+    rng = np.random.default_rng(seed)
+    # sort by value of x, in random order within each value
+    order = np.lexsort((rng.random(len(x)), x))
+    values, starts, counts = np.unique(x[order], return_index=True,
+                                       return_counts=True)
+    # every value keeps at least one point
+    quotas = np.maximum(counts * number // len(x), 1)
+    ranks = np.arange(len(x)) - np.repeat(starts, counts)
+    return np.sort(order[ranks < np.repeat(quotas, counts)])
+
+
+def _scatter(ax, x, y, mode, max_points, bins):
+    """
+    Draw change in rating against x as points or as a density grid.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if mode == "points":
+        keep = _downsample(x, max_points)
+        ax.plot(x[keep], y[keep], "b.")
+    elif mode == "density":
+        # count the pairs in each cell of a grid and draw the grid as one
+        # image, so the figure is the same size however many pairs there are
+        counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins)
+        mesh = ax.pcolormesh(x_edges, y_edges,
+                             np.ma.masked_equal(counts.T, 0), cmap="Blues",
+                             rasterized=True)
+        ax.figure.colorbar(mesh, ax=ax, label="Number of remakes")
+    else:
+        raise ValueError("mode must be \"points\" or \"density\", not %r"
+                         % mode)
+
+
+def graph_rating_change_by_time(movie_data, col=col, aggregates=None,
+                                mode="points", max_points=None, bins=50,
+                                ax=None):
     """
     Graph difference in remake movie rating compared to original rating over
     time.
@@ -24,23 +82,98 @@ def graph_rating_change_by_time(movie_data, col=col):
         col::dict
             Default is a dictionary whos keys are a description of the column
             data and the values are the column number.
+        aggregates::RatingAggregates
+            Totals of the ratings from make_rating_aggregates or saved with
+            the dataset. If given, the average change in rating of each
+            remake year is plotted instead of every movie.
+        mode::str
+            "points" to draw every movie as a point, or "density" to draw how
+            many movies fall in each cell of a grid, which stays fast and
+            small for any number of movies. Default is "points".
+        max_points::int
+            In "points" mode, draw about this many movies picked at random,
+            keeping the same share of every remake year. Default is to draw
+            every movie.
+        bins::int or tuple
+            Number of cells of the grid in "density" mode, or a pair with the
+            number of columns and rows. Default is 50.
+        ax::matplotlib Axes
+            Axes to draw on. Default is the current pyplot axes.
     Returns:
         A plot
     """
+    ax = _axes(ax)
+
+    if aggregates is not None:
+        summary = aggregates.summary("year")
+        ax.plot(summary.index, summary["mean"], "b.-")
+    else:
+        # renaming movie_data as df
+        df = movie_data
+
+        # calculate change in rating as difference between new movie and old
+        # movie
+        d_rating = df[:, col["remake_rating"]] - df[:, col["original_rating"]]
+
+        _scatter(ax, df[:, col["remake_date"]], d_rating, mode, max_points,
+                 bins)
+
+    ax.set_title("Remake movies vs originals over time")
+    ax.set_xlabel("Year of remake movie")
+    ax.set_ylabel("Change in IMDb score compared to original")
+
+
+def make_genre_index(movie_data, col=col):
+    """
+    Index the genres of the original movies in the dataset.
+
+    Building the index once and passing it to find_popular_genres and the
+    graphing functions saves each of them from reading every movie's genres
+    again.
+
+    Args:
+        movie_data::numpy array
+            An numpy array that contains data on both the original and remake
+            movie.
+        col::dict
+            Default is a dictionary whos keys are a description of the column
+            data and the values are the column number.
+    Returns:
+        genre_index::GenreIndex
+    """
+    return GenreIndex.from_lists(movie_data[:, col["original_genre"]])
 
-    # renaming movie_data as df
-    df = movie_data
 
-    # calculate change in rating as difference between new movie and old movie
-    d_rating = df[:, col["remake_rating"]] - df[:, col["original_rating"]]
+def make_rating_aggregates(movie_data, col=col):
+    """
+    Total up the ratings of the dataset by genre, remake year and years
+    between original and remake.
 
-    plt.plot(df[:, col["remake_date"]], d_rating, "b.")
-    plt.title("Remake movies vs originals over time")
-    plt.xlabel("Year of remake movie")
-    plt.ylabel("Change in IMDb score compared to original")
+    The totals are all the graphing functions need, so graphing from them
+    takes the same time however large the dataset is. run_pipeline saves the
+    totals with the dataset, where RatingAggregates.load can read them.
+
+    Args:
+        movie_data::numpy array
+            An numpy array that contains data on both the original and remake
+            movie.
+        col::dict
+            Default is a dictionary whos keys are a description of the column
+            data and the values are the column number.
+    Returns:
+        aggregates::RatingAggregates
+    """
+    columns = ["original_name", "original_date", "original_genre",
+               "original_rating", "original_votes", "remake_name",
+               "remake_date", "remake_genre", "remake_rating", "remake_votes"]
+    aggregates = RatingAggregates()
+    aggregates.add(pd.DataFrame({name: movie_data[:, col[column]]
+                                 for name, column
+                                 in zip(MOVIE_COLUMNS, columns)}))
+    return aggregates
 
 
-def find_popular_genres(movie_data, number, col=col):
+def find_popular_genres(movie_data, number, col=col, genre_index=None):
     """
     Find the most popular movie genres in dataset.
 
@@ -57,32 +190,41 @@ def find_popular_genres(movie_data, number, col=col):
         col::dict
             Default is a dictionary whos keys are a description of the column
             data and the values are the column number.
+        genre_index::GenreIndex
+            Index of the original movies' genres from make_genre_index.
+            Default is to build one from movie_data.
     Returns:
         top_genres::list
-            A dictionary whose keys are the movie genres and whose values are
-            the number of times that genre apeared in the dataset. The dict
-            is sorted from most popular to least populal.
+            A list of the most popular genres, sorted from most popular to
+            least popular.
     """
-    # initialize empty dicitonary
-    top_categories = {}
-
-    for movie in movie_data[:, col["original_genre"]]:
-        for genre in movie:
-            # if genre is not yet in dicitonary, add it and give it value of 1
-            if genre not in top_categories:
-                top_categories[genre] = 1
-            # if genre is in dictionary, add to count
-            else:
-                top_categories[genre] += 1
-
-    # sort the dictionary by my popular genres of movie
-    categories = sorted(top_categories, key=top_categories.get, reverse=True)
+    if genre_index is None:
+        genre_index = make_genre_index(movie_data, col)
 
     # return the most popular categories
-    return categories[0:number]
+    return genre_index.popular(number)
 
 
-def graph_rating_change_by_genre(movie_data, bars=8, col=col):
+def _rating_change_errors(movie_data, genres, col, genre_index):
+    """
+    Distance from the mean change in rating of each genre down and up to the
+    ends of its 95% bootstrap confidence interval.
+    """
+    if movie_data is None:
+        raise ValueError("error bars need movie_data to resample")
+    if genre_index is None:
+        genre_index = make_genre_index(movie_data, col)
+    d_rating = (movie_data[:, col["remake_rating"]]
+                - movie_data[:, col["original_rating"]]).astype(float)
+    groups = [genre_index.rows_with(genre) for genre in genres]
+    means = np.array([d_rating[rows].mean() for rows in groups])
+    low, high = bootstrap_intervals(d_rating, groups)
+    return np.array([means - low, high - means])
+
+
+def graph_rating_change_by_genre(movie_data, bars=8, col=col,
+                                 genre_index=None, aggregates=None, ax=None,
+                                 error_bars=False):
     """
     Graph change in ratings of movie remakes by genre of original movie.
 
@@ -98,40 +240,61 @@ def graph_rating_change_by_genre(movie_data, bars=8, col=col):
         col::dict
             Default is a dictionary whos keys are a description of the column
             data and the values are the column number.
+        genre_index::GenreIndex
+            Index of the original movies' genres from make_genre_index.
+            Default is to build one from movie_data.
+        aggregates::RatingAggregates
+            Totals of the ratings from make_rating_aggregates or saved with
+            the dataset. If given, the genres and their average change in
+            rating are read from the totals instead of movie_data.
+        ax::matplotlib Axes
+            Axes to draw on. Default is the current pyplot axes.
+        error_bars::bool
+            If True, draw the 95% bootstrap confidence interval of the
+            average change in rating of each genre. Needs movie_data.
     Returns:
         A plot
     """
+    ax = _axes(ax)
+
+    if aggregates is not None:
+        # get movie genres and their average change in score
+        genres = aggregates.popular(bars)
+        d_ratings_genre = aggregates.summary("genre")["mean"][genres].tolist()
+    else:
+        # renaming movie_data as df
+        df = movie_data
 
-    # renaming movie_data as df
-    df = movie_data
+        # calculate change in rating as difference between new movie and old
+        # movie
+        d_rating = df[:, col["remake_rating"]] - df[:, col["original_rating"]]
 
-    # calculate change in rating as difference between new movie and old movie
-    d_rating = df[:, col["remake_rating"]] - df[:, col["original_rating"]]
+        if genre_index is None:
+            genre_index = make_genre_index(movie_data, col)
 
-    # get movie genres
-    genres = find_popular_genres(movie_data, bars)
+        # get movie genres
+        genres = find_popular_genres(movie_data, bars,
+                                     genre_index=genre_index)
 
-    # list of change in ratings by genre
-    d_ratings_genre = []
+        # find average change in score for movies of each genre
+        average_d_rating = genre_index.means(d_rating)
+        d_ratings_genre = [average_d_rating[genre_index.genres.index(genre)]
+                           for genre in genres]
 
-    for genre in genres:
-        # find index of movies with specic genre
-        movie_index = [movie for movie in range(len(df)) if genre in
-                       df[movie, col["original_genre"]]]
-        # find average change in score for movies with specific genre
-        average_d_rating = sum(d_rating[movie_index]) / \
-            len(d_rating[movie_index])
-        # append list
-        d_ratings_genre.append(average_d_rating)
+    yerr = None
+    if error_bars:
+        yerr = _rating_change_errors(movie_data, genres, col, genre_index)
 
     # create bar graph
-    plt.bar(genres, d_ratings_genre)
-    plt.title("Quality of movie remakes by genre")
-    plt.xlabel("Genre of original movie")
-    plt.ylabel("Change in IMDb score compared to original")
+    ax.bar(genres, d_ratings_genre, yerr=yerr, capsize=4)
+    ax.set_title("Quality of movie remakes by genre")
+    ax.set_xlabel("Genre of original movie")
+    ax.set_ylabel("Change in IMDb score compared to original")
 
 
-def graph_rating_change_by_genre_full(movie_data, bars=8, col=col):
+def graph_rating_change_by_genre_full(movie_data, bars=8, col=col,
+                                      genre_index=None, aggregates=None,
+                                      ax=None, error_bars=False):
     """
     Graph average orignal and remake rating of movie by genre.
 
@@ -147,40 +310,69 @@ def graph_rating_change_by_genre_full(movie_data, bars=8, col=col):
         col::dict
             Default is a dictionary whos keys are a description of the column
             data and the values are the column number.
+        genre_index::GenreIndex
+            Index of the original movies' genres from make_genre_index.
+            Default is to build one from movie_data.
+        aggregates::RatingAggregates
+            Totals of the ratings from make_rating_aggregates or saved with
+            the dataset. If given, the genres and their average ratings
+            are read from the totals instead of movie_data.
+        ax::matplotlib Axes
+            Axes to draw on. Default is the current pyplot axes.
+        error_bars::bool
+            If True, draw the 95% bootstrap confidence interval of the
+            difference between original and remake rating of each genre on
+            top of its bar. Needs movie_data.
     Returns:
         A plot
     """
-
-    # renaming movie_data as df
-    df = movie_data
-
-    # create empty list for remake movies ratings and bar height (d_rating)
-    remake_ratings = []
-    d_ratings = []
-
-    # get movie genres
-    genres = find_popular_genres(movie_data, bars)
-
-    for genre in genres:
-        # find index of movies with specic genre
-        movie_index = [movie for movie in range(len(df)) if genre in
-                       df[movie, col["original_genre"]]]
-        # find average remake rating
-        remake_rating = df[:, col["remake_rating"]][movie_index]
-        remake_ratings.append(sum(remake_rating) / len(remake_rating))
-        # find change in ratings
-        d_rating = df[:, col["original_rating"]][movie_index] - \
-            df[:, col["remake_rating"]][movie_index]
-        d_ratings.append(sum(d_rating) / len(d_rating))
-
-    plt.bar(genres, height=d_ratings, bottom=remake_ratings)
-    plt.title("Average rating of original and remake movies by genre")
-    plt.xlabel("Genre of original movie")
-    plt.ylabel("Rating of original and remake movie")
-    plt.legend(["Top = Original; Bottom = Remake"])
-
-
-def graph_rating_change_by_year_dif(movie_data, col=col):
+    ax = _axes(ax)
+
+    if aggregates is not None:
+        # get movie genres, average remake rating and bar height (change in
+        # rating) by genre
+        genres = aggregates.popular(bars)
+        remake_ratings = aggregates.summary("genre", "remake")["mean"][
+            genres].to_numpy()
+        d_ratings = aggregates.summary("genre", "original")["mean"][
+            genres].to_numpy() - remake_ratings
+    else:
+        # renaming movie_data as df
+        df = movie_data
+
+        if genre_index is None:
+            genre_index = make_genre_index(movie_data, col)
+
+        # get movie genres
+        genres = find_popular_genres(movie_data, bars,
+                                     genre_index=genre_index)
+        codes = [genre_index.genres.index(genre) for genre in genres]
+
+        # find average remake rating and bar height (change in rating) by
+        # genre
+        remake_rating = df[:, col["remake_rating"]].astype(float)
+        d_rating = df[:, col["original_rating"]].astype(float) - remake_rating
+        remake_ratings = genre_index.means(remake_rating)[codes]
+        d_ratings = genre_index.means(d_rating)[codes]
+
+    yerr = None
+    if error_bars:
+        # the bars go from remake up to original, the opposite way to the
+        # change in rating, so the interval is flipped
+        yerr = _rating_change_errors(movie_data, genres, col,
+                                     genre_index)[::-1]
+
+    ax.bar(genres, height=d_ratings, bottom=remake_ratings, yerr=yerr,
+           capsize=4)
+    ax.set_title("Average rating of original and remake movies by genre")
+    ax.set_xlabel("Genre of original movie")
+    ax.set_ylabel("Rating of original and remake movie")
+    ax.legend(["Top = Original; Bottom = Remake"])
+
+
+def graph_rating_change_by_year_dif(movie_data, col=col, aggregates=None,
+                                    mode="points", max_points=None,
+                                    bins=50, ax=None):
     """
     Graph difference in remake movie rating compared to original rating by
     length of time between original movie and remake
@@ -195,21 +387,49 @@ def graph_rating_change_by_year_dif(movie_data, col=col):
         col::dict
             Default is a dictionary whos keys are a description of the column
             data and the values are the column number.
+        aggregates::RatingAggregates
+            Totals of the ratings from make_rating_aggregates or saved with
+            the dataset. If given, the average change in rating of each
+            bucket of years between original and remake is plotted instead
+            of every movie.
+        mode::str
+            "points" to draw every movie as a point, or "density" to draw how
+            many movies fall in each cell of a grid, which stays fast and
+            small for any number of movies. Default is "points".
+        max_points::int
+            In "points" mode, draw about this many movies picked at random,
+            keeping the same share of every number of years between original
+            and remake. Default is to draw every movie.
+        bins::int or tuple
+            Number of cells of the grid in "density" mode, or a pair with the
+            number of columns and rows. Default is 50.
+        ax::matplotlib Axes
+            Axes to draw on. Default is the current pyplot axes.
     Returns:
         A plot
     """
-
-    # renaming movie_data as df
-    df = movie_data
-
-    # calculate change in rating as difference between new movie and old movie
-    d_rating = df[:, col["remake_rating"]] - df[:, col["original_rating"]]
-
-    # calculate difference in year made between new and old movie
-    d_year = df[:, col["remake_date"]] - df[:, col["original_date"]]
-
-    # plot graph
-    plt.plot(d_year, d_rating, "b.")
-    plt.title("Quality of movie remakes by years between remake and original")
-    plt.xlabel("Time difference between original and remake (yrs)")
-    plt.ylabel("Change in IMDb score compared to original")
+    ax = _axes(ax)
+
+    if aggregates is not None:
+        # plot the average of each bucket at the middle of the bucket
+        summary = aggregates.summary("gap")
+        ax.plot(summary.index + aggregates.gap_width / 2, summary["mean"],
+                "b.-")
+    else:
+        # renaming movie_data as df
+        df = movie_data
+
+        # calculate change in rating as difference between new movie and old
+        # movie
+        d_rating = df[:, col["remake_rating"]] - df[:, col["original_rating"]]
+
+        # calculate difference in year made between new and old movie
+        d_year = df[:, col["remake_date"]] - df[:, col["original_date"]]
+
+        # plot graph
+        _scatter(ax, d_year, d_rating, mode, max_points, bins)
+
+    ax.set_title(
+        "Quality of movie remakes by years between remake and original")
+    ax.set_xlabel("Time difference between original and remake (yrs)")
+    ax.set_ylabel("Change in IMDb score compared to original")
@@ -0,0 +1,251 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import instrumentation
+from page_fetcher import Page
+
+
+class HTTPCache:
+    """
+    Cache downloaded pages on disk so that re-running the scraper only
+    downloads pages that changed.
+
+    Page bodies are stored zlib compressed and content addressed: a body is
+    saved once under the sha256 hash of its contents, no matter how many urls
+    return it. A small SQLite index maps each url to its body and to the ETag
+    and Last-Modified headers the server sent with it.
+
+    A cached page younger than ttl seconds is served straight from disk. An
+    older page is revalidated with a conditional request, so an unchanged
+    page only costs a 304 response. When the bodies take up more than
+    max_bytes, the least recently used pages are evicted.
+
+    Args:
+        path::str
+            Directory to store the cache in. Created if it does not exist.
+        ttl::float
+            Number of seconds a cached page is used without asking the server
+            whether it changed. Default is one day.
+        max_bytes::int
+            Maximum total size of the compressed bodies. Default is 1 GB.
+    """
+
+    def __init__(self, path="./http_cache", ttl=24 * 3600,
+                 max_bytes=1024 ** 3):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(path, "objects"), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(path, "index.sqlite"),
+                                   check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY,
+            digest TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            encoding TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            fetched_at REAL NOT NULL,
+            used_at REAL NOT NULL)""")
+        # eviction walks pages from the least recently used, and removing a
+        # body checks whether any page still refers to it
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_used_at "
+                         "ON pages (used_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_digest "
+                         "ON pages (digest)")
+        self._db.commit()
+        # total size of the stored bodies, counting shared bodies once
+        self._bytes = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size "
+            "FROM pages GROUP BY digest)").fetchone()[0]
+
+        # counters for how requests were answered
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _object_path(self, digest):
+        return os.path.join(self.path, "objects", digest[:2], digest + ".z")
+
+    def _lookup(self, url):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest, encoding, etag, last_modified, fetched_at "
+                "FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        keys = ["digest", "encoding", "etag", "last_modified", "fetched_at"]
+        return dict(zip(keys, row))
+
+    def _read(self, url, entry):
+        try:
+            with open(self._object_path(entry["digest"]), "rb") as f:
+                body = zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+        return Page(url, 200, body.decode(entry["encoding"] or "utf-8",
+                                          errors="replace"))
+
+    def _touch(self, url, revalidated=False):
+        now = time.time()
+        with self._lock:
+            if revalidated:
+                self._db.execute("UPDATE pages SET used_at = ?, "
+                                 "fetched_at = ? WHERE url = ?",
+                                 (now, now, url))
+            else:
+                self._db.execute("UPDATE pages SET used_at = ? WHERE url = ?",
+                                 (now, url))
+            self._db.commit()
+
+    def _store(self, url, response):
+        body = response.content
+        digest = hashlib.sha256(body).hexdigest()
+        object_path = self._object_path(digest)
+        compressed = zlib.compress(body)
+        now = time.time()
+        # files are written and removed under the lock, so a body is never
+        # removed between another thread seeing its file and indexing it
+        with self._lock:
+            # identical bodies share one file, so only write new contents
+            if not os.path.exists(object_path):
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                temp_path = "%s.%d.tmp" % (object_path,
+                                           threading.get_ident())
+                with open(temp_path, "wb") as f:
+                    f.write(compressed)
+                os.replace(temp_path, object_path)
+            row = self._db.execute("SELECT digest, size FROM pages "
+                                   "WHERE url = ?", (url,)).fetchone()
+            if not self._db.execute("SELECT 1 FROM pages WHERE digest = ? "
+                                    "LIMIT 1", (digest,)).fetchone():
+                self._bytes += len(compressed)
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, digest, len(compressed), response.encoding,
+                 response.headers.get("ETag"),
+                 response.headers.get("Last-Modified"), now, now))
+            self._db.commit()
+            # the page's old body is no longer needed unless another url
+            # returns it too
+            if row is not None and row[0] != digest:
+                self._remove_unused(*row)
+            over = self._bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def _remove_unused(self, digest, size):
+        # delete the file of a body if no page refers to it. Call with the
+        # lock held
+        if self._db.execute("SELECT 1 FROM pages WHERE digest = ? LIMIT 1",
+                            (digest,)).fetchone():
+            return
+        self._bytes -= size
+        try:
+            os.remove(self._object_path(digest))
+        except OSError:
+            pass
+
+    def get(self, url, send):
+        """
+        Get a page, from the cache if possible.
+
+        Args:
+            url::str
+                Url of the page.
+            send::function
+                Function that takes a url and a dictionary of extra request
+                headers, sends the request and returns the requests Response.
+        Returns:
+            page::Page
+                The page, either from the cache or from the server.
+        """
+        entry = self._lookup(url)
+
+        # serve fresh pages without asking the server
+        if entry is not None and time.time() - entry["fetched_at"] < self.ttl:
+            page = self._read(url, entry)
+            if page is not None:
+                with self._lock:
+                    self.hits += 1
+                instrumentation.count("cache.hits")
+                self._touch(url)
+                return page
+            entry = None
+
+        # ask the server if a stale page has changed since it was cached
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        response = send(url, headers)
+
+        if response.status_code == 304 and entry is not None:
+            page = self._read(url, entry)
+            if page is not None:
+                with self._lock:
+                    self.revalidated += 1
+                instrumentation.count("cache.revalidated")
+                self._touch(url, revalidated=True)
+                return page
+            # the body went missing from disk, so download it again
+            response = send(url, {})
+
+        with self._lock:
+            self.misses += 1
+        instrumentation.count("cache.misses")
+        if response.status_code == 200:
+            self._store(url, response)
+        return Page(url, response.status_code, response.text)
+
+    def evict(self):
+        """
+        Remove the least recently used pages until the cache is no larger than
+        max_bytes.
+        """
+        with self._lock:
+            # a body shared by several urls is only freed with its last url
+            evicted = 0
+            while self._bytes > self.max_bytes:
+                row = self._db.execute(
+                    "SELECT url, digest, size FROM pages "
+                    "ORDER BY used_at LIMIT 1").fetchone()
+                if row is None:
+                    break
+                self._db.execute("DELETE FROM pages WHERE url = ?",
+                                 (row[0],))
+                self._remove_unused(*row[1:])
+                evicted += 1
+            if evicted:
+                self._db.commit()
+            self.evictions += evicted
+
+    def stats(self):
+        """
+        Count how requests to the cache were answered.
+
+        Returns:
+            stats::dict
+                Number of hits, revalidated pages, misses and evictions, and
+                the hit rate. Revalidated pages count as hits in the hit rate.
+        """
+        with self._lock:
+            stats = {"hits": self.hits, "revalidated": self.revalidated,
+                     "misses": self.misses, "evictions": self.evictions}
+        total = stats["hits"] + stats["revalidated"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["revalidated"]) / total \
+            if total else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._db.close()
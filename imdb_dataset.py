@@ -0,0 +1,225 @@
+import csv
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# IMDb writes missing values in its dumps as \N
+TSV_OPTIONS = {"sep": "\t", "quoting": csv.QUOTE_NONE, "dtype": str,
+               "na_values": ["\\N"], "keep_default_na": False}
+# IMDb lists at most 3 genres per title
+MAX_GENRES = 3
+
+
+def _tconst_to_int(tconsts):
+    # "tt0012345" -> 12345
+    return tconsts.str.slice(2).astype(np.int64).to_numpy()
+
+
+def _gather_strings(data, offsets, order):
+    # reorder strings stored as one byte array plus offsets
+    starts = offsets[:-1][order]
+    lengths = np.diff(offsets)[order]
+    new_offsets = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    index = (np.repeat(starts - new_offsets[:-1], lengths)
+             + np.arange(new_offsets[-1]))
+    return data[index], new_offsets
+
+
+def build_imdb_dataset(basics_path, ratings_path, path, chunksize=500000,
+                       title_types=None):
+    """
+    Convert IMDb's public dataset dumps into compact columns on disk.
+
+    The dumps are read in chunks of chunksize rows, so the full dumps never
+    have to fit in memory. Each column is saved as its own numpy file, sorted
+    by IMDb number, so that IMDbDataset can memory map them.
+
+    Args:
+        basics_path::str
+            Path of title.basics.tsv.gz.
+        ratings_path::str
+            Path of title.ratings.tsv.gz.
+        path::str
+            Directory to save the dataset in. Created if it does not exist.
+        chunksize::int
+            Number of rows read from the dumps at a time.
+        title_types::list
+            Title types to keep, such as ["movie", "tvMovie"]. Default is to
+            keep every title.
+    """
+    # read ratings first, they are small enough to hold in memory
+    rating_numbers, ratings, votes = [], [], []
+    for chunk in pd.read_csv(ratings_path, chunksize=chunksize,
+                             **TSV_OPTIONS):
+        rating_numbers.append(_tconst_to_int(chunk["tconst"]))
+        ratings.append(chunk["averageRating"].astype(np.float32).to_numpy())
+        votes.append(chunk["numVotes"].astype(np.int32).to_numpy())
+    rating_numbers = np.concatenate(rating_numbers)
+    order = np.argsort(rating_numbers, kind="stable")
+    rating_numbers = rating_numbers[order]
+    ratings = np.concatenate(ratings)[order]
+    votes = np.concatenate(votes)[order]
+
+    # read titles one chunk at a time, keeping only the columns we need
+    genre_names = []
+    numbers, years, genres, titles, title_lengths = [], [], [], [], []
+    columns = ["tconst", "titleType", "primaryTitle", "startYear", "genres"]
+    for chunk in pd.read_csv(basics_path, chunksize=chunksize,
+                             usecols=columns, **TSV_OPTIONS):
+        if title_types is not None:
+            chunk = chunk[chunk["titleType"].isin(title_types)]
+        numbers.append(_tconst_to_int(chunk["tconst"]))
+        years.append(pd.to_numeric(chunk["startYear"]).fillna(0)
+                     .astype(np.int16).to_numpy())
+
+        # store genres as codes in the order IMDb lists them, padded with
+        # -1 up to MAX_GENRES
+        split = chunk["genres"].str.split(",", expand=True)
+        if split.shape[1] > MAX_GENRES:
+            raise ValueError("more than %d genres for a title in %s"
+                             % (MAX_GENRES, basics_path))
+        codes = np.full((len(chunk), MAX_GENRES), -1, dtype=np.int8)
+        for position in range(split.shape[1]):
+            names = split[position]
+            for genre in names.dropna().unique():
+                if genre not in genre_names:
+                    genre_names.append(genre)
+            codes[:, position] = names.map(
+                {genre: code for code, genre in enumerate(genre_names)}
+            ).fillna(-1).to_numpy(dtype=np.int8)
+        genres.append(codes)
+
+        # store titles as one array of utf-8 bytes
+        encoded = chunk["primaryTitle"].fillna("").str.encode("utf-8")
+        titles.append(b"".join(encoded))
+        title_lengths.append(encoded.str.len().to_numpy(dtype=np.int64))
+
+    numbers = np.concatenate(numbers)
+    years = np.concatenate(years)
+    genres = np.concatenate(genres)
+    title_bytes = np.frombuffer(b"".join(titles), dtype=np.uint8)
+    title_offsets = np.zeros(len(numbers) + 1, dtype=np.int64)
+    np.cumsum(np.concatenate(title_lengths), out=title_offsets[1:])
+
+    # the dumps are normally sorted already, but make sure
+    if np.any(np.diff(numbers) <= 0):
+        order = np.argsort(numbers, kind="stable")
+        numbers, years, genres = numbers[order], years[order], genres[order]
+        title_bytes, title_offsets = _gather_strings(title_bytes,
+                                                     title_offsets, order)
+
+    # join ratings onto titles. Titles without ratings get NaN and -1 votes
+    position = np.searchsorted(rating_numbers, numbers)
+    position[position == len(rating_numbers)] = 0
+    rated = rating_numbers[position] == numbers if len(rating_numbers) else \
+        np.zeros(len(numbers), dtype=bool)
+    title_ratings = np.full(len(numbers), np.nan, dtype=np.float32)
+    title_votes = np.full(len(numbers), -1, dtype=np.int32)
+    title_ratings[rated] = ratings[position[rated]]
+    title_votes[rated] = votes[position[rated]]
+
+    os.makedirs(path, exist_ok=True)
+    columns = {"tconst": numbers.astype(np.int32), "year": years,
+               "genres": genres, "rating": title_ratings,
+               "votes": title_votes, "title_bytes": title_bytes,
+               "title_offsets": title_offsets}
+    for name, values in columns.items():
+        np.save(os.path.join(path, name + ".npy"), values)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"genres": genre_names, "rows": len(numbers)}, f)
+
+
+class IMDbDataset:
+    """
+    Offline IMDb movie data built by build_imdb_dataset.
+
+    The columns are memory mapped, so opening the dataset is instant and only
+    the parts that are looked up are read from disk.
+
+    Args:
+        path::str
+            Directory the dataset was saved in.
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            self.genre_names = json.load(f)["genres"]
+        for name in ["tconst", "year", "genres", "rating", "votes",
+                     "title_bytes", "title_offsets"]:
+            setattr(self, name, np.load(os.path.join(path, name + ".npy"),
+                                        mmap_mode="r"))
+
+    def __len__(self):
+        return len(self.tconst)
+
+    def find(self, imdb_numbers):
+        """
+        Find the rows of movies in the dataset.
+
+        Args:
+            imdb_numbers::iterable of str
+                IMDb numbers of the movies.
+        Returns:
+            rows::numpy array
+                Row of each movie in the dataset, or -1 for movies that are
+                not in it.
+        """
+        numbers = pd.to_numeric(pd.Series(list(imdb_numbers), dtype=object),
+                                errors="coerce").fillna(-1)
+        numbers = numbers.to_numpy(dtype=np.int64)
+        rows = np.searchsorted(self.tconst, numbers)
+        rows[rows == len(self.tconst)] = 0
+        found = (self.tconst[rows] == numbers) if len(self.tconst) else \
+            np.zeros(len(numbers), dtype=bool)
+        return np.where(found, rows, -1)
+
+    def lookup(self, imdb_numbers, **kwargs):
+        """
+        Get records for movies, in the same form as MovieStore.lookup.
+
+        Args:
+            imdb_numbers::iterable of str
+                IMDb numbers of the movies.
+        Returns:
+            records::dict
+                A dictionary whose keys are IMDb numbers and whose values are
+                records. Movies that are not in the dataset are left out.
+        """
+        imdb_numbers = list(dict.fromkeys(imdb_numbers))
+        rows = self.find(imdb_numbers)
+        found = rows >= 0
+        rows = rows[found]
+        imdb_numbers = [number for number, keep in zip(imdb_numbers, found)
+                        if keep]
+
+        # read all the needed values in one go
+        years = self.year[rows]
+        codes = self.genres[rows]
+        ratings = self.rating[rows]
+        votes = self.votes[rows]
+        starts = self.title_offsets[rows]
+        ends = self.title_offsets[rows + 1]
+
+        # decode each distinct list of genres only once
+        codes = list(map(tuple, codes.tolist()))
+        genre_lists = {}
+        for row_codes in codes:
+            if row_codes not in genre_lists:
+                genre_lists[row_codes] = [self.genre_names[code] for code
+                                          in row_codes if code >= 0] or None
+
+        records = {}
+        for i, number in enumerate(imdb_numbers):
+            title = bytes(self.title_bytes[starts[i]:ends[i]]).decode("utf-8")
+            genres = genre_lists[codes[i]]
+            records[number] = {
+                "title": title,
+                "year": int(years[i]) if years[i] else None,
+                "genres": None if genres is None else list(genres),
+                "rating": (None if np.isnan(ratings[i])
+                           else round(float(ratings[i]), 1)),
+                "votes": int(votes[i]) if votes[i] >= 0 else None}
+        return records
@@ -0,0 +1,198 @@
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# metrics being recorded, or None when nothing is recorded
+_active = None
+
+_NOT_RECORDING = nullcontext()
+
+
+class Metrics:
+    """
+    Timings and counters of a scraping run.
+
+    Stages are timed as a whole, in wall clock time and in CPU time of the
+    whole process. Timers add up the wall clock time of many small pieces of
+    work, such as every request or every page parsed, which can overlap when
+    they happen in several threads. Counters add up numbers such as requests
+    sent or bytes downloaded.
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.timers = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, start, wall, cpu):
+        with self._lock:
+            self.stages.append({"name": name, "start": start, "wall": wall,
+                                "cpu": cpu})
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    def add_count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def cache_hit_rate(self):
+        """
+        Returns:
+            hit_rate::float
+                Share of cache lookups served from the cache, counting
+                revalidated pages as hits, or None if the cache wasn't used.
+        """
+        hits = self.counters.get("cache.hits", 0) + \
+            self.counters.get("cache.revalidated", 0)
+        total = hits + self.counters.get("cache.misses", 0)
+        return hits / total if total else None
+
+    def records(self):
+        """
+        Returns:
+            records::list of dict
+                One record per stage, then one per timer and one per counter,
+                each with a "type" of "stage", "timer" or "counter".
+        """
+        with self._lock:
+            records = [dict(stage, type="stage") for stage in self.stages]
+            records += [{"type": "timer", "name": name, "seconds": seconds}
+                        for name, seconds in sorted(self.timers.items())]
+            records += [{"type": "counter", "name": name, "value": value}
+                        for name, value in sorted(self.counters.items())]
+        return records
+
+    def write_jsonl(self, path):
+        """
+        Add the records to a file of JSON lines, one record per line.
+
+        Args:
+            path::str
+                File to add the records to.
+        """
+        with open(path, "a") as f:
+            for record in self.records():
+                f.write(json.dumps(record) + "\n")
+
+    def summary(self):
+        """
+        Returns:
+            table::str
+                Table of the stages, timers and counters.
+        """
+        lines = ["%-40s %10s %10s" % ("stage", "wall (s)", "cpu (s)")]
+        for record in self.records():
+            if record["type"] == "stage":
+                lines.append("%-40s %10.3f %10.3f" % (
+                    record["name"], record["wall"], record["cpu"]))
+            elif record["type"] == "timer":
+                lines.append("%-40s %10.3f" % (record["name"],
+                                               record["seconds"]))
+            else:
+                lines.append("%-40s %10d" % (record["name"], record["value"]))
+        hit_rate = self.cache_hit_rate()
+        if hit_rate is not None:
+            lines.append("%-40s %10.3f" % ("cache.hit_rate", hit_rate))
+        return "\n".join(lines)
+
+
+@contextmanager
+def record(path=None):
+    """
+    Record the timings and counters of everything run inside the with block.
+
+    Nothing is recorded outside of a record block, and the instrumented code
+    then only pays for checking that nothing is being recorded.
+
+    Args:
+        path::str
+            File of JSON lines to add the records to at the end of the block.
+            Default is not to write any file.
+    Yields:
+        metrics::Metrics
+    """
+    global _active
+    previous = _active
+    metrics = Metrics()
+    _active = metrics
+    try:
+        yield metrics
+    finally:
+        _active = previous
+        if path is not None:
+            metrics.write_jsonl(path)
+
+
+def recording():
+    """
+    Returns:
+        recording::bool
+            True if metrics are being recorded.
+    """
+    return _active is not None
+
+
+@contextmanager
+def _timed_stage(metrics, name):
+    start = time.time()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        yield
+    finally:
+        metrics.add_stage(name, start, time.perf_counter() - wall,
+                          time.process_time() - cpu)
+
+
+@contextmanager
+def _timed(metrics, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_time(name, time.perf_counter() - start)
+
+
+def stage(name):
+    """
+    Time a stage of a run, such as get_imdb_numbers, in a with block.
+    """
+    if _active is None:
+        return _NOT_RECORDING
+    return _timed_stage(_active, name)
+
+
+def staged(function):
+    """
+    Decorator that times every call of function as a stage named after it.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if _active is None:
+            return function(*args, **kwargs)
+        with _timed_stage(_active, function.__name__):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def timed(name):
+    """
+    Add the time taken by a with block to a timer, such as "network".
+    """
+    if _active is None:
+        return _NOT_RECORDING
+    return _timed(_active, name)
+
+
+def count(name, amount=1):
+    """
+    Add to a counter, such as "requests".
+    """
+    if _active is not None:
+        _active.add_count(name, amount)
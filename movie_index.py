@@ -0,0 +1,500 @@
+"""
+Answer filter queries on a saved movie dataset, in process or over HTTP.
+
+Serve a dataset on http://127.0.0.1:8000 with:
+    python movie_index.py ./movie_data/movie_dataset
+and query it with, for example:
+    http://127.0.0.1:8000/movies?title=star&genre=Sci-Fi&original_year=1950:
+"""
+import argparse
+import json
+import re
+import unicodedata
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from dataset_io import load_genre_index, load_movie_table
+from genre_index import GenreIndex
+from movie_scraper import MOVIE_COLUMNS
+
+# columns that can be filtered by a range of values
+RANGE_COLUMNS = ["original_year", "remake_year", "original_rating",
+                 "remake_rating", "rating_change"]
+
+_NOT_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_title(title):
+    """
+    Put a title in lower case without accents or punctuation, so that
+    "Amélie" and "amelie" are the same.
+
+    Args:
+        title::str
+    Returns:
+        title::str
+            The normalized title, with words separated by single spaces.
+    """
+    if not title.isascii():
+        title = "".join(character for character
+                        in unicodedata.normalize("NFKD", title)
+                        if not unicodedata.combining(character))
+    return _NOT_WORD.sub(" ", title.casefold()).strip()
+
+
+def _run_keys(codes, starts, size):
+    # the size code points from each of starts packed into one integer,
+    # padded with zeros to three code points
+    keys = np.zeros(len(starts), dtype=np.int64)
+    for offset in range(size):
+        keys |= codes[starts + offset] << (42 - 21 * offset)
+    return keys
+
+
+def _unique_rows(rows, n_rows):
+    # the different rows in rows, in increasing order. Marking many rows
+    # in an array of every row is faster than sorting them
+    if len(rows) * 16 < n_rows:
+        return np.unique(rows)
+    found = np.zeros(n_rows, dtype=bool)
+    found[rows] = True
+    return np.flatnonzero(found).astype(rows.dtype)
+
+
+class TitleIndex:
+    """
+    Which titles contain each run of three characters (trigram).
+
+    Titles are normalized by normalize_title. The titles containing a
+    trigram are stored sparsely, grouped by trigram: keys holds every
+    trigram packed into an integer, in increasing order, and the titles
+    containing trigram keys[i] are rows[indptr[i]:indptr[i + 1]].
+
+    The last one and two characters of every title are kept as well,
+    padded with zeros. Every place text shorter than a trigram appears in
+    a title is then the start of one of these runs, and the runs that start
+    with text have neighbouring keys, so short text is found from one slice
+    of rows.
+
+    Args:
+        titles::sequence of str
+            Title of every movie.
+    """
+
+    def __init__(self, titles):
+        self.titles = [normalize_title(title) for title in titles]
+        lengths = np.fromiter(map(len, self.titles), dtype=np.int64,
+                              count=len(self.titles))
+        # every title in one array of code points, separated by zeros
+        codes = np.frombuffer("\0".join(self.titles).encode("utf-32-le"),
+                              dtype=np.uint32).astype(np.int64)
+        title_rows = np.arange(len(self.titles), dtype=np.int64)
+        char_rows = np.repeat(title_rows, lengths + 1)[:len(codes)]
+        starts = np.arange(max(len(codes) - 2, 0))
+        inside = (codes[:-2] != 0) & (codes[1:-1] != 0) & (codes[2:] != 0)
+        keys = [_run_keys(codes, starts[inside], 3)]
+        rows = [char_rows[:-2][inside]]
+        # the end of each title, where its trigrams stop
+        ends = np.cumsum(lengths + 1) - 1
+        for size in [2, 1]:
+            has_run = lengths >= size
+            keys.append(_run_keys(codes, ends[has_run] - size, size))
+            rows.append(title_rows[has_run])
+        keys = np.concatenate(keys)
+        rows = np.concatenate(rows)
+
+        # group by key, and list each title once per key. Each key is either
+        # a trigram or an end of a title, and both are in order of title, so
+        # a stable sort keeps the titles of each key in order
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        rows = rows[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = (keys[1:] != keys[:-1]) | (rows[1:] != rows[:-1])
+        keys = keys[first]
+        self.rows = rows[first].astype(np.int32)
+        # where each key starts. There may be no keys at all, in an empty
+        # table or one of empty titles
+        starts = np.ones(len(keys), dtype=bool)
+        starts[1:] = keys[1:] != keys[:-1]
+        starts = np.flatnonzero(starts)
+        self.keys = keys[starts]
+        self.indptr = np.append(starts, len(keys)).astype(np.int64)
+
+    def contains(self, text, rows):
+        """
+        Args:
+            text::str
+                Text to look for, normalized like the titles.
+            rows::numpy array
+                Row numbers of the titles to check.
+        Returns:
+            found::numpy array
+                True for each title that contains text.
+        """
+        text = normalize_title(text)
+        titles = self.titles
+        return np.fromiter((text in titles[row] for row in rows.tolist()),
+                           dtype=bool, count=len(rows))
+
+    def search(self, text):
+        """
+        Find the titles that contain text. Text longer than a trigram is
+        checked in only the titles with every trigram of text.
+
+        Args:
+            text::str
+                Text to look for, normalized like the titles.
+        Returns:
+            rows::numpy array
+                Row numbers of the titles that contain text, in increasing
+                order.
+        """
+        text = normalize_title(text)
+        rows = self.candidates(text)
+        if len(text) <= 3:
+            return rows
+        return rows[self.contains(text, rows)]
+
+    def candidates(self, text):
+        """
+        Find the titles with every trigram of text, or that contain text if
+        it is no longer than a trigram. Titles found for longer text may
+        still not contain it, as its trigrams can be spread over the title.
+        Empty text gives every title.
+
+        Args:
+            text::str
+                Normalized text.
+        Returns:
+            rows::numpy array
+                Row numbers of the titles, in increasing order.
+        """
+        if not text:
+            return np.arange(len(self.titles), dtype=self.rows.dtype)
+        codes = np.frombuffer(text.encode("utf-32-le"),
+                              dtype=np.uint32).astype(np.int64)
+        if len(text) < 3:
+            # every key from text followed by zeros up to text followed by
+            # the largest code points starts with text
+            low = _run_keys(codes, np.zeros(1, dtype=np.int64), len(text))
+            start, stop = np.searchsorted(
+                self.keys, [low[0], low[0] + (1 << (21 * (3 - len(text))))])
+            return _unique_rows(self.rows[self.indptr[start]:
+                                          self.indptr[stop]],
+                                len(self.titles))
+        keys = np.unique(_run_keys(codes, np.arange(len(text) - 2), 3))
+        positions = np.searchsorted(self.keys, keys)
+        if (positions == len(self.keys)).any() or \
+                (self.keys[np.minimum(positions, len(self.keys) - 1)]
+                 != keys).any():
+            return self.rows[:0]
+        postings = sorted((self.rows[self.indptr[position]:
+                                     self.indptr[position + 1]]
+                           for position in positions), key=len)
+        # look the few rows of the shortest list up in the longer lists
+        rows = postings[0]
+        for posting in postings[1:]:
+            rows = rows[_in_sorted(rows, posting)]
+        return rows
+
+
+def _in_sorted(rows, sorted_rows):
+    # which of rows are in the sorted array sorted_rows
+    if not len(sorted_rows):
+        return np.zeros(len(rows), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_rows, rows),
+                           len(sorted_rows) - 1)
+    return sorted_rows[positions] == rows
+
+
+class MovieIndex:
+    """
+    Indexes of a movie dataset that answer filter queries without scanning
+    every movie.
+
+    Years, ratings and the change in rating are kept sorted, with the row of
+    each value, so a range of values is found with two binary searches.
+    Genres are looked up in a GenreIndex of the original and of the remake,
+    and titles in a TitleIndex of trigrams. A query starts from whichever
+    filter matches the fewest movies and checks the other filters on those
+    movies only.
+
+    Build an index with MovieIndex(movie_data) or MovieIndex.load(path).
+
+    Args:
+        movie_data::pandas DataFrame
+            The movie data, with the 10 columns in MOVIE_COLUMNS.
+        original_genres::GenreIndex
+            Index of the genres of the originals. Default is to build it
+            from movie_data.
+        remake_genres::GenreIndex
+            Index of the genres of the remakes.
+    """
+
+    def __init__(self, movie_data, original_genres=None, remake_genres=None):
+        self.movie_data = movie_data
+        self.columns = []
+        for position, column in enumerate(MOVIE_COLUMNS):
+            if position in (0, 2, 5, 7):
+                values = movie_data[column].to_numpy(dtype=object)
+            else:
+                values = movie_data[column].to_numpy(dtype=np.float64,
+                                                     na_value=np.nan)
+                # ratings saved as 32 bit floats, such as 6.1, become the
+                # nearest 64 bit float, so 6.1 is in a range from 6.1
+                if position in (3, 8):
+                    values = values.round(6)
+            self.columns.append(values)
+        original_rating = self.columns[3]
+        remake_rating = self.columns[8]
+        self.values = {"original_year": self.columns[1],
+                       "remake_year": self.columns[6],
+                       "original_rating": original_rating,
+                       "remake_rating": remake_rating,
+                       # rounded like its ratings, so 7.3 - 6.1 is 1.2
+                       "rating_change": (remake_rating
+                                         - original_rating).round(6)}
+        self.orders = {}
+        self.sorted_values = {}
+        for name, values in self.values.items():
+            self.orders[name] = np.argsort(values, kind="stable")
+            self.sorted_values[name] = values[self.orders[name]]
+        # movies missing a title or genres are indexed with none
+        titles, remake_titles = [
+            [title if isinstance(title, str) else ""
+             for title in self.columns[position]] for position in (0, 5)]
+        genres, remake_genres_lists = [
+            [genre_list if isinstance(genre_list, (list, tuple)) else []
+             for genre_list in self.columns[position]]
+            for position in (2, 7)]
+        self.genres = {
+            "genre": original_genres or GenreIndex.from_lists(genres),
+            "remake_genre": remake_genres or GenreIndex.from_lists(
+                remake_genres_lists)}
+        self.titles = {"title": TitleIndex(titles),
+                       "remake_title": TitleIndex(remake_titles)}
+
+    @classmethod
+    def load(cls, path):
+        """
+        Build an index of a dataset saved by save_movie_table.
+
+        Args:
+            path::str
+                Folder the dataset was saved in.
+        Returns:
+            movie_index::MovieIndex
+        """
+        return cls(load_movie_table(path), load_genre_index(path),
+                   load_genre_index(path, "remake"))
+
+    def __len__(self):
+        return len(self.movie_data)
+
+    def _range(self, name, value_range):
+        # rows whose value is in value_range, as a view of the sorted rows
+        low, high = value_range
+        sorted_values = self.sorted_values[name]
+        start = 0 if low is None else np.searchsorted(sorted_values, low,
+                                                      side="left")
+        stop = len(sorted_values) if high is None else \
+            np.searchsorted(sorted_values, high, side="right")
+        return self.orders[name][start:max(start, stop)]
+
+    def query(self, title=None, genre=None, remake_genre=None, **ranges):
+        """
+        Find the movies that match every filter.
+
+        Args:
+            title::str
+                Text in the title of the original or the remake, ignoring
+                case, accents and punctuation.
+            genre::str
+                Genre of the original.
+            remake_genre::str
+                Genre of the remake.
+            **ranges::tuple
+                Lowest and highest value, inclusive, of any column in
+                RANGE_COLUMNS, such as original_year=(1950, 1960) or
+                rating_change=(None, -1). None leaves that end open.
+        Returns:
+            rows::numpy array
+                Row numbers of the matching movies, in the order of the
+                filter that matched the fewest movies: by value for a range,
+                or by row number. A single range or genre filter returns a
+                view of the index rather than a copy.
+        """
+        unknown = set(ranges) - set(RANGE_COLUMNS)
+        if unknown:
+            raise ValueError("can't filter by %s" % ", ".join(sorted(unknown)))
+        # rows matching each filter, found by its index
+        candidates = {name: self._range(name, value_range)
+                      for name, value_range in ranges.items()}
+        for name, value in [("genre", genre), ("remake_genre", remake_genre)]:
+            if value is not None:
+                candidates[name] = self.genres[name].rows_with(value)
+        if title is not None:
+            # titles with every trigram of title, which may not contain
+            # title itself
+            text = normalize_title(title)
+            candidates["title"] = _unique_rows(np.concatenate([
+                self.titles["title"].candidates(text),
+                self.titles["remake_title"].candidates(text)]), len(self))
+        if not candidates:
+            return np.arange(len(self))
+
+        # check every other filter on the smallest set of rows
+        smallest = min(candidates, key=lambda name: len(candidates[name]))
+        rows = candidates[smallest]
+        for name, (low, high) in ranges.items():
+            if len(rows) == 0:
+                break
+            if name == smallest:
+                continue
+            values = self.values[name][rows]
+            keep = np.ones(len(rows), dtype=bool)
+            if low is not None:
+                keep &= values >= low
+            if high is not None:
+                keep &= values <= high
+            if not keep.all():
+                rows = rows[keep]
+        for name, value in [("genre", genre), ("remake_genre", remake_genre)]:
+            if value is not None and len(rows) and name != smallest:
+                keep = _in_sorted(rows, candidates[name])
+                if not keep.all():
+                    rows = rows[keep]
+        if title is not None and len(rows):
+            if len(text) > 3:
+                rows = rows[self.titles["title"].contains(title, rows)
+                            | self.titles["remake_title"].contains(title,
+                                                                   rows)]
+            elif smallest != "title":
+                # the titles found for short text all contain it
+                keep = _in_sorted(rows, candidates["title"])
+                if not keep.all():
+                    rows = rows[keep]
+        return rows
+
+    def records(self, rows):
+        """
+        Args:
+            rows::sequence of int
+                Row numbers of movies.
+        Returns:
+            records::list of dict
+                One dictionary per movie, whose keys are the names in
+                MOVIE_COLUMNS. Missing values are None.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = []
+        for position, column in enumerate(self.columns):
+            values = column[rows].tolist()
+            if position in (0, 2, 5, 7):
+                values = [None if value is pd.NA else value
+                          for value in values]
+            else:
+                # NaN marks missing years, ratings and votes
+                integer = position in (1, 4, 6, 9)
+                values = [None if value != value else
+                          int(value) if integer else value
+                          for value in values]
+            columns.append(values)
+        return [dict(zip(MOVIE_COLUMNS, movie)) for movie in zip(*columns)]
+
+
+def _parse_range(text):
+    # "1950:1960", "1950:", ":-1" or "1950" as a pair of numbers or None
+    low, _, high = text.partition(":") if ":" in text else (text, "", text)
+    return (float(low) if low else None, float(high) if high else None)
+
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    # keep connections alive, and send small responses without waiting
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != "/movies":
+            return self._send(404, {"error": "not found"})
+        arguments = {name: values[-1] for name, values
+                     in parse_qs(url.query).items()}
+        try:
+            limit = int(arguments.pop("limit", self.server.limit))
+            filters = {name: _parse_range(value) if name in RANGE_COLUMNS
+                       else value for name, value in arguments.items()}
+            rows = self.server.index.query(**filters)
+        except (TypeError, ValueError) as error:
+            return self._send(400, {"error": str(error)})
+        self._send(200, {"count": len(rows),
+                         "movies": self.server.index.records(rows[:limit])})
+
+    def _send(self, status, body):
+        body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_server(index, host="127.0.0.1", port=8000, limit=100):
+    """
+    Make an HTTP server that answers queries on GET /movies.
+
+    The arguments of MovieIndex.query are given in the query string. Ranges
+    are written low:high, with either end left out for an open range, and a
+    single number matches that value only. limit sets how many movies are
+    returned. The response is a JSON object with the number of matching
+    movies ("count") and the first limit of them ("movies").
+
+    Args:
+        index::MovieIndex
+            Index to answer the queries with.
+        host::str
+            Address to listen on. Default is this computer only.
+        port::int
+            Port to listen on. 0 picks a free port.
+        limit::int
+            Most movies returned by default.
+    Returns:
+        server::ThreadingHTTPServer
+            The server. Start it with serve_forever.
+    """
+    server = ThreadingHTTPServer((host, port), _QueryHandler)
+    server.daemon_threads = True
+    server.index = index
+    server.limit = limit
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        "\n\n")[0])
+    parser.add_argument("dataset", help="folder of the saved dataset")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address to listen on (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000,
+                        help="port to listen on (default 8000)")
+    args = parser.parse_args()
+
+    server = make_server(MovieIndex.load(args.dataset), args.host, args.port)
+    print("serving on http://%s:%d/movies" % server.server_address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
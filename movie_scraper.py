@@ -1,11 +1,82 @@
-import requests
 import pandas as pd
-from bs4 import BeautifulSoup as soup
-from imdb import IMDb
-import re
 
+import instrumentation
+from movie_store import MovieStore, fetch_movie_record
+from page_fetcher import PageFetcher
+from wiki_api import resolve_imdb_numbers
+from wiki_parser import find_imdb_numbers, find_remake_links, \
+    parse_remake_tables
 
-def get_wiki_links():
+
+# wikipedia pages that list every movie that has been remade
+BASE_URL = "https://en.wikipedia.org"
+REMAKE_LIST_URLS = [
+    "https://en.wikipedia.org/wiki/List_of_film_remakes_(A%E2%80%93M)",
+    "https://en.wikipedia.org/wiki/List_of_film_remakes_(N%E2%80%93Z)"]
+
+MOVIE_COLUMNS = ["Original title", "Original year", "Original genre(s)",
+                 "Original rating", "Original votes", "Remake title",
+                 "Remake year", "Remake genre(s)", "Remake rating",
+                 "Remake votes"]
+
+# record field and column type of each movie's columns
+MOVIE_FIELDS = ["title", "year", "genres", "rating", "votes"]
+MOVIE_DTYPES = ["string", "Int16", object, "float32", "Int32"]
+
+
+def iter_wiki_links(fetcher=None):
+    """
+    Yield the wikipedia links of every movie that has ever been remade and
+    each of its remakes, one table at a time.
+
+    Works like get_wiki_links, but yields each pair of links as soon as the
+    table it is in has been read, instead of waiting for both pages to be
+    downloaded and read. Only one page is held in memory at a time.
+
+    Args:
+        fetcher::PageFetcher
+            Fetcher used to download the Wikipedia pages. Default is a new
+            PageFetcher.
+    Yields:
+        links::tuple
+            The link to the original movie and the link to one of its
+            remakes. A movie remade several times is in a pair for every
+            remake. Links that could not be found are "NONE".
+    """
+    if fetcher is None:
+        fetcher = PageFetcher()
+
+    for url in REMAKE_LIST_URLS:
+        # request raw html from wikipedia page
+        wiki_page = fetcher.get(url)
+
+        # find all tables on page. Ignore first one bc it doensn't contain
+        # movies
+        with instrumentation.timed("parse"):
+            wiki_table = parse_remake_tables(wiki_page.text)[1:]
+
+        # Search through main wikipedia table to find all sub-tables of
+        # movies alphabetized by first letter
+        for letter_table in wiki_table:
+            with instrumentation.timed("parse"):
+                # add wikipedia link to the base url to form complete url,
+                # with a pair for every remake of the original. If no movie
+                # link is found, record link as "NONE"
+                pairs = []
+                for original, remakes in find_remake_links(letter_table):
+                    original_link = "NONE"
+                    if original is not None:
+                        original_link = BASE_URL + original
+                    for remake in remakes or [None]:
+                        remake_link = "NONE"
+                        if remake is not None:
+                            remake_link = BASE_URL + remake
+                        pairs.append((original_link, remake_link))
+            yield from pairs
+
+
+@instrumentation.staged
+def get_wiki_links(fetcher=None):
     """
     Make a table of wikipedia links every movie that have ever been remade and
     its corresponding remake.
@@ -15,70 +86,19 @@ def get_wiki_links():
     movies are stored on the wikipedia page in tables by starting letter of
     orgininal movie. For each original movie and its corresponding remake,
     store the wikipedia url in a table. For movies that have had multiple
-    remakes, only store the url for the most recent remake.
+    remakes, store a pair of urls for every remake.
 
     Args:
-        None
+        fetcher::PageFetcher
+            Fetcher used to download the Wikipedia pages. Default is a new
+            PageFetcher.
     Returns:
         movie_data::pandas DataFrame
             movie_data is a pandas dataframe that has the following columns:
             "original link" and "remake link"
     """
-
-    # create empty lists for movie wikipedia links
-    wiki_original_links = []
-    wiki_remake_links = []
-
-    # request raw html from wikipedia pages
-    base_url = "https://en.wikipedia.org"
-    url1 = "https://en.wikipedia.org/wiki/List_of_film_remakes_(A%E2%80%93M)"
-    url2 = "https://en.wikipedia.org/wiki/List_of_film_remakes_(N%E2%80%93Z)"
-    wiki_page1 = requests.get(url1)
-    wiki_page2 = requests.get(url2)
-
-    # initialize soup object with wiki page html
-    soup_page1 = soup(wiki_page1.text, "html.parser")
-    soup_page2 = soup(wiki_page2.text, "html.parser")
-
-    # find all tables on page. Ignore first one bc it doensn't contain movies
-    table1 = soup_page1.find_all("table")[1:]
-    table2 = soup_page2.find_all("table")[1:]
-
-    # combine tables from the two wikipedia pages into one
-    wiki_table = table1 + table2
-
-    # Search through main wikipedia table to find all sub-tables of movies
-    # alphabetized by first letter
-    for letter_table in wiki_table:
-        # for each letter sub-table, find all columns of movies
-        list_of_movies = letter_table.find_all("tr")
-        # ignore first entry in list of movies bc it doesn't contain movie
-        for entry in list_of_movies[1:]:
-            # Get original movie link
-            try:
-                original_movie = entry.find_all("a")[0]
-                # add wikipedia link to the base url to form complete url and
-                # add that to the list of movie urls
-                wiki_original_links.append(base_url
-                                           + original_movie.get("href"))
-            except IndexError:
-                # If no movie link is found, record link as "NONE"
-                wiki_original_links.append("NONE")
-                continue
-
-            # Get remake movie link
-            try:
-                remake_movie = entry.find_all("a")[1]
-                # add wikipedia link to the base url to form complete url and
-                # add that to the list of movie urls
-                wiki_remake_links.append(base_url + remake_movie.get("href"))
-            except IndexError:
-                # If no movie link is found, record link as "NONE"
-                wiki_remake_links.append("NONE")
-                continue
-
-    # combine the two movie url lists into one
-    movie_data = list(zip(wiki_original_links, wiki_remake_links))
+    # combine the pairs of movie urls into one table
+    movie_data = list(iter_wiki_links(fetcher))
     column_names = ["original link", "remake link"]
 
     # create pandas dataframe with movie links
@@ -87,7 +107,31 @@ def get_wiki_links():
     return wiki_dataframe
 
 
-def get_imdb_numbers(wiki_dataframe):
+def _count_rows(reasons, originals, remakes):
+    """
+    Count the rows that lose a movie, each under the reason of the first of
+    its movies that has one.
+
+    Args:
+        reasons::dict
+            Why a movie was lost, such as "none.page_failed", for each link
+            or IMDb number of a lost movie.
+        originals::list
+            Link or IMDb number of the original of every row.
+        remakes::list
+            Link or IMDb number of the remake of every row.
+    """
+    counts = {}
+    for original, remake in zip(originals, remakes):
+        reason = reasons.get(original) or reasons.get(remake)
+        if reason is not None:
+            counts[reason] = counts.get(reason, 0) + 1
+    for reason, rows in counts.items():
+        instrumentation.count(reason, rows)
+
+
+@instrumentation.staged
+def get_imdb_numbers(wiki_dataframe, fetcher=None, use_api=False):
     """
     Make a table of IMDb numbers for every movie that has ever been remade and
     its corresponding remake.
@@ -95,69 +139,68 @@ def get_imdb_numbers(wiki_dataframe):
     Take an input pandas dataframe of Wikipedia links. For each Wikipedia link,
     search page to find external link to main IMDb page for movie. Each IMDb
     movie link contans a unique number that corresponds to only that movie.
-    Find this number for each movie.
+    Find this number for each movie. The Wikipedia pages are downloaded
+    concurrently, and a page that appears in several rows is only downloaded
+    once. With use_api, the numbers are first looked up through the Wikipedia
+    API, many movies per request, and only the pages of movies the API
+    couldn't resolve are downloaded.
 
     Args:
         wiki_dataframe::pandas DataFrame
             A dataframe that contains Wikipedia links for movies. The dataframe
             contains two columns, one for the original movie and one for the
             remake.
+        fetcher::PageFetcher
+            Fetcher used to download the Wikipedia pages. Default is a new
+            PageFetcher.
+        use_api::bool
+            If True, look up IMDb numbers through the Wikipedia API before
+            downloading any pages. Default is False.
     Returns:
         imdb_dataframe::padnas DataFrame
             A dataframe that contains IMDb numbers for movies. The dataframe
             contains two columns, one for the original movie and one for the
             remake.
     """
-
-    # create empty lists for movie imdb links
-    imdb_original_numbers = []
-    imdb_remake_numbers = []
-
-    # Find imdb numbers for all original movies
-    for wiki_link in wiki_dataframe["original link"]:
-        # set default imdb_link to be "NONE" in case of error
-        imdb_number = "NONE"
-        # request raw html from wikipedia pages
-        r = requests.get(wiki_link)
-        # Check to see if the URL is valid
-        if r.status_code == 200:
-            # initialize soup object with wiki page html
-            wiki_page = soup(r.text, "html.parser")
-            # find all links on page with class set as "external text"
-            external_links = wiki_page.find_all("a", class_="external text")
-            for link in external_links:
-                # check to see if the external link is to an IMDb movie page
-                if "https://www.imdb.com/title/" in link.get("href"):
-                    # get full imdb page url
-                    full_movie_url = link.get("href")
-                    # find the unique imdb number within url and ovewrite
-                    # default number from 'NONE" to this number
-                    imdb_number = re.search(r'\d+', full_movie_url).group()
-        # Add imdb number to list
-        imdb_original_numbers.append(imdb_number)
-
-    # Find imdb numbers for all remake movies
-    for wiki_link in wiki_dataframe["remake link"]:
-        # set default imdb_link to be "NONE" in case of error
-        imdb_number = "NONE"
-        # request raw html from wikipedia pages
-        r = requests.get(wiki_link)
-        # Check to see if the URL is valid
-        if r.status_code == 200:
-            # initialize soup object with wiki page html
-            wiki_page = soup(r.text, "html.parser")
-            # find all links on page with class set as "external text"
-            external_links = wiki_page.find_all("a", class_="external text")
-            for link in external_links:
-                # check to see if the external link is to an IMDb movie page
-                if "https://www.imdb.com/title/" in link.get("href"):
-                    # get full imdb page url
-                    full_movie_url = link.get("href")
-                    # find the unique imdb number within url and ovewrite
-                    # default number from 'NONE" to this number
-                    imdb_number = re.search(r'\d+', full_movie_url).group()
-        # Add imdb number to list
-        imdb_remake_numbers.append(imdb_number)
+    if fetcher is None:
+        fetcher = PageFetcher()
+
+    original_links = list(wiki_dataframe["original link"])
+    remake_links = list(wiki_dataframe["remake link"])
+
+    imdb_numbers = {"NONE": "NONE"}
+    if use_api:
+        imdb_numbers.update(resolve_imdb_numbers(original_links
+                                                 + remake_links, fetcher))
+
+    # download every distinct page once, skipping rows without a link and
+    # movies that were already resolved
+    links = [link for link in original_links + remake_links
+             if link not in imdb_numbers]
+    pages = fetcher.get_many(links)
+
+    # find the imdb number on every page that downloaded successfully
+    found_links = []
+    # why movies have no imdb number
+    reasons = {}
+    for link, page in pages.items():
+        if page.status_code == 200:
+            found_links.append(link)
+        else:
+            imdb_numbers[link] = "NONE"
+            reasons[link] = "none.page_failed"
+    with instrumentation.timed("parse"):
+        found_numbers = find_imdb_numbers([pages[link].text
+                                           for link in found_links])
+    imdb_numbers.update(zip(found_links, found_numbers))
+    if instrumentation.recording():
+        reasons.update((link, "none.no_imdb_link") for link, number
+                       in zip(found_links, found_numbers) if number == "NONE")
+        _count_rows(reasons, original_links, remake_links)
+
+    # look up imdb numbers for all original and remake movies
+    imdb_original_numbers = [imdb_numbers[link] for link in original_links]
+    imdb_remake_numbers = [imdb_numbers[link] for link in remake_links]
 
     # combine two imdb number lists into one
     data = list(zip(imdb_original_numbers, imdb_remake_numbers))
@@ -166,82 +209,119 @@ def get_imdb_numbers(wiki_dataframe):
     return imdb_dataframe
 
 
-def get_movie_data(imdb_dataframe):
+def make_movie_table(original_movies, remake_movies):
+    """
+    Make a typed movie data table from the records of original movies and
+    their remakes.
+
+    The table is built one column at a time. Years are stored as nullable
+    16 bit integers, ratings as 32 bit floats, votes as nullable 32 bit
+    integers and genres as lists of strings. Anything IMDb didn't have is
+    stored as a missing value (NA).
+
+    Args:
+        original_movies::list of dict
+            Records of the original movies. A movie that wasn't found is None.
+        remake_movies::list of dict
+            Records of the remakes, in the same order.
+    Returns:
+        movie_data::pandas DataFrame
+            A dataframe with the 10 columns in MOVIE_COLUMNS.
+    """
+    columns = {}
+    for names, movies in [(MOVIE_COLUMNS[:5], original_movies),
+                          (MOVIE_COLUMNS[5:], remake_movies)]:
+        for name, field, dtype in zip(names, MOVIE_FIELDS, MOVIE_DTYPES):
+            values = [None if movie is None else movie[field]
+                      for movie in movies]
+            columns[name] = pd.Series(values, dtype=dtype)
+    return pd.DataFrame(columns)
+
+
+@instrumentation.staged
+def get_movie_data(imdb_dataframe, store=None, max_workers=8,
+                   fetch=fetch_movie_record, dataset=None):
     """
     Collect data from IMDb on movies and save data to a dataframe.
 
     For each imdb number in the argument dataframe, search up the movie and
     scrape data from the IMDb page. Save the resulting data for each movie
-    into a pandas Dataframe.
+    into a pandas Dataframe. Movies are served from the movie store when
+    possible, so each movie is only looked up on IMDb once even if it appears
+    in several rows, and only movies that are new or due for a refresh are
+    looked up at all. If an offline IMDb dataset is given, movies are read
+    from it instead and nothing is looked up online.
 
     Args:
         imdb_dataframe::padnas DataFrame
             A dataframe that contains IMDb numbers for movies. The dataframe
             contains two columns, one for the original movie and one for the
             remake.
+        store::MovieStore
+            Store of previously looked up movies. Default is a new in-memory
+            store.
+        max_workers::int
+            Number of movies looked up on IMDb at the same time.
+        fetch::function
+            Function that looks up a single movie. Default is
+            fetch_movie_record, which looks the movie up on IMDb.
+        dataset::IMDbDataset
+            Offline IMDb dataset to read movies from instead of looking them
+            up online. Default is to look movies up online.
     Returns:
         movie_data::pandas DataFrame
             A dataframe that contains data on both the original and remake
             movie. The dataframe has 10 columns. They are "Original title",
             "Original year", "Original genre", "Original rating", "Original
             rating", "Original votes", "Remake title", "Remake year", "Remake
-            genre", "Remake rating", and "Remake votes".
+            genre", "Remake rating", and "Remake votes". Data that IMDb
+            doesn't have is a missing value (NA).
     """
-
-    # initialize IMDb module
-    ia = IMDb()
-
-    # create pandas DataFrame
-    index = range(len(imdb_dataframe))
-
-    column_names = ["Original title", "Original year", "Original genre(s)",
-                    "Original rating", "Original votes", "Remake title",
-                    "Remake year", "Remake genre(s)", "Remake rating",
-                    "Remake votes"]
-
-    movie_data = pd.DataFrame(index=index, columns=column_names)
-
-    for row in range(len(imdb_dataframe)):
-        try:
-            original_movie = ia.get_movie(imdb_dataframe["original"][row])
-            original_title = original_movie["title"]
-            original_year = original_movie["year"]
-            original_genre = original_movie["genre"]
-            original_rating = float(original_movie["rating"])
-            original_votes = int(original_movie["votes"])
-
-            remake_movie = ia.get_movie(imdb_dataframe["remake"][row])
-            remake_title = remake_movie["title"]
-            remake_year = remake_movie["year"]
-            remake_genre = remake_movie["genre"]
-            remake_rating = float(remake_movie["rating"])
-            remake_votes = int(remake_movie["votes"])
-
-            row_data = [original_title, original_year, original_genre,
-                        original_rating, original_votes, remake_title,
-                        remake_year, remake_genre, remake_rating,
-                        remake_votes]
-        except KeyError:
-            row_data = ["NONE" for column in range(10)]
-
-        movie_data.loc[row] = row_data
+    # read movies from the offline dataset if there is one
+    if dataset is not None:
+        store = dataset
+    elif store is None:
+        store = MovieStore()
+
+    # look up every distinct movie once
+    original_numbers = list(imdb_dataframe["original"])
+    remake_numbers = list(imdb_dataframe["remake"])
+    records = store.lookup(original_numbers + remake_numbers, fetch=fetch,
+                           max_workers=max_workers)
+    if instrumentation.recording():
+        _count_rows({number: "none.movie_not_found" for number
+                     in original_numbers + remake_numbers
+                     if number not in records and number != "NONE"},
+                    original_numbers, remake_numbers)
+
+    movie_data = make_movie_table(
+        [records.get(number) for number in original_numbers],
+        [records.get(number) for number in remake_numbers])
 
     return movie_data
 
 
+@instrumentation.staged
 def clean_dataframe(dataframe):
     """
-    Remove rows in pandas DataFrame if they contain "NONE" in any column
+    Remove rows in pandas DataFrame if they contain "NONE" or a missing value
+    in any column
 
     Args:
         dataframe::pandas DataFrame
     Returns:
         dataframe::pandas DataFrame
-            Cleaned up dataframe. Does not contain any "NONE"
+            Cleaned up dataframe. Does not contain any "NONE" or missing values
     """
-    df = dataframe
-    for column in list(df):
-        none_index = df[df[column] == "NONE"].index
-        df = df.drop(none_index)
+    # only text columns can contain "NONE"
+    text_columns = dataframe.select_dtypes(include=["object", "string"])
+    bad = dataframe.isna() | text_columns.eq("NONE").reindex(
+        columns=dataframe.columns, fill_value=False)
+    drop = bad.any(axis=1)
+    if instrumentation.recording():
+        # count each dropped row under the first column it is missing
+        for column, rows in bad[drop].idxmax(axis=1).value_counts().items():
+            instrumentation.count("dropped.%s" % column, int(rows))
+    df = dataframe[~drop.to_numpy(dtype=bool)]
     df.index = range(len(df))
     return df
@@ -0,0 +1,215 @@
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+from rate_limiter import THROTTLE_STATUS_CODES, RequestScheduler
+
+# fields kept for every movie
+FIELDS = ["title", "year", "genres", "rating", "votes"]
+
+# every thread gets its own IMDb module, since they are not thread safe
+_local = threading.local()
+
+# all lookups share one scheduler, so every thread slows down together when
+# IMDb starts throttling
+IMDB_HOST = "www.imdb.com"
+IMDB_SCHEDULER = RequestScheduler(concurrency=4, max_concurrency=16)
+
+
+def _classify_imdb_result(result):
+    # errors getting data from IMDb are usually network problems or
+    # throttling, which can go away on a retry. Other errors won't
+    from imdb import IMDbDataAccessError
+
+    if not isinstance(result, IMDbDataAccessError):
+        return "ok", None
+    details = result.args[0] if result.args else None
+    if isinstance(details, dict) and \
+            details.get("errcode") in THROTTLE_STATUS_CODES:
+        return "throttled", None
+    return "errors", None
+
+
+def fetch_movie_record(imdb_number, scheduler=None):
+    """
+    Look up a movie on IMDb and keep only the fields used in the analysis.
+
+    Args:
+        imdb_number::str
+            IMDb number of the movie.
+        scheduler::RequestScheduler
+            Scheduler that limits and retries the lookups. Default is
+            IMDB_SCHEDULER, which every lookup shares.
+    Returns:
+        record::dict
+            A dictionary with the keys "title", "year", "genres", "rating"
+            and "votes". Fields that IMDb doesn't have for the movie are None.
+            If the movie could not be looked up at all, returns None.
+    """
+    # imdb is only imported once a movie is looked up online
+    from imdb import IMDb
+
+    if not hasattr(_local, "ia"):
+        _local.ia = IMDb()
+    if scheduler is None:
+        scheduler = IMDB_SCHEDULER
+    instrumentation.count("imdb.lookups")
+    # besides IMDbError, IMDbPY can fail with any error on a page it can't
+    # parse. That only loses this movie, not the whole batch of lookups
+    try:
+        with instrumentation.timed("imdb"):
+            movie = scheduler.call(IMDB_HOST,
+                                   lambda: _local.ia.get_movie(imdb_number),
+                                   _classify_imdb_result)
+        rating = movie.get("rating")
+        votes = movie.get("votes")
+        return {"title": movie.get("title"),
+                "year": movie.get("year"),
+                "genres": movie.get("genre"),
+                "rating": None if rating is None else float(rating),
+                "votes": None if votes is None else int(votes)}
+    except Exception:
+        instrumentation.count("imdb.failed")
+        return None
+
+
+class MovieStore:
+    """
+    Single file store of IMDb movie records, keyed by IMDb number.
+
+    Ratings and votes keep changing on IMDb, so a record older than
+    refresh_after seconds is treated as missing and looked up again.
+
+    Args:
+        path::str
+            Path of the SQLite file. Default is ":memory:", which only
+            remembers movies for as long as the store is open.
+        refresh_after::float
+            Number of seconds before a record is looked up again. Default is
+            30 days.
+    """
+
+    def __init__(self, path=":memory:", refresh_after=30 * 24 * 3600):
+        self.refresh_after = refresh_after
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS movies (
+            imdb_number TEXT PRIMARY KEY,
+            title TEXT,
+            year INTEGER,
+            genres TEXT,
+            rating REAL,
+            votes INTEGER,
+            fetched_at REAL NOT NULL)""")
+        self._db.commit()
+
+    def get_many(self, imdb_numbers):
+        """
+        Get the stored records that are not due for a refresh.
+
+        Args:
+            imdb_numbers::iterable of str
+                IMDb numbers of the movies.
+        Returns:
+            records::dict
+                A dictionary whose keys are IMDb numbers and whose values are
+                records. Movies that are not stored or are due for a refresh
+                are left out.
+        """
+        imdb_numbers = list(dict.fromkeys(imdb_numbers))
+        oldest = time.time() - self.refresh_after
+        records = {}
+        with self._lock:
+            # sqlite limits the number of parameters in one query
+            for start in range(0, len(imdb_numbers), 500):
+                batch = imdb_numbers[start:start + 500]
+                rows = self._db.execute(
+                    "SELECT imdb_number, title, year, genres, rating, votes "
+                    "FROM movies WHERE fetched_at >= ? AND imdb_number IN "
+                    "(%s)" % ",".join("?" * len(batch)),
+                    [oldest] + batch).fetchall()
+                for row in rows:
+                    record = dict(zip(FIELDS, row[1:]))
+                    if record["genres"] is not None:
+                        record["genres"] = json.loads(record["genres"])
+                    records[row[0]] = record
+        return records
+
+    def put_many(self, records):
+        """
+        Store records, replacing any older record of the same movie.
+
+        Args:
+            records::dict
+                A dictionary whose keys are IMDb numbers and whose values are
+                records.
+        """
+        now = time.time()
+        rows = []
+        for imdb_number, record in records.items():
+            genres = record["genres"]
+            rows.append((imdb_number, record["title"], record["year"],
+                         None if genres is None else json.dumps(list(genres)),
+                         record["rating"], record["votes"], now))
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO movies VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows)
+            self._db.commit()
+
+    def lookup(self, imdb_numbers, fetch=fetch_movie_record, max_workers=8,
+               batch_size=64):
+        """
+        Get records for movies, only looking up movies that are not stored or
+        are due for a refresh.
+
+        Missing movies are looked up in parallel, in batches of batch_size.
+        Each batch is saved as soon as it finishes, so an interrupted lookup
+        keeps the movies it already found.
+
+        Args:
+            imdb_numbers::iterable of str
+                IMDb numbers of the movies.
+            fetch::function
+                Function that takes an IMDb number and returns a record, or
+                None if the movie could not be looked up. Default is
+                fetch_movie_record.
+            max_workers::int
+                Number of movies looked up at the same time.
+            batch_size::int
+                Number of movies looked up before saving to the store.
+        Returns:
+            records::dict
+                A dictionary whose keys are IMDb numbers and whose values are
+                records. Movies that could not be looked up are left out.
+        """
+        imdb_numbers = [number for number in dict.fromkeys(imdb_numbers)
+                        if number != "NONE"]
+        records = self.get_many(imdb_numbers)
+        missing = [number for number in imdb_numbers if number not in records]
+
+        # only start threads if there is more than one movie to look up
+        pool = None
+        fetch_all = map
+        if max_workers > 1 and len(missing) > 1:
+            pool = ThreadPoolExecutor(max_workers=max_workers)
+            fetch_all = pool.map
+        try:
+            for start in range(0, len(missing), batch_size):
+                batch = missing[start:start + batch_size]
+                found = {number: record for number, record
+                         in zip(batch, fetch_all(fetch, batch))
+                         if record is not None}
+                self.put_many(found)
+                records.update(found)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return records
+
+    def close(self):
+        with self._lock:
+            self._db.close()
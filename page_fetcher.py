@@ -0,0 +1,134 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import instrumentation
+from rate_limiter import RequestScheduler
+
+# a downloaded page. status_code is None if the request itself failed
+Page = namedtuple("Page", ["url", "status_code", "text"])
+
+USER_AGENT = ("movie-remake-analysis/1.0 "
+              "(https://github.com/ctallum/movie-remake-analysis)")
+
+
+def make_session(pool_size=16):
+    """
+    Make a requests Session that keeps connections alive between requests.
+
+    Args:
+        pool_size::int
+            Number of connections to keep open per host.
+    Returns:
+        session::requests Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+class PageFetcher:
+    """
+    Download web pages concurrently over a pool of keep-alive connections.
+
+    Args:
+        max_workers::int
+            Maximum number of pages downloaded at the same time.
+        per_host::int
+            Number of pages downloaded at the same time from any one host to
+            start with. The scheduler raises this up to max_workers while
+            the host keeps up, and lowers it when the host throttles.
+        delay::float
+            Minimum average number of seconds between the start of two
+            requests to the same host.
+        timeout::float
+            Seconds to wait for a server before giving up on a page.
+        session::requests Session
+            Session to send requests through. Default is a new pooled
+            session sized to max_workers.
+        cache::HTTPCache
+            On-disk cache to serve pages from. Default is no cache.
+        scheduler::RequestScheduler
+            Scheduler that limits and retries the requests, which can be
+            shared between fetchers. Default is a new scheduler made from
+            per_host, max_workers and delay.
+    """
+
+    def __init__(self, max_workers=8, per_host=4, delay=0.0, timeout=30,
+                 session=None, cache=None, scheduler=None):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.scheduler = scheduler or RequestScheduler(
+            rate=1 / delay if delay else None, concurrency=per_host,
+            max_concurrency=max_workers)
+        self.session = session or make_session(max_workers)
+        self.cache = cache
+
+    def _send_once(self, url, headers):
+        instrumentation.count("requests")
+        with instrumentation.timed("network"):
+            response = self.session.get(url, headers=headers,
+                                        timeout=self.timeout)
+        instrumentation.count("bytes", len(response.content))
+        return response
+
+    def _send(self, url, headers):
+        return self.scheduler.request(url, lambda: self._send_once(url,
+                                                                   headers))
+
+    def get(self, url):
+        """
+        Download a single page.
+
+        Args:
+            url::str
+                Url of the page.
+        Returns:
+            page::Page
+                The downloaded page. Throttled requests, server errors and
+                timeouts are retried by the scheduler first. If the request
+                still fails, the status code is None and the text is empty.
+        """
+        try:
+            if self.cache is not None:
+                return self.cache.get(url, self._send)
+            r = self._send(url, {})
+        except requests.RequestException:
+            return Page(url, None, "")
+        return Page(url, r.status_code, r.text)
+
+    def get_many(self, urls):
+        """
+        Download many pages concurrently. Each distinct url is only
+        downloaded once, no matter how many times it appears in urls.
+
+        Args:
+            urls::iterable of str
+                Urls of the pages.
+        Returns:
+            pages::dict
+                A dictionary whose keys are the distinct urls and whose values
+                are the downloaded Pages.
+        """
+        # dict.fromkeys drops repeated urls but keeps their order
+        unique_urls = list(dict.fromkeys(urls))
+        if not unique_urls:
+            return {}
+        workers = min(self.max_workers, len(unique_urls))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pages = pool.map(self.get, unique_urls)
+            return dict(zip(unique_urls, pages))
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
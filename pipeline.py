@@ -0,0 +1,537 @@
+import json
+import os
+import queue
+import shutil
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from dataset_io import (MovieTableWriter, load_movie_table, replace_folder,
+                        save_movie_table)
+from movie_scraper import (MOVIE_COLUMNS, get_wiki_links, get_imdb_numbers,
+                           get_movie_data, clean_dataframe, iter_wiki_links,
+                           make_movie_table)
+from movie_store import MovieStore
+from page_fetcher import PageFetcher
+from rating_aggregates import RatingAggregates
+from remake_graph import RemakeGraph
+from validation import (MOVIE_RULES, invalid_rows, save_report,
+                        validate_movie_table)
+from wiki_parser import find_imdb_number
+
+LINK_COLUMNS = ["original link", "remake link"]
+# what is remembered of every processed pair: its links, its imdb numbers
+# and its row in the saved dataset, or -1 if it was left out
+PROCESSED_COLUMNS = LINK_COLUMNS + ["original", "remake", "row"]
+
+# put on a queue after the last item
+_DONE = object()
+
+# most pairs looked up in the movie store at once by stream_pipeline
+LOOKUP_BATCH_SIZE = 16
+
+
+def _save(dataframe, path):
+    # write to a temporary file first so a crash never leaves half a file
+    dataframe.to_pickle(path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+def _save_run(run, path):
+    # write the state of a run without ever leaving half a file
+    with open(path + ".tmp", "w") as f:
+        json.dump(run, f)
+    os.replace(path + ".tmp", path)
+
+
+def _finish_run(path):
+    """
+    Move the saved dataset and links of a run into place and delete its
+    progress. Can be called again after a crash part way through.
+    """
+    data_path = os.path.join(path, "movie_dataset")
+    replace_folder(data_path + ".new", data_path)
+    links_path = os.path.join(path, "links.pkl")
+    if os.path.exists(links_path + ".new"):
+        os.replace(links_path + ".new", links_path)
+    for name in ["imdb_numbers", "movie_data"]:
+        shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+    for name in ["pending.pkl", "all_links.pkl"]:
+        if os.path.exists(os.path.join(path, name)):
+            os.remove(os.path.join(path, name))
+    # the run is finished, so its progress is no longer needed
+    os.remove(os.path.join(path, "run.json"))
+
+
+def _listed(links, other_links):
+    # which link pairs of links are also in other_links
+    listed = set(zip(other_links["original link"],
+                     other_links["remake link"]))
+    return np.array([pair in listed for pair in zip(links["original link"],
+                                                    links["remake link"])],
+                    dtype=bool)
+
+
+def _new_links(links, processed_links):
+    # find link pairs that were not processed in an earlier run. Pairs that
+    # were left out, such as after a page failed to download, are tried again
+    kept = processed_links[processed_links["row"] >= 0]
+    new_links = links[~_listed(links, kept)]
+    new_links.index = range(len(new_links))
+    return new_links
+
+
+def _graph_of(graph, originals, remakes):
+    # a graph of only some of the pairs of graph, with graph's ratings
+    ratings = np.append(np.asarray(graph.ratings, dtype=np.float64), np.nan)
+    return RemakeGraph.from_pairs(originals, remakes,
+                                  ratings[graph.nodes(originals)],
+                                  ratings[graph.nodes(remakes)])
+
+
+def _drop_invalid(movie_data, path):
+    # leave out rows that break a validation rule, and save which they were
+    report = validate_movie_table(movie_data)
+    save_report(report, os.path.join(path, "validation.json"))
+    for rule, rows in report.items():
+        if len(rows):
+            instrumentation.count("dropped.%s" % rule, len(rows))
+    movie_data = movie_data[~invalid_rows(report, len(movie_data))]
+    movie_data.index = range(len(movie_data))
+    return movie_data
+
+
+def _run_stage(name, inputs, path, chunk_size, stage_function):
+    """
+    Run a stage over inputs one chunk at a time, saving each finished chunk.
+
+    Chunks that were saved by an earlier, interrupted run are loaded instead
+    of being run again.
+    """
+    os.makedirs(os.path.join(path, name), exist_ok=True)
+    outputs = []
+    for start in range(0, len(inputs), chunk_size):
+        part_path = os.path.join(path, name, "part-%06d.pkl"
+                                 % (start // chunk_size))
+        if os.path.exists(part_path):
+            outputs.append(pd.read_pickle(part_path))
+            continue
+        chunk = inputs[start:start + chunk_size]
+        chunk.index = range(len(chunk))
+        output = stage_function(chunk)
+        _save(output, part_path)
+        outputs.append(output)
+    if not outputs:
+        return stage_function(inputs)
+    return pd.concat(outputs, ignore_index=True)
+
+
+@instrumentation.staged
+def run_pipeline(path, incremental=False, chunk_size=100, fetcher=None,
+                 store=None, dataset=None):
+    """
+    Scrape movie data, saving progress to disk so an interrupted run can pick
+    up where it left off.
+
+    Runs get_wiki_links, get_imdb_numbers and get_movie_data in turn. The
+    last two stages work through the movies chunk_size rows at a time and
+    save every finished chunk, so calling run_pipeline again after a crash
+    only redoes the chunk that was in progress.
+
+    In incremental mode, the Wikipedia link table is compared against the
+    links processed by earlier runs and only new or changed pairs are
+    scraped, along with pairs that earlier runs had to leave out, such as
+    after a page failed to download. Their movie data is appended to the
+    saved dataset. Pairs that are no longer listed on Wikipedia, such as an
+    original whose remake link changed, are taken out of the dataset, its
+    totals and its graph.
+
+    Everything is saved in the directory path:
+        movie_dataset/: the cleaned movie dataset, saved by
+        save_movie_table, the totals of its ratings, saved by
+        RatingAggregates.save, and the graph of which movies are remakes of
+        which, saved by RemakeGraph.save.
+        links.pkl: every link pair that has been processed, with its IMDb
+        numbers and its row in the dataset.
+        validation.json: the rows of the last run that broke a rule of
+        validate_movie_table and were left out of the dataset.
+        run.json, pending.pkl, imdb_numbers/, movie_data/: progress of a run
+        that hasn't finished yet.
+        movie_dataset.new/, links.pkl.new: the results of a run, saved in
+        full before they replace movie_dataset/ and links.pkl, so a crash
+        while saving never leaves half a dataset or adds rows twice.
+
+    Args:
+        path::str
+            Directory to save the dataset and progress in.
+        incremental::bool
+            If True, only scrape link pairs that were not processed before, or
+            were left out, and add them to the saved dataset. If False,
+            scrape every pair and replace the saved dataset.
+        chunk_size::int
+            Number of rows to finish before saving progress. A resumed run
+            keeps the chunk size it was started with.
+        fetcher::PageFetcher
+            Fetcher used to download Wikipedia pages.
+        store::MovieStore
+            Store of previously looked up movies.
+        dataset::IMDbDataset
+            Offline IMDb dataset to read movies from instead of looking them
+            up online.
+    Returns:
+        movie_data::pandas DataFrame
+            The full cleaned movie dataset, including rows from earlier runs
+            in incremental mode.
+    """
+    os.makedirs(path, exist_ok=True)
+    # share one fetcher and store between all the chunks
+    if fetcher is None:
+        fetcher = PageFetcher()
+    if store is None and dataset is None:
+        store = MovieStore()
+    run_path = os.path.join(path, "run.json")
+    pending_path = os.path.join(path, "pending.pkl")
+    links_path = os.path.join(path, "links.pkl")
+    data_path = os.path.join(path, "movie_dataset")
+
+    if os.path.exists(run_path):
+        with open(run_path) as f:
+            run = json.load(f)
+        if run.get("saved"):
+            # the run crashed after saving its results, so only move them
+            # into place
+            _finish_run(path)
+            return load_movie_table(data_path, mmap=False)
+        # resume the unfinished run with the same links and mode, and the
+        # chunk size its saved chunks were made with
+        incremental = run["incremental"]
+        chunk_size = run["chunk_size"]
+        pending = pd.read_pickle(pending_path)
+        links = pd.read_pickle(os.path.join(path, "all_links.pkl"))
+    else:
+        links = clean_dataframe(get_wiki_links(fetcher))
+        pending = links
+        if incremental and os.path.exists(links_path):
+            pending = _new_links(links, pd.read_pickle(links_path))
+        _save(links, os.path.join(path, "all_links.pkl"))
+        _save(pending, pending_path)
+        run = {"incremental": incremental, "chunk_size": chunk_size}
+        _save_run(run, run_path)
+
+    imdb_dataframe = _run_stage(
+        "imdb_numbers", pending, path, chunk_size,
+        lambda chunk: get_imdb_numbers(chunk, fetcher))
+    movie_data = _run_stage(
+        "movie_data", imdb_dataframe, path, chunk_size,
+        lambda chunk: get_movie_data(chunk, store=store, dataset=dataset))
+    # the graph keeps every pair with both imdb numbers, even if a movie is
+    # missing data
+    graph = RemakeGraph.from_pairs(
+        imdb_dataframe["original"], imdb_dataframe["remake"],
+        movie_data[MOVIE_COLUMNS[3]], movie_data[MOVIE_COLUMNS[8]])
+    # remember which pair every row that is kept came from
+    movie_data["pair"] = np.arange(len(movie_data))
+    movie_data = _drop_invalid(clean_dataframe(movie_data), path)
+    rows = np.full(len(pending), -1, dtype=np.int64)
+    rows[movie_data.pop("pair").to_numpy()] = np.arange(len(movie_data))
+    processed = pending[LINK_COLUMNS].reset_index(drop=True)
+    processed["original"] = imdb_dataframe["original"].to_numpy()
+    processed["remake"] = imdb_dataframe["remake"].to_numpy()
+    processed["row"] = rows
+
+    # add to or replace the saved dataset and its totals of the ratings
+    aggregates = RatingAggregates()
+    if incremental and os.path.exists(links_path) and \
+            os.path.exists(data_path):
+        saved_data = load_movie_table(data_path, mmap=False)
+        saved_aggregates = RatingAggregates.load(data_path)
+        if saved_aggregates is not None and \
+                saved_aggregates.rows == len(saved_data):
+            aggregates = saved_aggregates
+        else:
+            aggregates.add(saved_data)
+
+        # take out the rows of pairs that are no longer on wikipedia
+        saved = pd.read_pickle(links_path)
+        listed = _listed(saved, links)
+        saved_rows = saved["row"].to_numpy()
+        keep = np.ones(len(saved_data), dtype=bool)
+        keep[saved_rows[~listed & (saved_rows >= 0)]] = False
+        aggregates.remove(saved_data[~keep])
+        saved_data = saved_data[keep]
+        # number the rows that are left again. Pairs that were left out were
+        # tried again in this run, so only the pairs with a row are kept
+        new_rows = np.append(np.cumsum(keep) - 1, -1)
+        saved = saved[listed & (saved_rows >= 0)].reset_index(drop=True)
+        saved["row"] = new_rows[saved["row"].to_numpy()]
+        processed["row"] = np.where(rows >= 0, rows + len(saved_data), -1)
+
+        movie_data = pd.concat([saved_data, movie_data], ignore_index=True)
+        processed = pd.concat([saved, processed], ignore_index=True)
+        saved_graph = RemakeGraph.load(data_path, mmap=False)
+        if saved_graph is not None:
+            graph = _graph_of(saved_graph, saved["original"],
+                              saved["remake"]).merge(graph)
+    aggregates.add(movie_data[aggregates.rows:])
+
+    # save everything next to the old results and mark the run as saved
+    # before replacing them, so a resumed run never adds the rows again
+    save_movie_table(movie_data, data_path + ".new")
+    aggregates.save(data_path + ".new")
+    graph.save(data_path + ".new")
+    _save(processed[PROCESSED_COLUMNS], links_path + ".new")
+    run["saved"] = True
+    _save_run(run, run_path)
+    _finish_run(path)
+
+    return movie_data
+
+
+def _start_stage(function, inbox, outbox, workers, failures,
+                 batch_size=None):
+    """
+    Start threads that run function on every item from inbox and put the
+    results that aren't None on outbox. Puts _DONE on outbox once inbox is
+    finished and every thread has stopped.
+
+    With batch_size, function is instead given a list of up to batch_size
+    items that were waiting on inbox, and returns a list of results.
+    """
+    def work():
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                # pass the marker on so the other threads stop too
+                inbox.put(_DONE)
+                return
+            # take whatever else is waiting, without waiting for more
+            items = [item]
+            while batch_size is not None and len(items) < batch_size:
+                try:
+                    item = inbox.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    inbox.put(_DONE)
+                    break
+                items.append(item)
+            # after a failure, keep emptying the queue so nothing blocks
+            if failures:
+                continue
+            try:
+                if batch_size is None:
+                    results = [function(items[0])]
+                else:
+                    results = function(items)
+            except Exception as error:
+                failures.append(error)
+                continue
+            for result in results:
+                if result is not None:
+                    outbox.put(result)
+
+    threads = [threading.Thread(target=work, daemon=True)
+               for worker in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    def finish():
+        for thread in threads:
+            thread.join()
+        outbox.put(_DONE)
+
+    threading.Thread(target=finish, daemon=True).start()
+
+
+@instrumentation.staged
+def stream_pipeline(path, fetcher=None, store=None, dataset=None,
+                    batch_size=100, queue_size=100, resolve_workers=8,
+                    lookup_workers=8):
+    """
+    Scrape movie data with every stage running at the same time.
+
+    Pairs of Wikipedia links are passed on as soon as each table of the
+    remake lists is read, IMDb numbers are found while the lists are still
+    being read, and movies are looked up as soon as both of their IMDb numbers
+    are known, in batches of whatever pairs are waiting. Every Wikipedia
+    article is read once, even when two pairs need it at the same time. The
+    stages are connected by queues of at most queue_size items, so a slow
+    stage holds up the stages before it instead of letting work pile up in
+    memory. Finished rows are checked and added to the end of the saved
+    dataset batch_size rows at a time, so the dataset is never held in memory
+    while it is scraped.
+
+    Rows are finished in whichever order their lookups complete, so the order
+    of the rows can differ from run to run. Rows that would be removed by
+    clean_dataframe are left out, as are rows that break a rule of
+    validate_movie_table, which are listed in validation.json. Unlike
+    run_pipeline, an interrupted streaming run starts over.
+
+    Args:
+        path::str
+            Directory to save the dataset in. The dataset is saved in
+            movie_dataset/ by save_movie_table, along with the totals of its
+            ratings and the graph of which movies are remakes of which.
+        fetcher::PageFetcher
+            Fetcher used to download Wikipedia pages.
+        store::MovieStore
+            Store of previously looked up movies.
+        dataset::IMDbDataset
+            Offline IMDb dataset to read movies from instead of looking them
+            up online.
+        batch_size::int
+            Number of finished rows saved to disk at a time.
+        queue_size::int
+            Maximum number of items waiting between two stages.
+        resolve_workers::int
+            Number of Wikipedia articles read at the same time.
+        lookup_workers::int
+            Number of movie pairs looked up at the same time.
+    Returns:
+        movie_data::pandas DataFrame
+            The cleaned movie dataset, loaded by load_movie_table.
+    """
+    os.makedirs(path, exist_ok=True)
+    if fetcher is None:
+        fetcher = PageFetcher()
+    if dataset is not None:
+        store = dataset
+    elif store is None:
+        store = MovieStore()
+
+    # remember the imdb number of every article, since movies that were
+    # remade several times appear in several pairs. An article that is still
+    # being read has a future the other workers wait on
+    none = Future()
+    none.set_result("NONE")
+    imdb_numbers = {"NONE": none}
+    imdb_numbers_lock = threading.Lock()
+
+    def find_number(link):
+        with imdb_numbers_lock:
+            future = imdb_numbers.get(link)
+            reader = future is None
+            if reader:
+                future = imdb_numbers[link] = Future()
+        if reader:
+            try:
+                future.set_result(read_number(link))
+            except Exception as error:
+                future.set_exception(error)
+        return future.result()
+
+    # why an article has no imdb number, written before its future is set
+    reasons = {}
+
+    def read_number(link):
+        page = fetcher.get(link)
+        number = "NONE"
+        if page.status_code == 200:
+            with instrumentation.timed("parse"):
+                number = find_imdb_number(page.text)
+            if number == "NONE":
+                reasons[link] = "none.no_imdb_link"
+        else:
+            reasons[link] = "none.page_failed"
+        return number
+
+    def resolve(links):
+        numbers = (find_number(links[0]), find_number(links[1]))
+        if "NONE" in numbers:
+            # count the row under the first of its movies without a number
+            instrumentation.count(reasons.get(links[0])
+                                  or reasons[links[1]])
+            return None
+        return numbers
+
+    def look_up(batch):
+        # one store lookup for every pair in the batch
+        records = store.lookup([number for numbers in batch
+                                for number in numbers], max_workers=1)
+        rows = []
+        for numbers in batch:
+            movies = (records.get(numbers[0]), records.get(numbers[1]))
+            # leave out pairs that clean_dataframe would remove
+            if any(movie is None or None in movie.values()
+                   for movie in movies):
+                continue
+            rows.append((numbers, movies))
+        return rows
+
+    failures = []
+    links_queue = queue.Queue(queue_size)
+    numbers_queue = queue.Queue(queue_size)
+    rows_queue = queue.Queue(queue_size)
+
+    def read_links():
+        try:
+            for links in iter_wiki_links(fetcher):
+                if failures:
+                    break
+                if "NONE" not in links:
+                    links_queue.put(links)
+        except Exception as error:
+            failures.append(error)
+        finally:
+            links_queue.put(_DONE)
+
+    threading.Thread(target=read_links, daemon=True).start()
+    _start_stage(resolve, links_queue, numbers_queue, resolve_workers,
+                 failures)
+    _start_stage(look_up, numbers_queue, rows_queue, lookup_workers,
+                 failures, batch_size=LOOKUP_BATCH_SIZE)
+
+    # add finished rows to the dataset in batches as they arrive. Only the
+    # totals of the ratings, the rows that broke a rule and the imdb numbers
+    # and ratings of the pairs that are kept, for the remake graph, stay in
+    # memory
+    data_path = os.path.join(path, "movie_dataset")
+    aggregates = RatingAggregates()
+    report = {rule.name: [np.zeros(0, dtype=np.int64)]
+              for rule in MOVIE_RULES}
+    pairs = []
+    streamed = 0
+    rows = []
+    with MovieTableWriter(data_path) as writer:
+        while True:
+            row = rows_queue.get()
+            if row is not _DONE:
+                rows.append(row)
+            if len(rows) == batch_size or (row is _DONE and rows):
+                movie_data = make_movie_table(
+                    [movies[0] for _, movies in rows],
+                    [movies[1] for _, movies in rows])
+                batch_report = validate_movie_table(movie_data)
+                for rule, bad_rows in batch_report.items():
+                    report[rule].append(bad_rows + streamed)
+                valid = ~invalid_rows(batch_report, len(rows))
+                movie_data = movie_data[valid]
+                writer.append(movie_data)
+                aggregates.add(movie_data)
+                numbers = np.array([numbers for numbers, _ in rows],
+                                   dtype=np.int64).reshape(-1, 2)[valid]
+                pairs.append((numbers[:, 0], numbers[:, 1],
+                              movie_data[MOVIE_COLUMNS[3]].to_numpy(),
+                              movie_data[MOVIE_COLUMNS[8]].to_numpy()))
+                streamed += len(rows)
+                rows = []
+            if row is _DONE:
+                break
+        if failures:
+            raise failures[0]
+
+    report = {rule: np.concatenate(bad_rows)
+              for rule, bad_rows in report.items()}
+    save_report(report, os.path.join(path, "validation.json"))
+    for rule, bad_rows in report.items():
+        if len(bad_rows):
+            instrumentation.count("dropped.%s" % rule, len(bad_rows))
+    aggregates.save(data_path)
+    columns = [np.concatenate(column) for column in zip(*pairs)] or \
+        [[], [], [], []]
+    RemakeGraph.from_pairs(*columns).save(data_path)
+
+    return load_movie_table(data_path)
@@ -0,0 +1,287 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import instrumentation
+
+# responses that mean the server wants fewer requests
+THROTTLE_STATUS_CODES = {429, 503}
+# responses that mean the server had a problem that may go away
+RETRY_STATUS_CODES = {500, 502, 504}
+
+
+def retry_after_seconds(value, now=None):
+    """
+    Read a Retry-After header, which is either a number of seconds or a date.
+
+    Args:
+        value::str
+            Value of the header, or None.
+        now::float
+            Current time as a unix timestamp. Default is time.time().
+    Returns:
+        seconds::float
+            Seconds to wait, or None if the header is missing or unreadable.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if now is None:
+        now = time.time()
+    return max(0.0, date.timestamp() - now)
+
+
+class TokenBucket:
+    """
+    Allow rate events per second on average, with bursts of up to burst
+    events.
+
+    Args:
+        rate::float
+            Tokens added per second.
+        burst::int
+            Most tokens the bucket can hold.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token, going into debt if there are none left.
+
+        Returns:
+            wait::float
+                Seconds to wait before the token can be used.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens
+                               + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class _Host:
+    # everything the scheduler knows about one host
+    def __init__(self, limit, bucket):
+        self.limit = limit
+        self.bucket = bucket
+        self.in_flight = 0
+        self.successes = 0
+        self.resume_at = 0.0
+        self.next_decrease = 0.0
+        self.condition = threading.Condition()
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0,
+                      "retries": 0, "limit": limit, "peak_limit": limit}
+
+
+class RequestScheduler:
+    """
+    Share out requests to each host so that they go as fast as the host
+    allows.
+
+    Every host gets a token bucket that limits how many requests start per
+    second, and a limit on how many requests are in flight at once. The limit
+    grows by one after every limit requests in a row that succeed, and halves
+    when the host throttles or fails a request, so it settles around
+    whatever the host tolerates. Throttled and failed requests are retried
+    after an exponential backoff with random jitter. If the host says how
+    long to wait with a Retry-After header, every request to the host waits
+    that long instead.
+
+    Args:
+        rate::float
+            Requests started per second for each host. Default is no limit.
+        burst::int
+            Requests that can start at once before rate applies.
+        concurrency::int
+            Starting limit of requests in flight to each host.
+        max_concurrency::int
+            Highest the limit of requests in flight can grow.
+        retries::int
+            Times a request is retried before giving up.
+        backoff::float
+            Seconds to wait before the first retry. Each retry waits up to
+            twice as long as the one before.
+        max_backoff::float
+            Most seconds to wait before a retry, unless the host asks for
+            longer with a Retry-After header.
+        host_rates::dict
+            Rates of particular hosts, overriding rate.
+    """
+
+    def __init__(self, rate=None, burst=1, concurrency=4, max_concurrency=16,
+                 retries=3, backoff=0.5, max_backoff=60.0, host_rates=None):
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.max_concurrency = max(max_concurrency, concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.host_rates = host_rates or {}
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host):
+        with self._lock:
+            if host not in self._hosts:
+                rate = self.host_rates.get(host, self.rate)
+                bucket = TokenBucket(rate, self.burst) if rate else None
+                self._hosts[host] = _Host(self.concurrency, bucket)
+            return self._hosts[host]
+
+    def _acquire(self, state):
+        # wait for a free slot and for any pause asked for by the host
+        with state.condition:
+            while True:
+                wait = state.resume_at - time.monotonic()
+                if wait <= 0 and state.in_flight < state.limit:
+                    break
+                state.condition.wait(wait if wait > 0 else None)
+            state.in_flight += 1
+            state.stats["requests"] += 1
+        # then wait for a token
+        if state.bucket is not None:
+            wait = state.bucket.reserve()
+            if wait > 0:
+                time.sleep(wait)
+
+    def _release(self, state, outcome, pause=None):
+        with state.condition:
+            state.in_flight -= 1
+            now = time.monotonic()
+            if outcome == "ok":
+                # additive increase, once per window of limit requests
+                state.successes += 1
+                if state.successes >= state.limit and \
+                        state.limit < self.max_concurrency:
+                    state.limit += 1
+                    state.successes = 0
+            else:
+                state.stats[outcome] += 1
+                state.successes = 0
+                # multiplicative decrease, once per backoff period so that a
+                # burst of failures from the same overload only counts once
+                if now >= state.next_decrease:
+                    state.limit = max(1, state.limit // 2)
+                    state.next_decrease = now + self.backoff
+                if pause is not None:
+                    state.resume_at = max(state.resume_at, now + pause)
+            state.stats["limit"] = state.limit
+            state.stats["peak_limit"] = max(state.stats["peak_limit"],
+                                            state.limit)
+            state.condition.notify_all()
+
+    def _backoff(self, attempt):
+        # full jitter: anywhere from 0 up to the exponential backoff
+        return random.uniform(0, min(self.max_backoff,
+                                     self.backoff * 2 ** attempt))
+
+    def call(self, host, function, classify):
+        """
+        Call function under the limits of host, retrying failures.
+
+        Args:
+            host::str
+                Name of the host the call goes to.
+            function::function
+                Function that takes no arguments and makes the request.
+            classify::function
+                Function that takes what function returned, or the exception
+                it raised, and returns a pair of the outcome and the seconds
+                the host asked to wait (or None). The outcome is "ok",
+                "throttled" or "errors".
+        Returns:
+            result::object
+                What function returned on its last try. If the last try
+                raised an exception, it is raised again.
+        """
+        state = self._host(host)
+        for attempt in range(self.retries + 1):
+            self._acquire(state)
+            error = None
+            try:
+                result = function()
+            except Exception as exception:
+                error = exception
+                result = exception
+            outcome, wait = classify(result)
+            # a host that asks for a pause gets it for every request
+            self._release(state, outcome,
+                          wait if outcome == "throttled" else None)
+            if outcome != "ok":
+                instrumentation.count(outcome)
+            if outcome == "ok" or attempt == self.retries:
+                break
+            state.stats["retries"] += 1
+            instrumentation.count("retries")
+            with instrumentation.timed("backoff"):
+                time.sleep(self._backoff(attempt) if wait is None else wait)
+        if error is not None:
+            raise error
+        return result
+
+    def request(self, url, send, errors=(OSError,)):
+        """
+        Send an HTTP request under the limits of the url's host, retrying
+        throttled requests, server errors and connection problems.
+
+        Args:
+            url::str
+                Url the request goes to.
+            send::function
+                Function that takes no arguments, sends the request and
+                returns a requests Response.
+            errors::tuple
+                Exceptions that send raises on connection problems.
+                requests' exceptions are OSErrors.
+        Returns:
+            response::requests Response
+                The response to the last try.
+        """
+        def classify(result):
+            if isinstance(result, Exception):
+                if isinstance(result, errors):
+                    return "errors", None
+                # anything else is a bug, not a problem with the host
+                return "ok", None
+            if result.status_code in THROTTLE_STATUS_CODES:
+                return "throttled", retry_after_seconds(
+                    result.headers.get("Retry-After"))
+            if result.status_code in RETRY_STATUS_CODES:
+                return "errors", None
+            return "ok", None
+
+        return self.call(urlsplit(url).netloc, send, classify)
+
+    def stats(self, host):
+        """
+        Args:
+            host::str
+                Name of the host.
+        Returns:
+            stats::dict
+                Numbers of requests, throttled responses, errors and retries
+                for the host, its current limit of requests in flight and
+                the highest the limit reached.
+        """
+        state = self._host(host)
+        with state.condition:
+            return dict(state.stats)
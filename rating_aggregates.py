@@ -0,0 +1,217 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from genre_index import GenreIndex
+from movie_scraper import MOVIE_COLUMNS
+
+# ways the movies are grouped, and the values summed for each group
+GROUPS = ["genre", "year", "gap"]
+VALUES = ["change", "original", "remake"]
+
+# name of the file the aggregates are saved in, inside the dataset folder
+AGGREGATES_FILE = "aggregates.json"
+
+
+class RatingAggregates:
+    """
+    Running totals of the ratings in a movie dataset, by group.
+
+    For every genre of the original movie, every remake year and every
+    bucket of years between original and remake, the number of movies and
+    the sum and sum of squares of three values are kept: the change in
+    rating from original to remake, the original rating and the remake
+    rating. Means and standard deviations of any group come straight from
+    these totals, so reading them takes the same time however many movies
+    there are, and adding or removing movies only changes the totals.
+
+    Args:
+        gap_width::int
+            Number of years between original and remake in each bucket.
+    """
+
+    def __init__(self, gap_width=5):
+        self.gap_width = gap_width
+        self.rows = 0
+        # key of each group, and its position in the stats array
+        self._positions = {group: {} for group in GROUPS}
+        # one row per key: count, then sum and sum of squares of each value
+        self._stats = {group: np.zeros((0, 1 + 2 * len(VALUES)))
+                       for group in GROUPS}
+
+    def _add_group(self, group, keys, stats):
+        # add the stats of some keys to the totals, making room for new keys
+        positions = self._positions[group]
+        for key in keys:
+            if key not in positions:
+                positions[key] = len(positions)
+        grown = np.zeros((len(positions), self._stats[group].shape[1]))
+        grown[:len(self._stats[group])] = self._stats[group]
+        grown[[positions[key] for key in keys]] += stats
+        self._stats[group] = grown
+
+    def add(self, movie_data):
+        """
+        Add movies to the totals.
+
+        Args:
+            movie_data::pandas DataFrame
+                The new movies, with the 10 columns in MOVIE_COLUMNS and no
+                missing values.
+        """
+        self._update(movie_data, 1)
+
+    def remove(self, movie_data):
+        """
+        Take movies that were added before out of the totals. Groups left
+        without any movies are removed.
+
+        Args:
+            movie_data::pandas DataFrame
+                The movies, with the 10 columns in MOVIE_COLUMNS and no
+                missing values.
+        """
+        self._update(movie_data, -1)
+        for group in GROUPS:
+            # counts are whole numbers, so anything under a half is zero
+            used = self._stats[group][:, 0] > 0.5
+            if used.all():
+                continue
+            keys = [key for key, position in self._positions[group].items()
+                    if used[position]]
+            self._stats[group] = self._stats[group][
+                [self._positions[group][key] for key in keys]]
+            self._positions[group] = {key: position for position, key
+                                      in enumerate(keys)}
+
+    def _update(self, movie_data, sign):
+        # add the stats of the movies to the totals, or take them out
+        original = movie_data[MOVIE_COLUMNS[3]].to_numpy(dtype=np.float64)
+        remake = movie_data[MOVIE_COLUMNS[8]].to_numpy(dtype=np.float64)
+        values = np.column_stack([remake - original, original, remake])
+        # count, value and square of value of every movie
+        stats = sign * np.column_stack([np.ones(len(values))]
+                                       + [column for value in values.T
+                                          for column in (value, value ** 2)])
+
+        genre_index = GenreIndex.from_lists(
+            movie_data[MOVIE_COLUMNS[2]].tolist())
+        self._add_group("genre", genre_index.genres,
+                        np.column_stack([genre_index.sums(column)
+                                         for column in stats.T]))
+
+        remake_year = movie_data[MOVIE_COLUMNS[6]].to_numpy(dtype=np.int64)
+        gap = remake_year - movie_data[MOVIE_COLUMNS[1]].to_numpy(
+            dtype=np.int64)
+        for group, keys in [("year", remake_year),
+                            ("gap", gap // self.gap_width * self.gap_width)]:
+            unique_keys, inverse = np.unique(keys, return_inverse=True)
+            group_stats = np.zeros((len(unique_keys), stats.shape[1]))
+            np.add.at(group_stats, inverse, stats)
+            self._add_group(group, unique_keys.tolist(), group_stats)
+
+        self.rows += sign * len(movie_data)
+
+    def keys(self, group):
+        """
+        Args:
+            group::str
+                "genre", "year" or "gap".
+        Returns:
+            keys::list
+                Genres in order of first appearance, or remake years or the
+                first year of each bucket of years between original and
+                remake, in increasing order.
+        """
+        keys = list(self._positions[group])
+        return keys if group == "genre" else sorted(keys)
+
+    def summary(self, group, value="change"):
+        """
+        Count, mean and standard deviation of a value for each key of a group.
+
+        Args:
+            group::str
+                "genre", "year" or "gap".
+            value::str
+                "change" for the change in rating from original to remake,
+                "original" for the original rating or "remake" for the remake
+                rating.
+        Returns:
+            summary::pandas DataFrame
+                One row per key, in the order of keys, with columns "count",
+                "mean" and "std".
+        """
+        keys = self.keys(group)
+        stats = self._stats[group][[self._positions[group][key]
+                                    for key in keys]]
+        count = stats[:, 0]
+        column = 1 + 2 * VALUES.index(value)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = stats[:, column] / count
+            variance = stats[:, column + 1] / count - mean ** 2
+        # rounding can leave tiny negative variances
+        std = np.sqrt(np.maximum(variance, 0))
+        return pd.DataFrame({"count": count.astype(np.int64), "mean": mean,
+                             "std": std}, index=pd.Index(keys, name=group))
+
+    def popular(self, number=None):
+        """
+        Args:
+            number::int
+                Number of genres to return. Default is every genre.
+        Returns:
+            genres::list of str
+                Genres sorted from most to least movies. Genres with the same
+                number of movies are in order of first appearance.
+        """
+        counts = self.summary("genre")["count"]
+        order = np.argsort(-counts.to_numpy(), kind="stable")
+        return [counts.index[position] for position in order[:number]]
+
+    def save(self, path):
+        """
+        Save the totals in a dataset folder.
+
+        Args:
+            path::str
+                Folder of a dataset saved by save_movie_table.
+        """
+        data = {"gap_width": self.gap_width, "rows": self.rows,
+                "groups": {group: {"keys": list(self._positions[group]),
+                                   "stats": self._stats[group].tolist()}
+                           for group in GROUPS}}
+        file_path = os.path.join(path, AGGREGATES_FILE)
+        with open(file_path + ".tmp", "w") as f:
+            json.dump(data, f)
+        os.replace(file_path + ".tmp", file_path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load the totals saved in a dataset folder.
+
+        Args:
+            path::str
+                Folder of a dataset saved by save_movie_table.
+        Returns:
+            aggregates::RatingAggregates
+                The saved totals, or None if none were saved.
+        """
+        file_path = os.path.join(path, AGGREGATES_FILE)
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path) as f:
+            data = json.load(f)
+        aggregates = cls(data["gap_width"])
+        aggregates.rows = data["rows"]
+        for group in GROUPS:
+            keys = data["groups"][group]["keys"]
+            aggregates._positions[group] = {key: position for position, key
+                                            in enumerate(keys)}
+            aggregates._stats[group] = np.array(
+                data["groups"][group]["stats"],
+                dtype=np.float64).reshape(len(keys), -1)
+        return aggregates
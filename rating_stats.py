@@ -0,0 +1,208 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from genre_index import GenreIndex
+from movie_scraper import MOVIE_COLUMNS
+
+# most numbers in one matrix of resamples, which bounds the memory used
+MAX_ELEMENTS = 2 ** 22
+
+
+def _resample_means(values, count, seed, kind):
+    """
+    Means of count resamples of values, all drawn as one matrix.
+
+    "bootstrap" resamples draw len(values) values with replacement.
+    "permutation" resamples flip the sign of each value at random, which is
+    how pairs are shuffled when each value is the difference within a pair.
+    """
+    rng = np.random.default_rng(seed)
+    if kind == "bootstrap":
+        rows = rng.integers(0, len(values), size=(count, len(values)))
+        return values[rows].mean(axis=1)
+    signs = rng.integers(0, 2, size=(count, len(values))) * 2 - 1
+    return signs @ values / len(values)
+
+
+def _group_means(values, groups, resamples, seed, kind, processes,
+                 max_elements):
+    """
+    Resample the values of every group, in chunks of at most max_elements
+    numbers, spread over processes. Returns a list with the resampled means
+    of each group.
+    """
+    jobs = []
+    for group, rows in enumerate(groups):
+        chunk = max(1, max_elements // max(len(rows), 1))
+        for start in range(0, resamples, chunk):
+            jobs.append((group, min(chunk, resamples - start)))
+    # every chunk gets its own seed, so the results don't depend on how
+    # the chunks are shared between processes
+    seeds = np.random.SeedSequence(seed).spawn(len(jobs))
+    arguments = [(values[groups[group]], count, job_seed, kind)
+                 for (group, count), job_seed in zip(jobs, seeds)]
+
+    if processes and processes > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            chunks = list(pool.map(_resample_means, *zip(*arguments)))
+    else:
+        chunks = [_resample_means(*job) for job in arguments]
+
+    means = [[] for group in groups]
+    for (group, count), chunk_means in zip(jobs, chunks):
+        means[group].append(chunk_means)
+    return [np.concatenate(group_means) for group_means in means]
+
+
+def bootstrap_intervals(values, groups=None, resamples=10000,
+                        confidence=0.95, seed=0, processes=None,
+                        max_elements=MAX_ELEMENTS):
+    """
+    Bootstrap confidence intervals for the mean of values, within groups.
+
+    Args:
+        values::numpy array
+            One value per movie, such as the change in rating.
+        groups::list of numpy arrays
+            Positions of the values in each group. Default is a single group
+            of every value.
+        resamples::int
+            Number of bootstrap resamples of each group.
+        confidence::float
+            Confidence level of the intervals. Default is 0.95.
+        seed::int
+            Seed of the random resamples.
+        processes::int
+            Number of processes to spread the resamples over. Default is to
+            resample in this process.
+        max_elements::int
+            Most numbers in one matrix of resamples.
+    Returns:
+        low::numpy array
+            Lower end of the interval of each group.
+        high::numpy array
+            Upper end of the interval of each group.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if groups is None:
+        groups = [np.arange(len(values))]
+    quantiles = [(1 - confidence) / 2, (1 + confidence) / 2]
+    intervals = np.array([
+        np.quantile(means, quantiles) if len(means) and len(rows)
+        else [np.nan, np.nan]
+        for means, rows in zip(_group_means(values, groups, resamples, seed,
+                                            "bootstrap", processes,
+                                            max_elements), groups)])
+    return intervals[:, 0], intervals[:, 1]
+
+
+def permutation_tests(values, groups=None, resamples=10000, seed=0,
+                      processes=None, max_elements=MAX_ELEMENTS):
+    """
+    Paired permutation tests of whether the mean of values differs from 0.
+
+    Each value is the difference within a pair, such as a remake's rating
+    minus its original's. If remakes were no better or worse than their
+    originals, swapping the two movies of any pair would be as likely as
+    not, which flips the sign of its difference. The p-value is the share of
+    random sign flips whose mean is at least as far from 0 as the real mean.
+
+    Args:
+        values::numpy array
+            Difference within each pair.
+        groups::list of numpy arrays
+            Positions of the values in each group. Default is a single group
+            of every value.
+        resamples::int
+            Number of random sign flips of each group.
+        seed::int
+            Seed of the random sign flips.
+        processes::int
+            Number of processes to spread the sign flips over. Default is to
+            flip in this process.
+        max_elements::int
+            Most numbers in one matrix of sign flips.
+    Returns:
+        p_values::numpy array
+            Two-sided p-value of each group.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if groups is None:
+        groups = [np.arange(len(values))]
+    p_values = []
+    for means, rows in zip(_group_means(values, groups, resamples, seed,
+                                        "permutation", processes,
+                                        max_elements), groups):
+        if not len(rows):
+            p_values.append(np.nan)
+            continue
+        observed = abs(values[rows].mean())
+        # a tiny tolerance stops rounding from hiding ties with observed
+        extreme = np.count_nonzero(np.abs(means) >= observed - 1e-12)
+        p_values.append((extreme + 1) / (len(means) + 1))
+    return np.array(p_values)
+
+
+def rating_change_summary(movie_data, by=None, gap_width=5, resamples=10000,
+                          confidence=0.95, seed=0, processes=None):
+    """
+    Mean change in rating from original to remake, with bootstrap confidence
+    intervals and paired permutation tests.
+
+    Args:
+        movie_data::pandas DataFrame
+            The movie data, with the 10 columns in MOVIE_COLUMNS.
+        by::str
+            None for every movie together, "genre" for each genre of the
+            original movie or "gap" for each bucket of years between
+            original and remake.
+        gap_width::int
+            Number of years in each bucket when by is "gap".
+        resamples::int
+            Number of resamples for each interval and test.
+        confidence::float
+            Confidence level of the intervals. Default is 0.95.
+        seed::int
+            Seed of the random resamples.
+        processes::int
+            Number of processes to spread the resamples over.
+    Returns:
+        summary::pandas DataFrame
+            One row per group with columns "count", "mean", "low", "high"
+            and "p_value". Genres are in order of first appearance and
+            buckets are labelled by their first year.
+    """
+    original = movie_data[MOVIE_COLUMNS[3]].to_numpy(dtype=np.float64)
+    d_rating = movie_data[MOVIE_COLUMNS[8]].to_numpy(dtype=np.float64) - \
+        original
+    if by is None:
+        keys = ["all"]
+        groups = [np.arange(len(d_rating))]
+    elif by == "genre":
+        genre_index = GenreIndex.from_lists(
+            movie_data[MOVIE_COLUMNS[2]].tolist())
+        keys = genre_index.genres
+        groups = [genre_index.rows_with(genre) for genre in keys]
+    elif by == "gap":
+        gap = movie_data[MOVIE_COLUMNS[6]].to_numpy(dtype=np.int64) - \
+            movie_data[MOVIE_COLUMNS[1]].to_numpy(dtype=np.int64)
+        buckets = gap // gap_width * gap_width
+        keys, inverse = np.unique(buckets, return_inverse=True)
+        order = np.argsort(inverse, kind="stable")
+        groups = np.split(order, np.cumsum(np.bincount(inverse))[:-1])
+    else:
+        raise ValueError("by must be None, \"genre\" or \"gap\", not %r" % by)
+
+    low, high = bootstrap_intervals(d_rating, groups, resamples, confidence,
+                                    seed, processes)
+    p_values = permutation_tests(d_rating, groups, resamples, seed,
+                                 processes)
+    with np.errstate(invalid="ignore"):
+        means = [d_rating[rows].mean() if len(rows) else np.nan
+                 for rows in groups]
+    return pd.DataFrame({"count": [len(rows) for rows in groups],
+                         "mean": means, "low": low, "high": high,
+                         "p_value": p_values},
+                        index=pd.Index(list(keys), name=by or "group"))
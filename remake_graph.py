@@ -0,0 +1,400 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# arrays saved by RemakeGraph.save, one file each
+GRAPH_ARRAYS = ["numbers", "ratings", "indptr", "remakes", "reverse_indptr",
+                "originals"]
+
+
+def _as_numbers(imdb_numbers):
+    # IMDb numbers as integers, with -1 for "NONE" and missing numbers
+    if isinstance(imdb_numbers, np.ndarray) and imdb_numbers.dtype.kind in \
+            "iu":
+        return imdb_numbers.astype(np.int64, copy=False)
+    texts = pd.Series(imdb_numbers, dtype=object).astype(str)
+    digits = texts.str.isdigit().to_numpy(dtype=bool)
+    numbers = np.full(len(texts), -1, dtype=np.int64)
+    numbers[digits] = texts[digits].astype(np.int64).to_numpy()
+    return numbers
+
+
+def _indptr(nodes, n_nodes):
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(nodes, minlength=n_nodes), out=indptr[1:])
+    return indptr
+
+
+def _neighbor_positions(indptr, nodes):
+    # positions of the neighbors of every node in nodes, one after another
+    starts = indptr[nodes]
+    lengths = indptr[nodes + 1] - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+def _levels(indptr, neighbors):
+    """
+    Length of the longest path to every node from a node without incoming
+    edges, peeling the graph one level at a time. Nodes on a cycle, or
+    reached through one, are -1.
+    """
+    n_nodes = len(indptr) - 1
+    remaining = np.bincount(neighbors, minlength=n_nodes)
+    levels = np.full(n_nodes, -1, dtype=np.int32)
+    frontier = np.flatnonzero(remaining == 0)
+    level = 0
+    while len(frontier):
+        levels[frontier] = level
+        reached, counts = np.unique(
+            neighbors[_neighbor_positions(indptr, frontier)],
+            return_counts=True)
+        remaining[reached] -= counts
+        frontier = reached[remaining[reached] == 0]
+        level += 1
+    return levels
+
+
+class RemakeGraph:
+    """
+    Which movies are remakes of which, keyed by IMDb number.
+
+    Every movie is a node, numbered by the order of its IMDb number in
+    numbers, so a movie is found with a binary search instead of a
+    dictionary. Pairs of an original and its remake are stored sparsely,
+    twice: grouped by original, the remakes of node i are
+    remakes[indptr[i]:indptr[i + 1]], and grouped by remake, the originals
+    of node i are originals[reverse_indptr[i]:reverse_indptr[i + 1]]. Chains
+    of remakes of remakes are followed through these arrays, and pairs are
+    read from them as whole arrays.
+
+    Build a graph with RemakeGraph.from_pairs.
+
+    Args:
+        numbers::numpy array
+            IMDb number of every movie, in increasing order.
+        ratings::numpy array
+            Rating of every movie, NaN if unknown.
+        indptr::numpy array
+            The remakes of node i are remakes[indptr[i]:indptr[i + 1]].
+        remakes::numpy array
+            Nodes of the remakes, grouped by original.
+        reverse_indptr::numpy array
+            The originals of node i are
+            originals[reverse_indptr[i]:reverse_indptr[i + 1]].
+        originals::numpy array
+            Nodes of the originals, grouped by remake.
+    """
+
+    def __init__(self, numbers, ratings, indptr, remakes, reverse_indptr,
+                 originals):
+        self.numbers = numbers
+        self.ratings = ratings
+        self.indptr = indptr
+        self.remakes = remakes
+        self.reverse_indptr = reverse_indptr
+        self.originals = originals
+        self._generations = None
+        self._depths = None
+
+    @classmethod
+    def from_pairs(cls, original_numbers, remake_numbers,
+                   original_ratings=None, remake_ratings=None):
+        """
+        Build a graph from pairs of an original movie and its remake.
+
+        Args:
+            original_numbers::sequence
+                IMDb number of the original movie of each pair, as a string
+                such as "0012345" or as an integer. Pairs with a "NONE" or
+                missing number on either side are left out.
+            remake_numbers::sequence
+                IMDb number of the remake of each pair.
+            original_ratings::sequence of float
+                Rating of the original movie of each pair. Default is no
+                ratings.
+            remake_ratings::sequence of float
+                Rating of the remake of each pair. When pairs give a movie
+                different ratings, the rating from the last pair is kept.
+        Returns:
+            remake_graph::RemakeGraph
+        """
+        originals = _as_numbers(original_numbers)
+        remakes = _as_numbers(remake_numbers)
+        keep = (originals >= 0) & (remakes >= 0) & (originals != remakes)
+        n_pairs = np.count_nonzero(keep)
+
+        # number the movies in order of IMDb number. Sorting once and
+        # marking where the numbers change is much faster than np.unique
+        # and a binary search for every pair
+        both = np.concatenate([originals[keep], remakes[keep]])
+        order = np.argsort(both, kind="stable")
+        changes = np.ones(len(both), dtype=bool)
+        changes[1:] = both[order[1:]] != both[order[:-1]]
+        numbers = both[order[changes]]
+        n_nodes = len(numbers)
+        nodes = np.empty(len(both), dtype=np.int64)
+        nodes[order] = np.cumsum(changes) - 1
+
+        pair_ratings = np.full((n_pairs, 2), np.nan)
+        for side, movie_ratings in enumerate([original_ratings,
+                                              remake_ratings]):
+            if movie_ratings is not None:
+                pair_ratings[:, side] = np.asarray(movie_ratings,
+                                                   dtype=np.float64)[keep]
+        pair_nodes = np.stack([nodes[:n_pairs], nodes[n_pairs:]], axis=1)
+        known = ~np.isnan(pair_ratings)
+        ratings = np.full(n_nodes, np.nan, dtype=np.float32)
+        ratings[pair_nodes[known]] = pair_ratings[known]
+
+        # a pair listed twice only counts once
+        pairs = np.sort(nodes[:n_pairs] * max(n_nodes, 1) + nodes[n_pairs:])
+        if len(pairs):
+            pairs = pairs[np.concatenate([[True], pairs[1:] != pairs[:-1]])]
+        sources, targets = np.divmod(pairs, max(n_nodes, 1))
+        order = np.lexsort((sources, targets))
+        return cls(numbers, ratings, _indptr(sources, n_nodes),
+                   targets.astype(np.int32), _indptr(targets, n_nodes),
+                   sources[order].astype(np.int32))
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def nodes(self, imdb_numbers):
+        """
+        Args:
+            imdb_numbers::sequence
+                IMDb numbers, as strings or integers.
+        Returns:
+            nodes::numpy array
+                Node of each movie, or -1 for movies that are not in the
+                graph.
+        """
+        numbers = _as_numbers(np.atleast_1d(imdb_numbers))
+        nodes = np.searchsorted(self.numbers, numbers)
+        found = nodes < len(self.numbers)
+        found[found] = self.numbers[nodes[found]] == numbers[found]
+        return np.where(found, nodes, -1)
+
+    def _find(self, imdb_number):
+        # node of one movie, or -1
+        try:
+            number = int(imdb_number)
+        except (TypeError, ValueError):
+            return -1
+        node = np.searchsorted(self.numbers, number)
+        if node < len(self.numbers) and self.numbers[node] == number:
+            return node
+        return -1
+
+    def _node(self, imdb_number):
+        node = self._find(imdb_number)
+        if node < 0:
+            raise KeyError(imdb_number)
+        return node
+
+    def remakes_of(self, imdb_number, every_generation=False):
+        """
+        Args:
+            imdb_number::str or int
+                IMDb number of a movie.
+            every_generation::bool
+                If True, also include remakes of the remakes, and so on.
+        Returns:
+            imdb_numbers::numpy array
+                IMDb numbers of the movie's remakes, in increasing order.
+                Empty if the movie was never remade.
+        """
+        node = self._find(imdb_number)
+        if node < 0:
+            return self.numbers[:0]
+        if not every_generation:
+            return self.numbers[
+                self.remakes[self.indptr[node]:self.indptr[node + 1]]]
+        found = np.array([node])
+        frontier = found
+        while len(frontier):
+            reached = self.remakes[_neighbor_positions(self.indptr,
+                                                       frontier)]
+            frontier = np.setdiff1d(reached, found)
+            found = np.union1d(found, frontier)
+        return self.numbers[found[found != node]]
+
+    def originals_of(self, imdb_number):
+        """
+        Args:
+            imdb_number::str or int
+                IMDb number of a movie.
+        Returns:
+            imdb_numbers::numpy array
+                IMDb numbers of the movies it is a remake of, in increasing
+                order. Empty if it isn't a remake.
+        """
+        node = self._find(imdb_number)
+        if node < 0:
+            return self.numbers[:0]
+        return self.numbers[self.originals[
+            self.reverse_indptr[node]:self.reverse_indptr[node + 1]]]
+
+    def generations(self):
+        """
+        Returns:
+            generations::numpy array
+                Generation of every movie: 0 for movies that aren't remakes,
+                1 for remakes of those, 2 for remakes of remakes and so on,
+                following the longest chain. Movies in a cycle of remakes,
+                which can only come from a mistake in the lists, are -1.
+        """
+        if self._generations is None:
+            self._generations = _levels(self.indptr, self.remakes)
+        return self._generations
+
+    def depths(self):
+        """
+        Returns:
+            depths::numpy array
+                Depth of the chain of remakes below every movie: 0 for
+                movies that were never remade, 1 for movies whose remakes
+                were never remade, and so on. Movies in a cycle are -1.
+        """
+        if self._depths is None:
+            self._depths = _levels(self.reverse_indptr, self.originals)
+        return self._depths
+
+    def generation(self, imdb_number):
+        """
+        Generation of one movie. See generations.
+        """
+        return int(self.generations()[self._node(imdb_number)])
+
+    def chain_depth(self, imdb_number):
+        """
+        Depth of the chain of remakes below one movie. See depths.
+        """
+        return int(self.depths()[self._node(imdb_number)])
+
+    def pair_nodes(self):
+        """
+        Returns:
+            originals::numpy array
+                Node of the original movie of every pair, grouped by
+                original.
+            remakes::numpy array
+                Node of the remake of every pair. The same array as
+                self.remakes, not a copy.
+        """
+        sources = np.repeat(np.arange(len(self.numbers), dtype=np.int32),
+                            np.diff(self.indptr))
+        return sources, self.remakes
+
+    def pairs(self):
+        """
+        Returns:
+            original_numbers::numpy array
+                IMDb number of the original movie of every pair.
+            remake_numbers::numpy array
+                IMDb number of the remake of every pair.
+        """
+        sources, targets = self.pair_nodes()
+        return self.numbers[sources], self.numbers[targets]
+
+    def rating_changes(self):
+        """
+        Returns:
+            changes::numpy array
+                Rating of the remake minus the rating of the original for
+                every pair, in the order of pairs. NaN if either rating is
+                unknown.
+        """
+        sources, targets = self.pair_nodes()
+        return self.ratings[targets] - self.ratings[sources]
+
+    def rating_change_by_generation(self):
+        """
+        Average change in rating from original to remake, by the generation
+        of the remake.
+
+        Returns:
+            summary::pandas DataFrame
+                One row per generation from 1 up, with the columns "count",
+                "mean" and "std" of the change over pairs with both ratings
+                known.
+        """
+        changes = self.rating_changes().astype(np.float64)
+        generations = self.generations()[self.remakes]
+        known = ~np.isnan(changes) & (generations > 0)
+        changes = changes[known]
+        generations = generations[known]
+        length = generations.max() + 1 if len(generations) else 1
+        count = np.bincount(generations, minlength=length)[1:]
+        total = np.bincount(generations, weights=changes,
+                            minlength=length)[1:]
+        squares = np.bincount(generations, weights=changes ** 2,
+                              minlength=length)[1:]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total / count
+            std = np.sqrt(np.maximum(squares - count * mean ** 2, 0)
+                          / (count - 1))
+        return pd.DataFrame({"count": count, "mean": mean, "std": std},
+                            index=pd.RangeIndex(1, length,
+                                                name="generation"))
+
+    def merge(self, other):
+        """
+        Combine the pairs of two graphs.
+
+        Args:
+            other::RemakeGraph
+                Graph to add. Its ratings replace the ratings of the same
+                movies in this graph, unless they are unknown.
+        Returns:
+            remake_graph::RemakeGraph
+                A new graph with the pairs of both graphs.
+        """
+        pairs = [graph.pair_nodes() for graph in [self, other]]
+        return RemakeGraph.from_pairs(
+            np.concatenate([self.numbers[pairs[0][0]],
+                            other.numbers[pairs[1][0]]]),
+            np.concatenate([self.numbers[pairs[0][1]],
+                            other.numbers[pairs[1][1]]]),
+            np.concatenate([self.ratings[pairs[0][0]],
+                            other.ratings[pairs[1][0]]]),
+            np.concatenate([self.ratings[pairs[0][1]],
+                            other.ratings[pairs[1][1]]]))
+
+    def save(self, path):
+        """
+        Save the graph in a folder, one numpy file per array, so it can be
+        memory mapped when loaded.
+
+        Args:
+            path::str
+                Folder to save the graph in, such as a dataset folder saved
+                by save_movie_table.
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in GRAPH_ARRAYS:
+            np.save(os.path.join(path, "remake_graph.%s.npy" % name),
+                    getattr(self, name))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Load a graph saved by save.
+
+        Args:
+            path::str
+                Folder the graph was saved in.
+            mmap::bool
+                If True, memory map the arrays. Default is True.
+        Returns:
+            remake_graph::RemakeGraph
+                The graph, or None if no graph was saved in path.
+        """
+        paths = [os.path.join(path, "remake_graph.%s.npy" % name)
+                 for name in GRAPH_ARRAYS]
+        if not all(os.path.exists(array_path) for array_path in paths):
+            return None
+        return cls(*[np.load(array_path, mmap_mode="r" if mmap else None)
+                     for array_path in paths])
@@ -0,0 +1,156 @@
+"""
+Render every graph of a saved movie dataset to image files, without a
+display.
+
+Run from the top of the repository with:
+    python report.py ./movie_data ./report
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dataset_io import load_movie_table
+
+# file name of each figure, and the function in graph_data that draws it
+GRAPHS = {"rating_change_by_time": "graph_rating_change_by_time",
+          "rating_change_by_genre": "graph_rating_change_by_genre",
+          "rating_change_by_genre_full": "graph_rating_change_by_genre_full",
+          "rating_change_by_year_dif": "graph_rating_change_by_year_dif"}
+
+# graphs that draw every movie, and so take the scatter plot options
+SCATTER_GRAPHS = ["rating_change_by_time", "rating_change_by_year_dif"]
+
+# the movie data, given to each worker process once when it starts
+_movie_data = None
+
+
+def _set_movie_data(movie_data):
+    global _movie_data
+    _movie_data = movie_data
+
+
+def _render(name, path, formats, options):
+    """
+    Draw one graph on its own figure and save it in each format. Returns the
+    name of the graph, the files saved and the seconds it took.
+    """
+    start = time.perf_counter()
+    # a figure made without pyplot shares no state with other figures, and
+    # drawing it with agg needs no display
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    import graph_data
+
+    figure = Figure(figsize=(10, 6))
+    FigureCanvasAgg(figure)
+    getattr(graph_data, GRAPHS[name])(_movie_data, ax=figure.subplots(),
+                                      **options)
+    figure.tight_layout()
+    file_paths = []
+    for file_format in formats:
+        file_path = os.path.join(path, "%s.%s" % (name, file_format))
+        figure.savefig(file_path)
+        file_paths.append(file_path)
+    return name, file_paths, time.perf_counter() - start
+
+
+def render_report(dataset_path, path, formats=("png", "svg"), processes=None,
+                  mode="points", max_points=None, error_bars=False):
+    """
+    Render all four graphs of a dataset to image files.
+
+    The dataset is loaded once and every graph is drawn on its own figure in
+    a pool of processes, so the graphs are drawn at the same time.
+
+    Args:
+        dataset_path::str
+            Folder of a dataset saved by save_movie_table.
+        path::str
+            Folder to save the images in.
+        formats::sequence of str
+            File formats to save each graph in, such as "png" and "svg".
+        processes::int
+            Number of processes to draw the graphs in. Default is one per
+            CPU, up to one per graph. With 1, every graph is drawn in this
+            process.
+        mode::str
+            How the scatter plots draw the movies, "points" or "density".
+            See graph_rating_change_by_time.
+        max_points::int
+            Most movies drawn by the scatter plots in "points" mode.
+        error_bars::bool
+            If True, the bar charts show bootstrap confidence intervals.
+    Returns:
+        timings::dict
+            Seconds taken to load the dataset ("load"), until the first
+            image was saved ("first_figure") and in total ("total"), and to
+            draw and save each graph ("figures").
+    """
+    start = time.perf_counter()
+    os.makedirs(path, exist_ok=True)
+    movie_data = load_movie_table(dataset_path).to_numpy()
+    timings = {"load": time.perf_counter() - start, "figures": {}}
+    options = {name: {"mode": mode, "max_points": max_points}
+               if name in SCATTER_GRAPHS else {"error_bars": error_bars}
+               for name in GRAPHS}
+
+    if processes is None:
+        processes = min(os.cpu_count() or 1, len(GRAPHS))
+    if processes < 2:
+        _set_movie_data(movie_data)
+        results = (_render(name, path, formats, options[name])
+                   for name in GRAPHS)
+        for name, file_paths, seconds in results:
+            timings.setdefault("first_figure", time.perf_counter() - start)
+            timings["figures"][name] = seconds
+    else:
+        # import matplotlib before starting the processes, so they don't
+        # each have to
+        import matplotlib.figure  # noqa: F401
+
+        with ProcessPoolExecutor(processes, initializer=_set_movie_data,
+                                 initargs=(movie_data,)) as pool:
+            futures = [pool.submit(_render, name, path, formats,
+                                   options[name]) for name in GRAPHS]
+            for future in as_completed(futures):
+                name, file_paths, seconds = future.result()
+                timings.setdefault("first_figure",
+                                   time.perf_counter() - start)
+                timings["figures"][name] = seconds
+    timings["total"] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        "\n\n")[0])
+    parser.add_argument("dataset", help="folder of the saved dataset")
+    parser.add_argument("path", help="folder to save the images in")
+    parser.add_argument("--formats", default="png,svg",
+                        help="comma separated file formats (default png,svg)")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="number of processes (default one per CPU)")
+    parser.add_argument("--mode", default="points",
+                        choices=["points", "density"],
+                        help="how the scatter plots draw the movies")
+    parser.add_argument("--max-points", type=int, default=None,
+                        help="most movies drawn by the scatter plots")
+    parser.add_argument("--error-bars", action="store_true",
+                        help="draw confidence intervals on the bar charts")
+    args = parser.parse_args()
+
+    timings = render_report(args.dataset, args.path,
+                            args.formats.split(","), args.processes,
+                            args.mode, args.max_points, args.error_bars)
+    print("%-40s %10s" % ("step", "time (s)"))
+    for name, seconds in timings["figures"].items():
+        print("%-40s %10.2f" % (name, seconds))
+    for name in ["load", "first_figure", "total"]:
+        print("%-40s %10.2f" % (name, timings[name]))
+    return timings
+
+
+if __name__ == "__main__":
+    main()
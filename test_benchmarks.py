@@ -0,0 +1,40 @@
+import pandas as pd
+
+from benchmarks.bench_suite import compare, scrape
+from benchmarks.fake_server import FakeServer
+from benchmarks.synthetic import make_movie_data
+from movie_scraper import clean_dataframe
+from validation import validate_movie_table
+
+
+def test_synthetic_movie_data():
+    movie_data = make_movie_data(2000, seed=3)
+    pd.testing.assert_frame_equal(movie_data, make_movie_data(2000, seed=3))
+    assert all(len(rows) == 0
+               for rows in validate_movie_table(movie_data).values())
+    # drama is the most common genre, as on IMDb
+    genres = movie_data["Original genre(s)"].explode().value_counts()
+    assert genres.index[0] == "Drama"
+    assert movie_data["Original genre(s)"].map(len).between(1, 3).all()
+
+    # rows with missing values are dropped by clean_dataframe
+    with_missing = make_movie_data(2000, seed=3, missing=0.1)
+    assert 150 < 2000 - len(clean_dataframe(with_missing)) < 250
+
+
+def test_scraper_reads_fake_server():
+    movie_data = make_movie_data(40)
+    with FakeServer(movie_data, paragraphs=2, rows=15) as server:
+        scraped = scrape(server, max_workers=4)
+    pd.testing.assert_frame_equal(scraped, movie_data, check_dtype=False)
+
+
+def test_compare_finds_regressions():
+    baseline = [{"benchmark": "a", "size": 10, "seconds": 1.0},
+                {"benchmark": "b", "size": 10, "seconds": 1.0}]
+    results = [{"benchmark": "a", "size": 10, "seconds": 1.1},
+               {"benchmark": "b", "size": 10, "seconds": 1.5},
+               {"benchmark": "c", "size": 10, "seconds": 1.0}]
+    rows, regressions = compare(results, baseline)
+    assert [row[0] for row in rows] == ["a", "b"]
+    assert regressions == [("b", 10, 1.0, 1.5, 1.5)]
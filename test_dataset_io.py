@@ -0,0 +1,117 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dataset_io
+from dataset_io import (MovieTableWriter, convert_pickle, load_genre_index,
+                        load_movie_table, replace_folder, save_movie_table)
+from movie_scraper import MOVIE_COLUMNS, make_movie_table
+
+ORIGINALS = [
+    {"title": "À nous la liberté", "year": 1931, "genres": ["Comedy"],
+     "rating": 7.3, "votes": 6000},
+    None,
+    {"title": "Obscure", "year": None, "genres": [], "rating": None,
+     "votes": 3},
+]
+REMAKE = {"title": "Remake", "year": 2000, "genres": ["Comedy", "Drama"],
+          "rating": 6.1, "votes": 100}
+
+
+def test_round_trip(tmp_path):
+    movie_data = make_movie_table(ORIGINALS, [REMAKE] * 3)
+    save_movie_table(movie_data, str(tmp_path / "movies"))
+    loaded = load_movie_table(str(tmp_path / "movies"))
+    assert loaded.equals(movie_data)
+    assert (loaded.dtypes == movie_data.dtypes).all()
+    # numeric columns are read straight from the memory mapped files
+    assert isinstance(loaded["Remake rating"].values, np.memmap)
+
+
+def test_table_saved_in_parts(tmp_path):
+    movie_data = make_movie_table(ORIGINALS, [REMAKE] * 3)
+    with MovieTableWriter(str(tmp_path / "movies")) as writer:
+        writer.append(movie_data[:1])
+        writer.append(movie_data[:0])
+        writer.append(movie_data[1:])
+    save_movie_table(movie_data, str(tmp_path / "whole"))
+    names = sorted(os.listdir(tmp_path / "whole"))
+    assert sorted(os.listdir(tmp_path / "movies")) == names
+    for name in names:
+        assert (tmp_path / "movies" / name).read_bytes() == \
+            (tmp_path / "whole" / name).read_bytes()
+
+    # a table that fails part way through is thrown away
+    with pytest.raises(ValueError):
+        with MovieTableWriter(str(tmp_path / "movies")) as writer:
+            writer.append(movie_data)
+            raise ValueError("lookup failed")
+    assert sorted(os.listdir(tmp_path)) == ["movies", "whole"]
+    assert load_movie_table(str(tmp_path / "movies")).equals(movie_data)
+
+
+def test_old_pickled_tables_can_be_saved(tmp_path):
+    # tables from the original scraper hold everything as python objects
+    row = ["A", 1950, ["Drama"], 7.5, 10, "B", 2000, ["War"], 6.1, 20]
+    movie_data = pd.DataFrame([row], columns=MOVIE_COLUMNS, dtype=object)
+    save_movie_table(movie_data, str(tmp_path / "movies"))
+    assert load_movie_table(str(tmp_path / "movies")).to_numpy()[0].tolist() \
+        == float32_ratings(row)
+
+
+def test_convert_pickle(tmp_path):
+    # the original scraper saved "NONE" for missing values
+    rows = [["A", 1950, ["Drama"], 7.5, 10, "B", 2000, ["War"], 6.1, 20],
+            ["C", 1960, ["Crime"], "NONE", 30, "D", "NONE", ["War"], 5.0, 40]]
+    pd.DataFrame(rows, columns=MOVIE_COLUMNS, dtype=object).to_pickle(
+        str(tmp_path / "movie_data.pkl"))
+    convert_pickle(str(tmp_path / "movie_data.pkl"),
+                   str(tmp_path / "movie_data"))
+    loaded = load_movie_table(str(tmp_path / "movie_data"))
+    assert loaded.iloc[0].tolist() == float32_ratings(rows[0])
+    assert loaded["Original title"].tolist() == ["A", "C"]
+    assert np.isnan(loaded["Original rating"][1])
+    assert loaded["Remake year"].isna().tolist() == [False, True]
+
+
+def float32_ratings(row):
+    # ratings come back as 32 bit floats
+    return [float(np.float32(value)) if isinstance(value, float) else value
+            for value in row]
+
+
+def test_projection_and_genre_index(tmp_path):
+    movie_data = make_movie_table(ORIGINALS, [REMAKE] * 3)
+    save_movie_table(movie_data, str(tmp_path / "movies"))
+    ratings = load_movie_table(str(tmp_path / "movies"),
+                               columns=["Remake rating", "Original title"])
+    assert list(ratings.columns) == ["Remake rating", "Original title"]
+    genre_index = load_genre_index(str(tmp_path / "movies"), "remake")
+    assert genre_index.genres == ["Comedy", "Drama"]
+    assert genre_index.counts().tolist() == [3, 3]
+    assert load_genre_index(str(tmp_path / "movies")).rows_with(
+        "Comedy").tolist() == [0]
+
+
+def test_crash_while_replacing_a_table(tmp_path, monkeypatch):
+    path = str(tmp_path / "movies")
+    save_movie_table(make_movie_table(ORIGINALS, [REMAKE] * 3), path)
+    real_replace = os.replace
+
+    def crash(source, destination):
+        # crash once the old table is moved aside
+        real_replace(source, destination)
+        if destination.endswith(".old"):
+            raise OSError("power cut")
+
+    monkeypatch.setattr(dataset_io.os, "replace", crash)
+    with pytest.raises(OSError):
+        save_movie_table(make_movie_table([REMAKE], [REMAKE]), path)
+    monkeypatch.undo()
+    # both tables are still on disk, and replacing again finishes the job
+    assert len(load_movie_table(path + ".old")) == 3
+    replace_folder(path + ".tmp", path)
+    assert len(load_movie_table(path)) == 1
+    assert not os.path.exists(path + ".old")
@@ -0,0 +1,58 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from genre_index import GenreIndex
+from graph_data import (col, find_popular_genres,
+                        graph_rating_change_by_genre,
+                        graph_rating_change_by_genre_full, make_genre_index)
+
+
+def test_counts_match_python_loop(make_movie_data):
+    movie_data = make_movie_data()
+    counts = {}
+    for movie in movie_data[:, col["original_genre"]]:
+        for genre in movie:
+            counts[genre] = counts.get(genre, 0) + 1
+    expected = sorted(counts, key=counts.get, reverse=True)
+    assert find_popular_genres(movie_data, 5) == expected[:5]
+    genre_index = make_genre_index(movie_data)
+    assert dict(zip(genre_index.genres, genre_index.counts())) == counts
+    assert genre_index.matrix().sum() == sum(counts.values())
+
+
+def test_rows_and_means():
+    genre_index = GenreIndex.from_lists([["a", "b"], [], ["b", "b"], ["c"]])
+    assert genre_index.genres == ["a", "b", "c"]
+    assert genre_index.rows_with("b").tolist() == [0, 2]
+    assert genre_index.rows_with("missing").tolist() == []
+    assert genre_index.means([1.0, 5.0, 3.0, 4.0]).tolist() == [1.0, 2.0, 4.0]
+
+
+def test_bar_heights_match_python_loop(make_movie_data):
+    movie_data = make_movie_data()
+    d_rating = movie_data[:, col["remake_rating"]] - \
+        movie_data[:, col["original_rating"]]
+    genres = find_popular_genres(movie_data, 4)
+    expected = []
+    remake_ratings = []
+    for genre in genres:
+        movie_index = [movie for movie in range(len(movie_data)) if genre in
+                       movie_data[movie, col["original_genre"]]]
+        expected.append(sum(d_rating[movie_index]) / len(movie_index))
+        remake_ratings.append(np.mean(
+            movie_data[movie_index, col["remake_rating"]]))
+
+    plt.figure()
+    graph_rating_change_by_genre(movie_data, bars=4)
+    heights = [bar.get_height() for bar in plt.gca().patches]
+    plt.close()
+    assert heights == pytest.approx(expected)
+
+    plt.figure()
+    graph_rating_change_by_genre_full(movie_data, bars=4)
+    bottoms = [bar.get_y() for bar in plt.gca().patches]
+    heights = [bar.get_height() for bar in plt.gca().patches]
+    plt.close()
+    assert heights == pytest.approx([-d for d in expected])
+    assert bottoms == pytest.approx(remake_ratings)
@@ -0,0 +1,32 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from graph_data import (col, graph_rating_change_by_time,
+                        graph_rating_change_by_year_dif)
+
+
+def test_density_mode_counts_every_pair(make_movie_data):
+    movie_data = make_movie_data(rows=500)
+    plt.figure()
+    graph_rating_change_by_year_dif(movie_data, mode="density", bins=10)
+    mesh = plt.gca().collections[0]
+    plt.close("all")
+    assert mesh.get_rasterized()
+    assert mesh.get_array().sum() == 500
+    assert mesh.get_array().shape == (10, 10)
+
+
+def test_downsampling_keeps_every_year(make_movie_data):
+    movie_data = make_movie_data(rows=500)
+    plt.figure()
+    graph_rating_change_by_time(movie_data, max_points=100)
+    years = plt.gca().lines[0].get_xdata()
+    plt.close()
+    all_years = np.unique(movie_data[:, col["remake_date"]].astype(float))
+    assert len(all_years) <= len(years) <= 100 + len(all_years)
+    assert np.array_equal(np.unique(years), all_years)
+
+    with pytest.raises(ValueError):
+        graph_rating_change_by_time(movie_data, mode="hexagons")
+    plt.close()
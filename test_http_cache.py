@@ -0,0 +1,87 @@
+import os
+
+from http_cache import HTTPCache
+from page_fetcher import PageFetcher
+
+
+def test_fresh_pages_are_served_from_disk(server, tmp_path):
+    server.pages["/a"] = "<p>Film A</p>"
+    with PageFetcher(cache=HTTPCache(str(tmp_path))) as fetcher:
+        first = fetcher.get(server.url + "/a")
+        second = fetcher.get(server.url + "/a")
+    assert first == second
+    assert server.responses == [200]
+
+    # a new cache on the same directory still has the page
+    with PageFetcher(cache=HTTPCache(str(tmp_path))) as fetcher:
+        assert fetcher.get(server.url + "/a").text == "<p>Film A</p>"
+        assert fetcher.cache.stats()["hits"] == 1
+    assert server.responses == [200]
+
+
+def test_stale_pages_are_revalidated(server, tmp_path):
+    server.pages["/a"] = "<p>Film A</p>"
+    cache = HTTPCache(str(tmp_path), ttl=0)
+    with PageFetcher(cache=cache) as fetcher:
+        fetcher.get(server.url + "/a")
+        assert fetcher.get(server.url + "/a").text == "<p>Film A</p>"
+        server.pages["/a"] = "<p>Film A, edited</p>"
+        assert fetcher.get(server.url + "/a").text == \
+            "<p>Film A, edited</p>"
+    assert server.responses == [200, 304, 200]
+    assert cache.stats()["revalidated"] == 1
+
+
+def test_least_recently_used_pages_are_evicted(server, tmp_path):
+    for name in "abc":
+        # random hex text only compresses to ~2.7 kB per body on disk
+        server.pages["/" + name] = os.urandom(2500).hex()
+    cache = HTTPCache(str(tmp_path), max_bytes=4000)
+    with PageFetcher(cache=cache) as fetcher:
+        for name in "abc":
+            fetcher.get(server.url + "/" + name)
+        # only the newest page fits, so the first one is downloaded again
+        fetcher.get(server.url + "/c")
+        fetcher.get(server.url + "/a")
+    assert server.responses == [200, 200, 200, 200]
+    assert cache.stats()["hits"] == 1
+    assert cache.evictions >= 2
+
+
+def test_changed_pages_replace_their_old_body(server, tmp_path):
+    cache = HTTPCache(str(tmp_path), ttl=0)
+    with PageFetcher(cache=cache) as fetcher:
+        for version in range(5):
+            server.pages["/a"] = "<p>Film A, version %d</p>" % version
+            fetcher.get(server.url + "/a")
+    objects = [name for _, _, names in os.walk(tmp_path / "objects")
+               for name in names]
+    assert len(objects) == 1
+
+
+def test_size_of_the_bodies_is_kept_up_to_date(server, tmp_path):
+    # two urls share a body, and one page changes
+    server.pages["/a"] = server.pages["/b"] = "<p>Film A</p>"
+    server.pages["/c"] = "<p>Film C</p>"
+    cache = HTTPCache(str(tmp_path), ttl=0)
+    with PageFetcher(cache=cache) as fetcher:
+        fetcher.get_many([server.url + "/" + name for name in "abc"])
+        server.pages["/c"] = "<p>Film C, edited</p>"
+        fetcher.get(server.url + "/c")
+    sizes = sum(os.path.getsize(os.path.join(folder, name))
+                for folder, _, names in os.walk(tmp_path / "objects")
+                for name in names)
+    assert cache._bytes == sizes
+    assert HTTPCache(str(tmp_path))._bytes == sizes
+
+
+def test_counters_from_many_threads(server, tmp_path):
+    urls = [server.url + "/%d" % n for n in range(40)]
+    for n in range(40):
+        server.pages["/%d" % n] = "<p>Film %d</p>" % n
+    cache = HTTPCache(str(tmp_path))
+    with PageFetcher(cache=cache, max_workers=8) as fetcher:
+        fetcher.get_many(urls)
+        fetcher.get_many(urls)
+    assert cache.stats()["misses"] == 40
+    assert cache.stats()["hits"] == 40
@@ -0,0 +1,65 @@
+import gzip
+
+import pandas as pd
+
+from imdb_dataset import IMDbDataset, build_imdb_dataset
+from movie_scraper import get_movie_data
+
+# Small stand-ins for IMDb's title.basics and title.ratings dumps. The rows
+# are deliberately out of order.
+BASICS = "\t".join(["tconst", "titleType", "primaryTitle", "originalTitle",
+                    "isAdult", "startYear", "endYear", "runtimeMinutes",
+                    "genres"]) + """
+tt0000010\tmovie\tRemake\tRemake\t0\t2010\t\\N\t100\tCrime,Drama
+tt0000001\tmovie\tOriginal "Film"\tOriginal\t0\t1950\t\\N\t90\tDrama,Crime
+tt0000003\tmovie\tNo Rating\tNo Rating\t0\t1930\t\\N\t80\tHorror
+tt0000004\ttvSeries\tÉpisode\tÉpisode\t0\t\\N\t\\N\t\\N\t\\N
+"""
+RATINGS = """tconst\taverageRating\tnumVotes
+tt0000001\t7.5\t1000
+tt0000010\t6.1\t50000
+"""
+
+
+def write_dumps(tmp_path):
+    paths = []
+    for name, text in [("basics", BASICS), ("ratings", RATINGS)]:
+        path = str(tmp_path / ("title.%s.tsv.gz" % name))
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(text)
+        paths.append(path)
+    return paths
+
+
+def test_lookup(tmp_path):
+    basics, ratings = write_dumps(tmp_path)
+    build_imdb_dataset(basics, ratings, str(tmp_path / "imdb"), chunksize=2)
+    dataset = IMDbDataset(str(tmp_path / "imdb"))
+    assert len(dataset) == 4
+    assert dataset.find(["10", "0000001", "2", "NONE"]).tolist() == \
+        [3, 0, -1, -1]
+    records = dataset.lookup(["0000001", "3", "4"])
+    assert records["0000001"] == {"title": 'Original "Film"', "year": 1950,
+                                  "genres": ["Drama", "Crime"],
+                                  "rating": 7.5,
+                                  "votes": 1000}
+    assert records["3"]["rating"] is None
+    assert records["4"] == {"title": "Épisode", "year": None, "genres": None,
+                            "rating": None, "votes": None}
+
+
+def test_get_movie_data_from_dataset(tmp_path):
+    basics, ratings = write_dumps(tmp_path)
+    build_imdb_dataset(basics, ratings, str(tmp_path / "imdb"),
+                       title_types=["movie"])
+    imdb_dataframe = pd.DataFrame([["0000001", "0000010"],
+                                   ["0000003", "0000010"]],
+                                  columns=["original", "remake"])
+    movie_data = get_movie_data(imdb_dataframe,
+                                dataset=IMDbDataset(str(tmp_path / "imdb")))
+    assert list(movie_data.columns)[2] == "Original genre(s)"
+    assert movie_data.iloc[0].tolist() == [
+        'Original "Film"', 1950, ["Drama", "Crime"], 7.5, 1000,
+        "Remake", 2010, ["Crime", "Drama"], 6.1, 50000]
+    assert movie_data.iloc[1, :3].tolist() == ["No Rating", 1930, ["Horror"]]
+    assert movie_data.iloc[1, 3:5].isna().all()
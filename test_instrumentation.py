@@ -0,0 +1,59 @@
+import json
+
+import instrumentation
+from http_cache import HTTPCache
+from page_fetcher import PageFetcher
+from pipeline import run_pipeline, stream_pipeline
+
+
+def test_records_pipeline_run(tmp_path, fake_fetcher, fake_store):
+    log = str(tmp_path / "run.jsonl")
+    # the article of film 5, the original of two pairs, can't be downloaded
+    fetcher = fake_fetcher([(1, 2), (3, 4), (5, 6), (5, 8)], missing=[5])
+    with instrumentation.record(log) as metrics:
+        run_pipeline(str(tmp_path / "run"), fetcher=fetcher,
+                     store=fake_store())
+
+    stages = [stage["name"] for stage in metrics.stages]
+    assert stages == ["get_wiki_links", "clean_dataframe",
+                      "get_imdb_numbers", "get_movie_data",
+                      "clean_dataframe", "run_pipeline"]
+    assert metrics.timers["parse"] > 0
+    # both pairs whose original article is missing are dropped, and why
+    assert metrics.counters["none.page_failed"] == 2
+    assert metrics.counters["dropped.Original title"] == 2
+
+    with open(log) as f:
+        records = [json.loads(line) for line in f]
+    assert records == json.loads(json.dumps(metrics.records()))
+    assert {record["type"] for record in records} == {"stage", "timer",
+                                                      "counter"}
+    assert "none.page_failed" in metrics.summary()
+
+
+def test_counts_rows_in_stream_pipeline(tmp_path, fake_fetcher, fake_store):
+    fetcher = fake_fetcher([(1, 2), (5, 6), (5, 8), (7, 5)], missing=[5])
+    with instrumentation.record() as metrics:
+        stream_pipeline(str(tmp_path), fetcher=fetcher, store=fake_store())
+    assert metrics.counters["none.page_failed"] == 3
+
+
+def test_records_requests_and_cache(server, tmp_path):
+    server.pages["/a"] = "<p>Film A</p>"
+    with instrumentation.record() as metrics:
+        with PageFetcher(cache=HTTPCache(str(tmp_path))) as fetcher:
+            fetcher.get(server.url + "/a")
+            fetcher.get(server.url + "/a")
+    assert metrics.counters["requests"] == 1
+    assert metrics.counters["bytes"] == len("<p>Film A</p>")
+    assert metrics.timers["network"] > 0
+    assert metrics.cache_hit_rate() == 0.5
+
+
+def test_nothing_is_recorded_outside_record():
+    assert not instrumentation.recording()
+    assert instrumentation.stage("load") is instrumentation.timed("parse")
+    instrumentation.count("requests")
+    with instrumentation.record() as metrics:
+        pass
+    assert metrics.records() == []
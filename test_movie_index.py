@@ -0,0 +1,148 @@
+import random
+import threading
+
+import pandas as pd
+import pytest
+import requests
+
+from dataset_io import save_movie_table
+from movie_index import MovieIndex, TitleIndex, make_server, normalize_title
+from movie_scraper import MOVIE_COLUMNS, make_movie_table
+
+
+def make_movie_data():
+    return pd.DataFrame([
+        ["Amélie", 2001, ["Comedy", "Romance"], 8.3, 700000,
+         "Amelie Again", 2020, ["Comedy"], 6.1, 1000],
+        ["Psycho", 1960, ["Horror", "Thriller"], 8.5, 600000,
+         "Psycho", 1998, ["Horror"], 4.6, 40000],
+        ["Scarface", 1932, ["Crime", "Drama"], 7.7, 30000,
+         "Scarface", 1983, ["Crime", "Drama"], 8.3, 800000],
+        ["The Thing from Another World", 1951, ["Horror", "Sci-Fi"], 7.1,
+         30000, "The Thing", 1982, ["Horror", "Sci-Fi"], 8.2, 400000],
+    ], columns=MOVIE_COLUMNS)
+
+
+def test_title_index():
+    assert normalize_title("  Amélie: Part-2! ") == "amelie part 2"
+    index = TitleIndex(["Amélie", "The Thing", "Psycho", "Th"])
+    assert index.search("AMELIE").tolist() == [0]
+    assert index.search("thing").tolist() == [1]
+    assert index.search("th").tolist() == [1, 3]
+    assert index.search("the psycho").tolist() == []
+    # "hin" and "thi" are in "thin hint" but "thing" isn't
+    assert TitleIndex(["thin hint"]).search("thin").tolist() == [0]
+    assert TitleIndex(["thin hint"]).search("thing").tolist() == []
+
+
+def test_search_matches_python_loop():
+    rng = random.Random(0)
+    titles = ["".join(rng.choice("ab ") for _ in range(rng.randint(0, 6)))
+              for _ in range(300)]
+    index = TitleIndex(titles)
+    for size in range(1, 6):
+        for _ in range(20):
+            text = "".join(rng.choice("ab") for _ in range(size))
+            assert index.search(text).tolist() == [
+                row for row, title in enumerate(index.titles)
+                if text in title]
+
+
+def test_short_and_empty_titles():
+    # titles too short to have a trigram are still found
+    index = TitleIndex(["Up", "It", "Pi"])
+    assert index.search("up").tolist() == [0]
+    assert index.search("i").tolist() == [1, 2]
+    assert index.search("upstairs").tolist() == []
+    # titles with nothing to index, such as in an empty table
+    index = TitleIndex(["?!", ""])
+    assert index.keys.tolist() == [] and index.indptr.tolist() == [0]
+    assert index.search("up").tolist() == []
+
+    index = MovieIndex(make_movie_table([], []))
+    assert len(index) == 0
+    assert index.query(title="star", genre="Drama",
+                       original_year=(1950, None)).tolist() == []
+
+
+def test_query():
+    index = MovieIndex(make_movie_data())
+    assert len(index) == 4
+    assert index.query().tolist() == [0, 1, 2, 3]
+    assert sorted(index.query(genre="Horror").tolist()) == [1, 3]
+    assert index.query(genre="Horror", remake_genre="Sci-Fi").tolist() == [3]
+    assert index.query(genre="Western").tolist() == []
+    assert index.query(original_year=(1950, 1960)).tolist() == [3, 1]
+    assert index.query(original_year=(None, 1950),
+                       rating_change=(0, None)).tolist() == [2]
+    # ratings saved as 32 bit floats still match their one decimal value
+    assert index.query(remake_rating=(6.1, 6.1)).tolist() == [0]
+    assert index.query(rating_change=(-3.9, -3.9)).tolist() == [1]
+    assert index.query(rating_change=(0.6, 0.6)).tolist() == [2]
+    assert index.query(title="amelie").tolist() == [0]
+    assert index.query(title="sy").tolist() == [1]
+    assert index.query(title="a", remake_year=(1990, None)).tolist() == [0]
+    assert index.query(title="thing", genre="Horror").tolist() == [3]
+    assert index.query(title="psycho", original_year=(1990, None)).tolist() \
+        == []
+    with pytest.raises(ValueError):
+        index.query(director=(1, 2))
+
+
+def test_single_filter_is_a_view():
+    index = MovieIndex(make_movie_data())
+    rows = index.query(original_rating=(8, None))
+    assert rows.base is not None
+    assert index.records(rows)[0]["Original title"] == "Amélie"
+
+
+def test_load_and_records(tmp_path):
+    save_movie_table(make_movie_data(), str(tmp_path))
+    index = MovieIndex.load(str(tmp_path))
+    records = index.records(index.query(remake_genre="Drama"))
+    assert records == [{
+        "Original title": "Scarface", "Original year": 1932,
+        "Original genre(s)": ["Crime", "Drama"], "Original rating": 7.7,
+        "Original votes": 30000, "Remake title": "Scarface",
+        "Remake year": 1983, "Remake genre(s)": ["Crime", "Drama"],
+        "Remake rating": 8.3, "Remake votes": 800000}]
+
+
+def test_records_of_missing_values():
+    movie_data = make_movie_table(
+        [{"title": None, "year": None, "genres": None, "rating": None,
+          "votes": None}],
+        [{"title": "Remake", "year": 2000, "genres": ["Drama"],
+          "rating": 6.1, "votes": 100}])
+    record = MovieIndex(movie_data).records([0])[0]
+    assert [record[column] for column in MOVIE_COLUMNS[:5]] == [None] * 5
+    assert record["Remake year"] == 2000
+    assert round(record["Remake rating"], 6) == 6.1
+
+
+def test_server():
+    server = make_server(MovieIndex(make_movie_data()), port=0, limit=1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:%d" % server.server_address[1]
+    try:
+        response = requests.get(url + "/movies",
+                                params={"genre": "Horror",
+                                        "original_year": "1950:"})
+        assert response.status_code == 200
+        assert response.json()["count"] == 2
+        assert len(response.json()["movies"]) == 1
+
+        response = requests.get(url + "/movies", params={
+            "title": "scarface", "original_year": "1932", "limit": "5"})
+        assert [movie["Remake year"] for movie
+                in response.json()["movies"]] == [1983]
+
+        assert requests.get(url + "/movies",
+                            params={"original_year": "soon"}).status_code \
+            == 400
+        assert requests.get(url + "/movies",
+                            params={"director": "x"}).status_code == 400
+        assert requests.get(url + "/films").status_code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
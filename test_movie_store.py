@@ -0,0 +1,85 @@
+import pandas as pd
+
+import movie_store
+from movie_scraper import clean_dataframe, get_movie_data
+from movie_store import MovieStore, fetch_movie_record
+
+# Fake IMDb lookup. Movie "999" has no rating, and "404" doesn't exist.
+MOVIES = {
+    "1": {"title": "Original", "year": 1950, "genres": ["Drama"],
+          "rating": 7.5, "votes": 1000},
+    "2": {"title": "Remake", "year": 2010, "genres": ["Drama", "Crime"],
+          "rating": 6.1, "votes": 50000},
+    "999": {"title": "Obscure", "year": 1930, "genres": ["Horror"],
+            "rating": None, "votes": None},
+}
+lookups = []
+
+
+def fake_fetch(imdb_number):
+    lookups.append(imdb_number)
+    return MOVIES.get(imdb_number)
+
+
+def test_get_movie_data_looks_up_each_movie_once():
+    lookups.clear()
+    imdb_dataframe = pd.DataFrame([["1", "2"], ["1", "2"], ["999", "2"],
+                                   ["1", "404"]],
+                                  columns=["original", "remake"])
+    movie_data = get_movie_data(imdb_dataframe, fetch=fake_fetch)
+    assert movie_data.iloc[0].tolist() == [
+        "Original", 1950, ["Drama"], 7.5, 1000,
+        "Remake", 2010, ["Drama", "Crime"], 6.1, 50000]
+    assert movie_data.iloc[1].tolist() == movie_data.iloc[0].tolist()
+    # missing data is NA instead of "NONE"
+    assert movie_data.iloc[2, :3].tolist() == ["Obscure", 1930, ["Horror"]]
+    assert movie_data.iloc[2, 3:5].isna().all()
+    assert movie_data.iloc[3, 5:].isna().all()
+    assert sorted(lookups) == ["1", "2", "404", "999"]
+
+    assert movie_data.dtypes.astype(str).tolist()[:5] == [
+        "string", "Int16", "object", "float32", "Int32"]
+    assert len(clean_dataframe(movie_data)) == 2
+
+
+def test_clean_dataframe():
+    # clean_dataframe removes "NONE" from link tables and NA from movie data
+    links = pd.DataFrame([["a", "NONE"], ["b", "c"], ["NONE", "d"]],
+                         columns=["original link", "remake link"])
+    assert clean_dataframe(links).values.tolist() == [["b", "c"]]
+    movies = pd.DataFrame({"year": pd.array([None, 1950], dtype="Int16"),
+                           "genres": [["Drama"], ["Comedy"]]})
+    cleaned = clean_dataframe(movies)
+    assert cleaned["genres"].tolist() == [["Comedy"]]
+    assert cleaned.index.tolist() == [0]
+
+
+def test_store_only_refreshes_stale_movies(tmp_path):
+    lookups.clear()
+    path = str(tmp_path / "movies.sqlite")
+    MovieStore(path).lookup(["1", "2"], fetch=fake_fetch)
+    # a reopened store still has both movies
+    records = MovieStore(path).lookup(["1", "2"], fetch=fake_fetch)
+    assert records["2"]["genres"] == ["Drama", "Crime"]
+    assert lookups == ["1", "2"]
+    # with refresh_after=0 every movie is due for a refresh
+    MovieStore(path, refresh_after=0).lookup(["1"], fetch=fake_fetch)
+    assert lookups == ["1", "2", "1"]
+
+
+class BrokenIMDb:
+    # IMDbPY that can't parse the page of movie "2"
+    def get_movie(self, imdb_number):
+        if imdb_number == "2":
+            raise KeyError("title")
+        return {"title": "Film " + imdb_number, "year": 1950,
+                "genre": ["Drama"], "rating": 7.5, "votes": 1000}
+
+
+def test_errors_only_lose_one_movie(monkeypatch):
+    monkeypatch.setattr(movie_store._local, "ia", BrokenIMDb(),
+                        raising=False)
+    assert fetch_movie_record("2") is None
+    records = MovieStore().lookup(["1", "2", "3"], max_workers=1)
+    assert sorted(records) == ["1", "3"]
+    assert records["1"]["genres"] == ["Drama"]
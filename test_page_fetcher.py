@@ -0,0 +1,71 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from page_fetcher import PageFetcher
+from movie_scraper import get_imdb_numbers
+
+# Small Wikipedia stand-in. Every path is a film article that links to an IMDb
+# page whose number is the digits in the path.
+ARTICLE = ('<html><body><p>Film</p><a class="external text" '
+           'href="https://www.imdb.com/title/tt{number}/">{title}</a>'
+           '</body></html>')
+
+
+class WikiHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        WikiHandler.requests_seen.append(self.path)
+        number = "".join(c for c in self.path if c.isdigit())
+        if not number:
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = ARTICLE.format(number=number, title=self.path).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def wiki_server():
+    WikiHandler.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), WikiHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:%d" % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_many_fetches_each_url_once(wiki_server):
+    # repeated urls should only be requested once
+    urls = [wiki_server + "/wiki/Film_%d" % (i % 5) for i in range(20)]
+    with PageFetcher(max_workers=4, per_host=2) as fetcher:
+        pages = fetcher.get_many(urls)
+    assert len(pages) == 5
+    assert len(WikiHandler.requests_seen) == 5
+    assert all(page.status_code == 200 for page in pages.values())
+
+
+def test_get_imdb_numbers(wiki_server):
+    # rows keep their order and missing pages become "NONE"
+    wiki_dataframe = pd.DataFrame(
+        [[wiki_server + "/wiki/Film_0012345", wiki_server + "/wiki/Film_2"],
+         [wiki_server + "/wiki/Film_0012345", wiki_server + "/wiki/Missing"],
+         ["NONE", wiki_server + "/wiki/Film_3"]],
+        columns=["original link", "remake link"])
+    with PageFetcher(max_workers=4) as fetcher:
+        imdb_dataframe = get_imdb_numbers(wiki_dataframe, fetcher)
+    assert imdb_dataframe.values.tolist() == [["0012345", "2"],
+                                              ["0012345", "NONE"],
+                                              ["NONE", "3"]]
+    assert len(WikiHandler.requests_seen) == 4
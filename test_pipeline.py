@@ -0,0 +1,170 @@
+import json
+
+import pytest
+
+import pipeline
+from pipeline import run_pipeline, stream_pipeline
+from rating_aggregates import RatingAggregates
+from remake_graph import RemakeGraph
+
+WIKI = "https://en.wikipedia.org"
+
+
+def test_resume_after_crash(tmp_path, fake_fetcher, fake_store):
+    fetcher = fake_fetcher([(1, 2), (3, 4), (5, 6)])
+    with pytest.raises(ConnectionError):
+        run_pipeline(str(tmp_path), chunk_size=1, fetcher=fetcher,
+                     store=fake_store(crash_after=4))
+    # the resumed run doesn't download anything again and only looks up the
+    # chunk that was not finished, in chunks of the size it was started with
+    fetcher.requested = []
+    store = fake_store()
+    movie_data = run_pipeline(str(tmp_path), chunk_size=2, fetcher=fetcher,
+                              store=store)
+    assert fetcher.requested == []
+    assert store.looked_up == ["5", "6"]
+    assert list(movie_data["Original title"]) == ["Film 1", "Film 3",
+                                                  "Film 5"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "links.pkl", "movie_dataset", "validation.json"]
+
+
+def test_incremental_run_only_scrapes_new_pairs(tmp_path, fake_fetcher,
+                                                fake_store):
+    fetcher = fake_fetcher([(1, 2), (3, 4)])
+    run_pipeline(str(tmp_path), fetcher=fetcher, store=fake_store())
+    # one pair is added and one pair changes its remake
+    fetcher.pairs = [(1, 2), (3, 8), (5, 6)]
+    fetcher.requested = []
+    store = fake_store()
+    movie_data = run_pipeline(str(tmp_path), incremental=True,
+                              fetcher=fetcher, store=store)
+    assert sorted(fetcher.requested[2:]) == [WIKI + "/wiki/Film_%d" % n
+                                             for n in [3, 5, 6, 8]]
+    assert store.looked_up == ["3", "5", "8", "6"]
+    # the pair that is gone from wikipedia is taken out
+    assert list(movie_data["Remake title"]) == ["Film 2", "Film 8",
+                                                "Film 6"]
+    # the totals of the ratings were changed rather than rebuilt
+    aggregates = RatingAggregates.load(str(tmp_path / "movie_dataset"))
+    assert aggregates.rows == 3
+    assert aggregates.summary("genre")["count"].tolist() == [3]
+    assert aggregates.summary("year").index.tolist() == [1902, 1906, 1908]
+    # and the graph of remakes has the pairs listed now
+    graph = RemakeGraph.load(str(tmp_path / "movie_dataset"))
+    assert graph.remakes_of("3").tolist() == [8]
+    assert [pairs.tolist() for pairs in graph.pairs()] == [[1, 3, 5],
+                                                           [2, 8, 6]]
+
+    # a pair that disappears is taken out even when nothing is added
+    fetcher.pairs = [(3, 8), (5, 6)]
+    store = fake_store()
+    movie_data = run_pipeline(str(tmp_path), incremental=True,
+                              fetcher=fetcher, store=store)
+    assert store.looked_up == []
+    assert list(movie_data["Remake title"]) == ["Film 8", "Film 6"]
+    assert RatingAggregates.load(str(tmp_path / "movie_dataset")).rows == 2
+    assert RemakeGraph.load(str(tmp_path / "movie_dataset")) \
+        .remakes_of("1").tolist() == []
+
+
+def test_incremental_run_retries_pairs_that_were_left_out(tmp_path,
+                                                         fake_fetcher,
+                                                         fake_store):
+    # the article of film 4 can't be downloaded the first time
+    fetcher = fake_fetcher([(1, 2), (3, 4)], missing=[4])
+    run_pipeline(str(tmp_path), fetcher=fetcher, store=fake_store())
+    fetcher.missing = set()
+    fetcher.requested = []
+    store = fake_store()
+    movie_data = run_pipeline(str(tmp_path), incremental=True,
+                              fetcher=fetcher, store=store)
+    assert sorted(fetcher.requested[2:]) == [WIKI + "/wiki/Film_3",
+                                             WIKI + "/wiki/Film_4"]
+    assert store.looked_up == ["3", "4"]
+    assert list(movie_data["Remake title"]) == ["Film 2", "Film 4"]
+    assert RatingAggregates.load(str(tmp_path / "movie_dataset")).rows == 2
+    graph = RemakeGraph.load(str(tmp_path / "movie_dataset"))
+    assert [pairs.tolist() for pairs in graph.pairs()] == [[1, 3], [2, 4]]
+
+    # the pair now has a row, so it isn't scraped again
+    fetcher.requested = []
+    movie_data = run_pipeline(str(tmp_path), incremental=True,
+                              fetcher=fetcher, store=fake_store())
+    assert fetcher.requested[2:] == []
+    assert len(movie_data) == 2
+
+
+def test_crash_while_replacing_the_dataset(tmp_path, monkeypatch,
+                                           fake_fetcher, fake_store):
+    fetcher = fake_fetcher([(1, 2)])
+    run_pipeline(str(tmp_path), fetcher=fetcher, store=fake_store())
+    fetcher.pairs = [(1, 2), (3, 4)]
+
+    def crash(new_path, path):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(pipeline, "replace_folder", crash)
+    with pytest.raises(OSError):
+        run_pipeline(str(tmp_path), incremental=True, fetcher=fetcher,
+                     store=fake_store())
+    monkeypatch.undo()
+    # the resumed run only moves the saved results into place
+    fetcher.requested = []
+    store = fake_store()
+    movie_data = run_pipeline(str(tmp_path), incremental=True,
+                              fetcher=fetcher, store=store)
+    assert fetcher.requested == [] and store.looked_up == []
+    assert list(movie_data["Remake title"]) == ["Film 2", "Film 4"]
+    assert not tmp_path.joinpath("run.json").exists()
+    assert not tmp_path.joinpath("movie_dataset.new").exists()
+
+    # and the next run doesn't add any of the rows again
+    movie_data = run_pipeline(str(tmp_path), incremental=True,
+                              fetcher=fetcher, store=store)
+    assert list(movie_data["Remake title"]) == ["Film 2", "Film 4"]
+
+
+def test_stream_pipeline(tmp_path, fake_fetcher, fake_store):
+    # the "remake" of the last pair came out before its original
+    fetcher = fake_fetcher([(1, 2), (3, 4), (1, 6), (7, 8), (9, 5)])
+    movie_data = stream_pipeline(str(tmp_path), fetcher=fetcher,
+                                 store=fake_store(), batch_size=3,
+                                 queue_size=1, resolve_workers=2)
+    assert sorted(movie_data["Remake title"]) == ["Film 2", "Film 4",
+                                                  "Film 6", "Film 8"]
+    # the article of the film that was remade twice is only read once
+    assert fetcher.requested.count(WIKI + "/wiki/Film_1") == 1
+    # the graph and the totals only have the rows that were kept
+    graph = RemakeGraph.load(str(tmp_path / "movie_dataset"))
+    assert graph.remakes_of(1).tolist() == [2, 6]
+    assert graph.remakes_of(9).tolist() == []
+    assert len(graph) == 7
+    assert RatingAggregates.load(str(tmp_path / "movie_dataset")).rows == 4
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["movie_dataset",
+                                                          "validation.json"]
+    report = json.loads(tmp_path.joinpath("validation.json").read_text())
+    assert len(report["Remake year is not before Original year"]) == 1
+
+
+def test_stream_pipeline_shares_reads_and_lookups(tmp_path, fake_fetcher,
+                                                  fake_store):
+    # both workers need the article of film 1 at the same time
+    fetcher = fake_fetcher([(1, 2), (1, 4)] + [(n, n + 1)
+                                               for n in range(5, 40, 2)],
+                           delay=0.05)
+    store = fake_store(delay=0.2)
+    movie_data = stream_pipeline(str(tmp_path), fetcher=fetcher,
+                                 store=store, resolve_workers=2,
+                                 lookup_workers=1)
+    assert len(movie_data) == 20
+    assert fetcher.requested.count(WIKI + "/wiki/Film_1") == 1
+    # pairs that queued up during the slow lookup were looked up together
+    assert store.calls < 20
+
+
+def test_stream_pipeline_failure(tmp_path, fake_fetcher, fake_store):
+    fetcher = fake_fetcher([(n, n + 1) for n in range(1, 40, 2)])
+    with pytest.raises(ConnectionError):
+        stream_pipeline(str(tmp_path), fetcher=fetcher,
+                        store=fake_store(crash_after=4), queue_size=2)
@@ -0,0 +1,124 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from page_fetcher import PageFetcher
+from rate_limiter import RequestScheduler, TokenBucket, retry_after_seconds
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    # answers 429 to any request over max_in_flight at once, asking the first
+    # one to wait with Retry-After. /flaky paths fail twice first
+    max_in_flight = 2
+    lock = threading.Lock()
+    in_flight = 0
+    throttled = 0
+    failures = {}
+
+    def do_GET(self):
+        cls = ThrottlingHandler
+        with cls.lock:
+            cls.in_flight += 1
+            over_limit = cls.in_flight > cls.max_in_flight
+            cls.throttled += over_limit
+            first_throttle = over_limit and cls.throttled == 1
+            failed = cls.failures.get(self.path, 0)
+            if self.path.startswith("/flaky") and not over_limit:
+                cls.failures[self.path] = failed + 1
+        try:
+            if over_limit:
+                self.send_response(429)
+                if first_throttle:
+                    self.send_header("Retry-After", "1")
+            elif self.path.startswith("/flaky") and failed < 2:
+                self.send_response(502)
+            else:
+                time.sleep(0.02)
+                self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def throttling_server():
+    ThrottlingHandler.throttled = 0
+    ThrottlingHandler.failures = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottlingHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:%d" % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def test_backs_off_until_server_keeps_up(throttling_server):
+    scheduler = RequestScheduler(concurrency=8, max_concurrency=8,
+                                 retries=10, backoff=0.01)
+    urls = [throttling_server + "/film/%d" % n for n in range(40)]
+    urls += [throttling_server + "/flaky/%d" % n for n in range(3)]
+    with PageFetcher(max_workers=8, scheduler=scheduler) as fetcher:
+        start = time.monotonic()
+        pages = fetcher.get_many(urls)
+        seconds = time.monotonic() - start
+    # every page arrives in the end, despite throttling and server errors
+    assert [page.status_code for page in pages.values()] == [200] * 43
+    stats = scheduler.stats(throttling_server.split("//")[1])
+    assert stats["throttled"] == ThrottlingHandler.throttled > 0
+    assert stats["errors"] == 6
+    # the limit was cut down to what the server allows
+    assert stats["limit"] < 8
+    # and every request waited for the server's Retry-After
+    assert seconds >= 1
+
+
+def test_gives_up_after_retries(throttling_server):
+    scheduler = RequestScheduler(retries=1, backoff=0.01)
+    with PageFetcher(scheduler=scheduler) as fetcher:
+        assert fetcher.get(throttling_server + "/flaky/1").status_code == 502
+
+
+def test_scheduler_retries_calls():
+    calls = []
+
+    def lookup():
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise ConnectionError("reset")
+        return "movie"
+
+    def classify(result):
+        return ("errors" if isinstance(result, ConnectionError) else "ok",
+                None)
+
+    scheduler = RequestScheduler(backoff=0.01)
+    assert scheduler.call("imdb", lookup, classify) == "movie"
+    assert scheduler.stats("imdb")["retries"] == 2
+
+    # the error of the last try is raised once the retries run out
+    calls.clear()
+    with pytest.raises(ConnectionError):
+        RequestScheduler(retries=1, backoff=0.01).call("imdb", lookup,
+                                                       classify)
+    assert len(calls) == 2
+
+
+def test_token_bucket_and_retry_after():
+    bucket = TokenBucket(rate=100, burst=2)
+    waits = [bucket.reserve() for n in range(4)]
+    assert waits[:2] == [0, 0]
+    assert waits[2] == pytest.approx(0.01, abs=0.002)
+    assert waits[3] == pytest.approx(0.02, abs=0.002)
+
+    assert retry_after_seconds("120") == 120
+    assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT",
+                               now=1445412470) == 10
+    assert retry_after_seconds("soon") is None
@@ -0,0 +1,78 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+
+from genre_index import GenreIndex
+from graph_data import (graph_rating_change_by_genre,
+                        graph_rating_change_by_genre_full,
+                        make_rating_aggregates)
+from movie_scraper import MOVIE_COLUMNS
+from rating_aggregates import RatingAggregates
+
+
+def test_incremental_totals_match_full_build(tmp_path, make_movie_data):
+    array = make_movie_data(rows=300)
+    movie_data = pd.DataFrame(array, columns=MOVIE_COLUMNS)
+    full = make_rating_aggregates(array)
+
+    # add the movies in two goes, saving and loading in between
+    aggregates = RatingAggregates()
+    aggregates.add(movie_data[:100])
+    aggregates.save(str(tmp_path))
+    aggregates = RatingAggregates.load(str(tmp_path))
+    aggregates.add(movie_data[100:])
+    assert aggregates.rows == 300
+
+    for group in ["genre", "year", "gap"]:
+        for value in ["change", "original", "remake"]:
+            pd.testing.assert_frame_equal(aggregates.summary(group, value),
+                                          full.summary(group, value))
+    assert aggregates.popular() == GenreIndex.from_lists(array[:, 2]) \
+        .popular()
+
+    # taking movies out again matches the totals of the movies left
+    aggregates.remove(movie_data[200:])
+    assert aggregates.rows == 200
+    partial = make_rating_aggregates(array[:200])
+    for group in ["genre", "year", "gap"]:
+        pd.testing.assert_frame_equal(aggregates.summary(group),
+                                      partial.summary(group), atol=1e-6)
+
+
+def test_summary_statistics(make_movie_data):
+    array = make_movie_data(rows=300)
+    aggregates = make_rating_aggregates(array)
+    d_rating = (array[:, 8] - array[:, 3]).astype(float)
+
+    genre_index = GenreIndex.from_lists(array[:, 2])
+    summary = aggregates.summary("genre")
+    assert np.allclose(summary["mean"][genre_index.genres],
+                       genre_index.means(d_rating))
+
+    gap = array[:, 6] - array[:, 1]
+    summary = aggregates.summary("gap")
+    bucket = summary.index[3]
+    in_bucket = (gap >= bucket) & (gap < bucket + aggregates.gap_width)
+    assert summary["count"][bucket] == in_bucket.sum()
+    assert np.isclose(summary["std"][bucket], d_rating[in_bucket].std())
+
+    assert RatingAggregates.load("./no_such_dataset") is None
+
+
+def bars(graph, movie_data, **kwargs):
+    plt.figure()
+    graph(movie_data, bars=4, **kwargs)
+    patches = plt.gca().patches
+    plt.close()
+    return [(bar.get_x(), bar.get_y(), bar.get_height()) for bar in patches]
+
+
+def test_genre_graphs_from_totals(make_movie_data):
+    movie_data = make_movie_data()
+    aggregates = make_rating_aggregates(movie_data)
+    for graph in [graph_rating_change_by_genre,
+                  graph_rating_change_by_genre_full]:
+        # the movies aren't needed at all once the totals are made
+        assert np.ravel(bars(graph, None, aggregates=aggregates)) == \
+            pytest.approx(np.ravel(bars(graph, movie_data)))
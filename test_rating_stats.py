@@ -0,0 +1,68 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+
+from graph_data import (graph_rating_change_by_genre,
+                        graph_rating_change_by_genre_full, make_genre_index,
+                        make_rating_aggregates)
+from movie_scraper import MOVIE_COLUMNS
+from rating_stats import (bootstrap_intervals,
+                          permutation_tests, rating_change_summary)
+
+
+def test_intervals_and_tests():
+    rng = np.random.default_rng(1)
+    better = rng.normal(1.0, 1.0, 200)
+    no_change = np.concatenate([better, -better])
+    values = np.concatenate([better, no_change])
+    groups = [np.arange(200), np.arange(200, 600)]
+
+    low, high = bootstrap_intervals(values, groups, resamples=2000,
+                                    max_elements=10000)
+    assert low[0] < better.mean() < high[0]
+    # the interval of a mean of n values is about 4 standard errors wide
+    assert high[0] - low[0] == pytest.approx(4 * better.std() / 200 ** 0.5,
+                                             rel=0.2)
+    assert low[1] < 0 < high[1]
+
+    p_values = permutation_tests(values, groups, resamples=2000)
+    assert p_values[0] == pytest.approx(1 / 2001)
+    assert p_values[1] == 1
+
+    # spreading the resamples over processes gives the same answers
+    assert np.array_equal(
+        bootstrap_intervals(values, groups, resamples=2000, processes=2),
+        bootstrap_intervals(values, groups, resamples=2000))
+
+
+def test_rating_change_summary(make_movie_data):
+    array = make_movie_data(rows=200)
+    movie_data = pd.DataFrame(array, columns=MOVIE_COLUMNS)
+    summary = rating_change_summary(movie_data, by="genre", resamples=500)
+    genre_index = make_genre_index(array)
+    assert summary.index.tolist() == genre_index.genres
+    assert summary["count"].tolist() == genre_index.counts().tolist()
+    assert (summary["low"] <= summary["mean"]).all()
+    assert (summary["mean"] <= summary["high"]).all()
+    assert rating_change_summary(movie_data, by="gap", resamples=10)[
+        "count"].sum() == 200
+    with pytest.raises(ValueError):
+        rating_change_summary(movie_data, by="decade")
+
+
+def test_error_bars(make_movie_data):
+    movie_data = make_movie_data()
+    for graph in [graph_rating_change_by_genre,
+                  graph_rating_change_by_genre_full]:
+        plt.figure()
+        graph(movie_data, bars=4, error_bars=True)
+        # one error bar line per genre
+        assert len(plt.gca().collections[0].get_segments()) == 4
+        plt.close()
+
+    aggregates = make_rating_aggregates(movie_data)
+    with pytest.raises(ValueError):
+        graph_rating_change_by_genre(None, aggregates=aggregates,
+                                     error_bars=True)
+    plt.close()
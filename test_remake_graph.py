@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from remake_graph import RemakeGraph
+
+
+def make_graph():
+    # 1 was remade as 2 and 3, 2 was remade as 3, 3 was remade as 4, and 5
+    # and 6 list each other as remakes by mistake
+    return RemakeGraph.from_pairs(
+        ["0000001", "0000001", "0000002", "0000003", "NONE", "5", "6", "1"],
+        ["0000002", "0000003", "0000003", "0000004", "7", "6", "5", "2"],
+        [7.0, 7.0, 6.0, 5.0, 1.0, 5.0, 5.0, np.nan],
+        [6.0, 5.0, 5.0, 4.5, 1.0, 5.0, 5.0, np.nan])
+
+
+def test_queries():
+    graph = make_graph()
+    assert len(graph) == 6
+    assert graph.remakes_of("1").tolist() == [2, 3]
+    assert graph.remakes_of(1, every_generation=True).tolist() == [2, 3, 4]
+    assert graph.remakes_of("4").tolist() == []
+    assert graph.remakes_of("missing").tolist() == []
+    assert graph.originals_of(3).tolist() == [1, 2]
+    assert graph.nodes(["3", "NONE", 99]).tolist() == [2, -1, -1]
+
+    # 3 is a remake of a remake, and the chain below 1 is 1, 2, 3, 4
+    assert graph.generations().tolist() == [0, 1, 2, 3, -1, -1]
+    assert graph.chain_depth("1") == 3
+    assert graph.generation("3") == 2
+    with pytest.raises(KeyError):
+        graph.generation("8")
+
+    # the pair listed twice only counts once
+    originals, remakes = graph.pairs()
+    assert originals.tolist() == [1, 1, 2, 3, 5, 6]
+    assert remakes.tolist() == [2, 3, 3, 4, 6, 5]
+    assert graph.rating_changes().tolist() == [-1, -2, -1, -0.5, 0, 0]
+
+
+def test_rating_change_by_generation():
+    summary = make_graph().rating_change_by_generation()
+    assert summary.index.tolist() == [1, 2, 3]
+    assert summary["count"].tolist() == [1, 2, 1]
+    assert summary["mean"].tolist() == [-1, -1.5, -0.5]
+
+
+def test_save_merge_and_load(tmp_path):
+    graph = make_graph()
+    graph.save(str(tmp_path))
+    loaded = RemakeGraph.load(str(tmp_path))
+    assert isinstance(loaded.remakes, np.memmap)
+    assert loaded.remakes_of(3).tolist() == [4]
+    assert RemakeGraph.load(str(tmp_path / "missing")) is None
+
+    merged = loaded.merge(RemakeGraph.from_pairs(["4"], ["8"], [4.0], [3.0]))
+    assert merged.chain_depth(1) == 4
+    assert merged.ratings[merged.nodes([4, 8])].tolist() == [4.0, 3.0]
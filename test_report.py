@@ -0,0 +1,20 @@
+import pandas as pd
+
+from dataset_io import save_movie_table
+from movie_scraper import MOVIE_COLUMNS
+from report import GRAPHS, render_report
+
+
+def test_render_report(tmp_path, make_movie_data):
+    movie_data = pd.DataFrame(make_movie_data(rows=50), columns=MOVIE_COLUMNS)
+    save_movie_table(movie_data, str(tmp_path / "movies"))
+    for processes in [1, 2]:
+        path = tmp_path / ("report_%d" % processes)
+        timings = render_report(str(tmp_path / "movies"), str(path),
+                                processes=processes, mode="density",
+                                error_bars=True)
+        assert sorted(p.name for p in path.iterdir()) == sorted(
+            "%s.%s" % (name, file_format) for name in GRAPHS
+            for file_format in ["png", "svg"])
+        assert set(timings["figures"]) == set(GRAPHS)
+        assert 0 < timings["first_figure"] <= timings["total"]
@@ -0,0 +1,62 @@
+import pandas as pd
+
+from movie_scraper import MOVIE_COLUMNS, make_movie_table
+from validation import (LAST_YEAR, format_report, invalid_rows,
+                        number_rule, validate_movie_table)
+
+GOOD = {"title": "Original", "year": 1950, "genres": ["Drama"],
+        "rating": 7.5, "votes": 10}
+REMAKE = {"title": "Remake", "year": 2000, "genres": ["Drama", "War"],
+          "rating": 6.1, "votes": 20}
+
+
+def broken_rules(report):
+    return {name: rows.tolist() for name, rows in report.items() if len(rows)}
+
+
+def test_valid_table_passes():
+    movie_data = make_movie_table([GOOD] * 3, [REMAKE] * 3)
+    report = validate_movie_table(movie_data)
+    assert broken_rules(report) == {}
+    assert format_report(report) == ""
+
+
+def test_reports_offending_rows_per_rule():
+    originals = [GOOD,
+                 dict(GOOD, rating=11.0),
+                 dict(GOOD, genres=[]),
+                 dict(GOOD, year=2010),
+                 None]
+    movie_data = make_movie_table(originals, [REMAKE] * 5)
+    report = validate_movie_table(movie_data)
+    assert broken_rules(report) == {
+        "Original title is text": [4],
+        "Original year is a whole number from 1870 to %d" % LAST_YEAR: [4],
+        "Original genre(s) is a list of genres": [2, 4],
+        "Original rating is a number from 1 to 10": [1, 4],
+        "Original votes is a whole number of at least 0": [4],
+        "Remake year is not before Original year": [3],
+    }
+    assert invalid_rows(report, 5).tolist() == [False, True, True, True,
+                                                True]
+
+
+def test_checks_types_of_python_objects():
+    # tables from the original scraper hold everything as python objects
+    rows = [["A", 1950, ["Drama"], 7.5, 10, "B", 2000, ["War"], 6.1, 20],
+            ["A", 1950.5, "Drama", "7.5", True, "", 2000, [3], 6, 20]]
+    movie_data = pd.DataFrame(rows, columns=MOVIE_COLUMNS, dtype=object)
+    report = validate_movie_table(movie_data)
+    assert broken_rules(report) == {
+        "Original year is a whole number from 1870 to %d" % LAST_YEAR: [1],
+        "Original genre(s) is a list of genres": [1],
+        "Original rating is a number from 1 to 10": [1],
+        "Original votes is a whole number of at least 0": [1],
+        "Remake title is text": [1],
+        "Remake genre(s) is a list of genres": [1],
+    }
+    # custom rules can be checked too
+    report = validate_movie_table(movie_data,
+                                  [number_rule("Remake votes", 0, 10)])
+    assert broken_rules(report) == {
+        "Remake votes is a number from 0 to 10": [0, 1]}
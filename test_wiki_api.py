@@ -0,0 +1,104 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+import pytest
+
+import wiki_api
+from movie_scraper import get_imdb_numbers
+from page_fetcher import PageFetcher
+from wiki_api import link_title, resolve_imdb_numbers
+
+# Recorded Wikipedia and Wikidata API responses, keyed by the titles or ids
+# asked for. Film A links to one IMDb page over two responses, "film B" is
+# a redirect to "Film B (1950 film)" which links to two IMDb pages, and
+# "Film C" has no links.
+RESPONSES = {
+    ("Film A|film B|Film C", None): {
+        "continue": {"elcontinue": "1|2", "continue": "||"},
+        "query": {
+            "normalized": [{"from": "film B", "to": "Film B"}],
+            "redirects": [{"from": "Film B", "to": "Film B (1950 film)"}],
+            "pages": [
+                {"title": "Film A", "pageprops": {"wikibase_item": "Q1"}},
+                {"title": "Film B (1950 film)",
+                 "pageprops": {"wikibase_item": "Q2"},
+                 "extlinks": [{"url": "https://www.imdb.com/title/tt0000021/"},
+                              {"url": "https://www.imdb.com/title/tt0000022/"
+                                      "fullcredits"}]},
+                {"title": "Film C"}]}},
+    ("Film A|film B|Film C", "1|2"): {
+        "query": {"pages": [
+            {"title": "Film A",
+             "extlinks": [{"url": "https://www.imdb.com/title/tt0000011/"},
+                          {"url": "https://www.imdb.com/title/tt0000011/"}]}
+        ]}},
+    ("Q2", None): {"entities": {"Q2": {"claims": {"P345": [
+        {"mainsnak": {"datavalue": {"value": "tt0000021"}}}]}}}},
+}
+requests_seen = []
+
+
+class APIHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: value[0] for key, value in parse_qs(url.query).items()}
+        requests_seen.append(url.path)
+        if url.path == "/wiki/Film_C":
+            body = "<html><body>No IMDb link</body></html>"
+        else:
+            key = params.get("titles", params.get("ids"))
+            body = json.dumps(RESPONSES[(key, params.get("elcontinue"))])
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api_server(monkeypatch):
+    requests_seen.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), APIHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = "http://127.0.0.1:%d" % server.server_address[1]
+    monkeypatch.setattr(wiki_api, "API_URL", url + "/w/api.php")
+    monkeypatch.setattr(wiki_api, "WIKIDATA_API_URL", url + "/wikidata")
+    yield url
+    server.shutdown()
+    server.server_close()
+
+
+def test_link_title():
+    assert link_title("https://en.wikipedia.org/wiki/The_Thing_"
+                      "(1982_film)") == "The Thing (1982 film)"
+    assert link_title("https://en.wikipedia.org/wiki/%C3%80_nous_"
+                      "la_libert%C3%A9") == "À nous la liberté"
+
+
+def test_resolve_imdb_numbers(api_server):
+    links = [api_server + "/wiki/Film_A", api_server + "/wiki/film_B",
+             api_server + "/wiki/Film_C", api_server + "/wiki/Film_A"]
+    with PageFetcher() as fetcher:
+        numbers = resolve_imdb_numbers(links, fetcher)
+    assert numbers == {links[0]: "0000011", links[1]: "0000021"}
+    assert requests_seen == ["/w/api.php", "/w/api.php", "/wikidata"]
+
+
+def test_get_imdb_numbers_falls_back_to_pages(api_server):
+    wiki_dataframe = pd.DataFrame(
+        [[api_server + "/wiki/Film_A", api_server + "/wiki/Film_C"],
+         [api_server + "/wiki/film_B", "NONE"]],
+        columns=["original link", "remake link"])
+    with PageFetcher() as fetcher:
+        imdb_dataframe = get_imdb_numbers(wiki_dataframe, fetcher,
+                                          use_api=True)
+    assert imdb_dataframe.values.tolist() == [["0000011", "NONE"],
+                                              ["0000021", "NONE"]]
+    # only the page the api couldn't resolve was downloaded
+    assert requests_seen.count("/wiki/Film_C") == 1
+    assert len(requests_seen) == 4
@@ -0,0 +1,50 @@
+from bs4 import BeautifulSoup as soup
+
+from wiki_parser import find_imdb_number, find_imdb_numbers, \
+    find_remake_links, parse_remake_tables
+
+
+def test_find_imdb_number():
+    page = ('<p>See https://www.imdb.com/title/tt0000001/ in text.</p>'
+            '<a class="external text" '
+            'href="https://www.imdb.com/title/tt0000002/">First</a>'
+            '<a href="https://www.imdb.com/title/tt0000003/">Not external</a>'
+            '<a rel="nofollow" class="external text"\n'
+            'href="https://www.imdb.com/title/tt0000004/">Last</a>'
+            '<span title="https://www.imdb.com/title/tt0000005/"></span>')
+    # the last external link to imdb is the one in "External links"
+    assert find_imdb_number(page) == "0000004"
+    assert find_imdb_number("<a class='external text' "
+                            "href='https://www.imdb.com/title/tt42/'>") == "42"
+    assert find_imdb_number("<p>No links</p>") == "NONE"
+    assert find_imdb_numbers([page, page]) == ["0000004"] * 2
+
+
+def test_parse_remake_tables():
+    page = ("<p><a href='/wiki/Skip'>x</a></p><table><tr><td>1</td></tr>"
+            "</table><div><table><tr><td><a href='/wiki/A'>A</a></td></tr>"
+            "<tr><td>2</td></tr></table></div>")
+    tables = parse_remake_tables(page)
+    full_tables = soup(page, "html.parser").find_all("table")
+    assert [str(t) for t in tables] == [str(t) for t in full_tables]
+
+
+def test_find_remake_links():
+    page = ("<table><tr><th>Original</th><th>Remakes</th></tr>"
+            # a film remade twice, with a footnote and a missing article
+            "<tr><td><a href='/wiki/A'>A</a><sup><a href='#cite_note-1'>1"
+            "</a></sup></td><td><a href='/wiki/A_(1950)'>A</a><br>"
+            "<a href='/w/index.php?title=A_(1970)&redlink=1'>A</a><br>"
+            "<a href='/wiki/A_(1990)'>A</a></td></tr>"
+            # an original whose cell spans the next row
+            "<tr><td rowspan='2'><a href='/wiki/B'>B</a></td>"
+            "<td><a href='/wiki/B_(1960)'>B</a></td></tr>"
+            "<tr><td><a href='/wiki/B_(2000)'>B</a></td></tr>"
+            "<tr><td><a href='/wiki/C'>C</a></td><td>Unknown</td></tr>"
+            "</table>")
+    table = parse_remake_tables(page)[0]
+    assert find_remake_links(table) == [
+        ("/wiki/A", ["/wiki/A_(1950)", "/wiki/A_(1990)"]),
+        ("/wiki/B", ["/wiki/B_(1960)"]),
+        ("/wiki/B", ["/wiki/B_(2000)"]),
+        ("/wiki/C", [])]
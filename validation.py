@@ -0,0 +1,245 @@
+import datetime
+import json
+from collections import namedtuple
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+from movie_scraper import MOVIE_COLUMNS
+
+# a rule checks some columns of the movie data. check gets those columns and
+# returns a boolean array that is True for every row that breaks the rule
+Rule = namedtuple("Rule", ["name", "columns", "check"])
+
+# the first films were made in the 1870s, and a few years ahead leaves room
+# for announced remakes
+FIRST_YEAR = 1870
+LAST_YEAR = datetime.date.today().year + 5
+
+
+def _type_mask(values, types):
+    """
+    Get a boolean array that is True where an entry of an array of objects is
+    not one of types. Checks the type of each different type of entry once
+    rather than every entry, as most columns only hold one type.
+    """
+    def is_allowed(kind):
+        return issubclass(kind, types) and kind is not bool
+
+    kinds = list(map(type, values))
+    if all(map(is_allowed, set(kinds))):
+        return np.zeros(len(values), dtype=bool)
+    return np.array([not is_allowed(kind) for kind in kinds], dtype=bool)
+
+
+def _numbers(values, types):
+    """
+    Get a column as floats, with NaN wherever an entry is missing or is the
+    wrong type of value.
+    """
+    if is_numeric_dtype(values.dtype) and not is_bool_dtype(values.dtype):
+        return values.to_numpy(dtype=np.float64, na_value=np.nan)
+    # tables from the original scraper hold python objects
+    values = values.to_numpy(dtype=object)
+    numbers = np.full(len(values), np.nan)
+    allowed = ~_type_mask(values, types)
+    numbers[allowed] = values[allowed].astype(np.float64)
+    return numbers
+
+
+def text_rule(column):
+    """
+    Every entry of column is a non-empty string other than "NONE".
+    """
+    def check(values):
+        if isinstance(values.dtype, pd.StringDtype):
+            values = values.to_numpy(dtype=object, na_value="")
+            bad = np.zeros(len(values), dtype=bool)
+        else:
+            values = values.to_numpy(dtype=object)
+            bad = _type_mask(values, str)
+        return bad | (values == "") | (values == "NONE")
+
+    return Rule("%s is text" % column, [column], check)
+
+
+def number_rule(column, low=None, high=None, integer=False):
+    """
+    Every entry of column is a number from low to high. If integer, every
+    entry is also a whole number.
+    """
+    types = (int, np.integer) if integer else \
+        (int, float, np.integer, np.floating)
+
+    def check(values):
+        numbers = _numbers(values, types)
+        bad = np.isnan(numbers)
+        if integer:
+            bad |= np.mod(numbers, 1) != 0
+        # NaN compares False, so missing values are only counted once
+        if low is not None:
+            bad |= numbers < low
+        if high is not None:
+            bad |= numbers > high
+        return bad
+
+    kind = "whole number" if integer else "number"
+    if low is not None and high is not None:
+        name = "%s is a %s from %s to %s" % (column, kind, low, high)
+    elif low is not None:
+        name = "%s is a %s of at least %s" % (column, kind, low)
+    else:
+        name = "%s is a %s" % (column, kind)
+    return Rule(name, [column], check)
+
+
+def genre_rule(column):
+    """
+    Every entry of column is a non-empty list of non-empty strings.
+    """
+    def is_genre(genre):
+        return isinstance(genre, str) and genre != ""
+
+    def check(values):
+        values = values.tolist()
+        if set(map(type, values)) == {list}:
+            bad = np.fromiter(map(len, values), dtype=np.int64,
+                              count=len(values)) == 0
+        else:
+            bad = np.array([type(genres) is not list or not genres
+                            for genres in values], dtype=bool)
+            values = [genres if type(genres) is list else []
+                      for genres in values]
+        # check each different genre once rather than every entry
+        try:
+            all_genres = all(map(is_genre, set(chain.from_iterable(values))))
+        except TypeError:
+            # something unhashable, so certainly not a genre
+            all_genres = False
+        if not all_genres:
+            bad |= np.array([not all(map(is_genre, genres))
+                             for genres in values], dtype=bool)
+        return bad
+
+    return Rule("%s is a list of genres" % column, [column], check)
+
+
+def order_rule(earlier, later):
+    """
+    The entry of column later is never less than the entry of column earlier.
+    Rows where either entry is missing are left to the other rules.
+    """
+    def check(earlier_values, later_values):
+        types = (int, float, np.integer, np.floating)
+        return _numbers(later_values, types) < _numbers(earlier_values, types)
+
+    return Rule("%s is not before %s" % (later, earlier), [earlier, later],
+                check)
+
+
+def _movie_rules(columns):
+    title, year, genres, rating, votes = columns
+    return [text_rule(title),
+            number_rule(year, FIRST_YEAR, LAST_YEAR, integer=True),
+            genre_rule(genres),
+            number_rule(rating, 1, 10),
+            number_rule(votes, 0, integer=True)]
+
+
+MOVIE_RULES = _movie_rules(MOVIE_COLUMNS[:5]) + \
+    _movie_rules(MOVIE_COLUMNS[5:]) + \
+    [order_rule(MOVIE_COLUMNS[1], MOVIE_COLUMNS[6])]
+
+
+def validate_movie_table(movie_data, rules=None):
+    """
+    Check the movie data against a list of rules.
+
+    Each rule checks whole columns at once, so even a table of millions of
+    movies is checked in well under a second.
+
+    Args:
+        movie_data::pandas DataFrame
+            The movie data, with the 10 columns in MOVIE_COLUMNS.
+        rules::list of Rule
+            Rules to check. Default is MOVIE_RULES: titles are text, years
+            are whole numbers from FIRST_YEAR to LAST_YEAR, genres are
+            non-empty lists of strings, ratings are from 1 to 10, votes are
+            whole numbers of at least 0 and no remake came out before its
+            original.
+    Returns:
+        report::dict
+            A dictionary whose keys are the names of the rules and whose
+            values are numpy arrays of the positions of the rows that break
+            each rule. Rules that every row follows have empty arrays.
+    """
+    if rules is None:
+        rules = MOVIE_RULES
+    report = {}
+    for rule in rules:
+        missing = [column for column in rule.columns
+                   if column not in movie_data.columns]
+        if missing:
+            # every row breaks a rule about a column that isn't there
+            report[rule.name] = np.arange(len(movie_data))
+            continue
+        bad = rule.check(*[movie_data[column] for column in rule.columns])
+        report[rule.name] = np.flatnonzero(bad)
+    return report
+
+
+def invalid_rows(report, n_rows):
+    """
+    Args:
+        report::dict
+            Report from validate_movie_table.
+        n_rows::int
+            Number of rows in the table that was checked.
+    Returns:
+        invalid::numpy array
+            Boolean array that is True for every row that breaks any rule.
+    """
+    invalid = np.zeros(n_rows, dtype=bool)
+    for rows in report.values():
+        invalid[rows] = True
+    return invalid
+
+
+def format_report(report, limit=10):
+    """
+    Describe the broken rules of a report, listing at most limit rows each.
+
+    Args:
+        report::dict
+            Report from validate_movie_table.
+        limit::int
+            Most rows to list for each rule.
+    Returns:
+        text::str
+            One line for each broken rule, or "" if every rule was followed.
+    """
+    lines = []
+    for name, rows in report.items():
+        if len(rows):
+            listed = ", ".join(str(row) for row in rows[:limit])
+            more = ", ..." if len(rows) > limit else ""
+            lines.append("%s: %d rows fail (%s%s)"
+                         % (name, len(rows), listed, more))
+    return "\n".join(lines)
+
+
+def save_report(report, path):
+    """
+    Save a report from validate_movie_table as json.
+
+    Args:
+        report::dict
+            Report from validate_movie_table.
+        path::str
+            File to save the report in.
+    """
+    with open(path, "w") as f:
+        json.dump({name: rows.tolist() for name, rows in report.items()}, f,
+                  indent=1)
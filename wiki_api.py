@@ -0,0 +1,167 @@
+import json
+import re
+from urllib.parse import unquote, urlencode, urlsplit
+
+API_URL = "https://en.wikipedia.org/w/api.php"
+WIKIDATA_API_URL = "https://www.wikidata.org/w/api.php"
+
+# most titles or ids the APIs accept in one request
+API_BATCH_SIZE = 50
+
+_IMDB_TITLE = re.compile(r"imdb\.com/title/tt(\d+)")
+
+
+def link_title(wiki_link):
+    """
+    Get the title of a Wikipedia article from its url.
+
+    Args:
+        wiki_link::str
+            Url of the article, such as
+            "https://en.wikipedia.org/wiki/The_Thing_(1982_film)".
+    Returns:
+        title::str
+            Title of the article, such as "The Thing (1982 film)".
+    """
+    path = urlsplit(wiki_link).path
+    return unquote(path.split("/wiki/", 1)[-1]).replace("_", " ")
+
+
+def _get_json(fetcher, api_url, params):
+    page = fetcher.get(api_url + "?" + urlencode(params))
+    if page.status_code != 200:
+        return None
+    try:
+        return json.loads(page.text)
+    except ValueError:
+        return None
+
+
+def _query_titles(fetcher, api_url, titles):
+    """
+    Ask the Wikipedia API for the IMDb links and Wikidata id of up to
+    API_BATCH_SIZE articles. Returns a dictionary from each title that was
+    asked for to the IMDb numbers linked from its article and its Wikidata id.
+    """
+    params = {"action": "query", "format": "json", "formatversion": "2",
+              "redirects": "1", "prop": "extlinks|pageprops",
+              "ppprop": "wikibase_item", "elprotocol": "https",
+              "elquery": "www.imdb.com/title/", "ellimit": "max",
+              "titles": "|".join(titles)}
+    renamed = {}
+    pages = {}
+    while True:
+        data = _get_json(fetcher, api_url, params)
+        if data is None:
+            break
+        query = data.get("query", {})
+        # the api tidies up titles and follows redirects, so remember what
+        # each title turned into
+        for change in query.get("normalized", []) + \
+                query.get("redirects", []):
+            renamed[change["from"]] = change["to"]
+        for page in query.get("pages", []):
+            found = pages.setdefault(page["title"], {"numbers": [],
+                                                     "wikidata": None})
+            for link in page.get("extlinks", []):
+                match = _IMDB_TITLE.search(link["url"])
+                if match and match.group(1) not in found["numbers"]:
+                    found["numbers"].append(match.group(1))
+            wikidata = page.get("pageprops", {}).get("wikibase_item")
+            if wikidata:
+                found["wikidata"] = wikidata
+        # long lists of links come back over several responses
+        if "continue" not in data:
+            break
+        params.update(data["continue"])
+
+    results = {}
+    for title in titles:
+        final_title = title
+        # a title can be normalized and then redirected
+        for step in range(3):
+            final_title = renamed.get(final_title, final_title)
+        if final_title in pages:
+            results[title] = pages[final_title]
+    return results
+
+
+def _query_wikidata(fetcher, wikidata_url, ids):
+    """
+    Ask the Wikidata API for the IMDb number (property P345) of up to
+    API_BATCH_SIZE items.
+    """
+    params = {"action": "wbgetentities", "format": "json",
+              "props": "claims", "ids": "|".join(ids)}
+    data = _get_json(fetcher, wikidata_url, params)
+    if data is None:
+        return {}
+    numbers = {}
+    for item_id, entity in data.get("entities", {}).items():
+        for claim in entity.get("claims", {}).get("P345", []):
+            value = claim.get("mainsnak", {}).get("datavalue", {})
+            match = re.fullmatch(r"tt(\d+)", str(value.get("value", "")))
+            if match:
+                numbers[item_id] = match.group(1)
+                break
+    return numbers
+
+
+def resolve_imdb_numbers(wiki_links, fetcher, api_url=None,
+                         wikidata_url=None, batch_size=API_BATCH_SIZE):
+    """
+    Find the IMDb numbers of Wikipedia articles through the Wikipedia API,
+    looking up many articles per request.
+
+    An article that links to exactly one IMDb movie page gets that movie's
+    number. Otherwise the IMDb number is taken from the article's Wikidata
+    item. Articles that can't be resolved either way are left out, so they
+    can be read the usual way instead.
+
+    Args:
+        wiki_links::iterable of str
+            Urls of Wikipedia articles.
+        fetcher::PageFetcher
+            Fetcher used to send the API requests.
+        api_url::str
+            Url of the Wikipedia API. Default is API_URL.
+        wikidata_url::str
+            Url of the Wikidata API. Default is WIKIDATA_API_URL.
+        batch_size::int
+            Number of articles looked up per request.
+    Returns:
+        imdb_numbers::dict
+            A dictionary whose keys are the urls of the resolved articles and
+            whose values are their IMDb numbers.
+    """
+    api_url = api_url or API_URL
+    wikidata_url = wikidata_url or WIKIDATA_API_URL
+
+    # several urls can point to the same article
+    titles = {}
+    for wiki_link in dict.fromkeys(wiki_links):
+        if wiki_link != "NONE":
+            titles.setdefault(link_title(wiki_link), []).append(wiki_link)
+    title_list = list(titles)
+
+    title_numbers = {}
+    wikidata_titles = {}
+    for start in range(0, len(title_list), batch_size):
+        batch = title_list[start:start + batch_size]
+        for title, found in _query_titles(fetcher, api_url, batch).items():
+            if len(found["numbers"]) == 1:
+                title_numbers[title] = found["numbers"][0]
+            elif found["wikidata"]:
+                wikidata_titles.setdefault(found["wikidata"], []).append(title)
+
+    # fall back to wikidata for articles without exactly one imdb link
+    wikidata_ids = list(wikidata_titles)
+    for start in range(0, len(wikidata_ids), batch_size):
+        batch = wikidata_ids[start:start + batch_size]
+        for item_id, number in _query_wikidata(fetcher, wikidata_url,
+                                               batch).items():
+            for title in wikidata_titles.get(item_id, []):
+                title_numbers[title] = number
+
+    return {wiki_link: number for title, number in title_numbers.items()
+            for wiki_link in titles[title]}
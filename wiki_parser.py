@@ -0,0 +1,135 @@
+import re
+from importlib.util import find_spec
+
+# lxml is much faster than python's html parser, but optional
+HTML_PARSER = "lxml" if find_spec("lxml") else "html.parser"
+
+IMDB_TITLE_URL = "https://www.imdb.com/title/"
+
+# pieces of an <a> tag
+_CLASS = re.compile(r"""\sclass\s*=\s*(["'])external text\1""")
+_HREF = re.compile(r"""\shref\s*=\s*(["'])(.*?)\1""", re.DOTALL)
+
+
+def find_imdb_number(page_html):
+    """
+    Find the IMDb number in the html of a movie's Wikipedia page.
+
+    Looks for the last link with class "external text" to an IMDb movie page,
+    which is the link in the "External links" section at the bottom of the
+    page. Instead of parsing the whole page, the raw html is searched from the
+    end for IMDb urls, and only the tags around them are read.
+
+    Args:
+        page_html::str
+            Raw html of the Wikipedia page.
+    Returns:
+        imdb_number::str
+            The IMDb number of the movie, or "NONE" if the page does not link
+            to an IMDb movie page.
+    """
+    end = len(page_html)
+    while True:
+        # find the last imdb url before end
+        position = page_html.rfind(IMDB_TITLE_URL, 0, end)
+        if position == -1:
+            return "NONE"
+        end = position
+
+        # find the tag the url is in, and check it is an external link
+        tag_start = page_html.rfind("<", 0, position)
+        tag_end = page_html.find(">", position)
+        if tag_start == -1 or tag_end == -1:
+            continue
+        tag = page_html[tag_start:tag_end + 1]
+        if not (tag[:3].lower() == "<a " or tag[:3].lower() == "<a\n"):
+            continue
+        href = _HREF.search(tag)
+        if _CLASS.search(tag) and href and IMDB_TITLE_URL in href.group(2):
+            # find the unique imdb number within url
+            return re.search(r"\d+", href.group(2)).group()
+
+
+def find_imdb_numbers(pages_html):
+    """
+    Find the IMDb numbers in the html of many Wikipedia pages.
+
+    Args:
+        pages_html::list of str
+            Raw html of the Wikipedia pages.
+    Returns:
+        imdb_numbers::list of str
+            The IMDb number found on each page, or "NONE".
+    """
+    return [find_imdb_number(page_html) for page_html in pages_html]
+
+
+def parse_remake_tables(page_html):
+    """
+    Read the tables of movies on a "List of film remakes" page.
+
+    Only the tables of the page are parsed, everything else is skipped.
+
+    Args:
+        page_html::str
+            Raw html of the Wikipedia page.
+    Returns:
+        tables::list
+            Beautiful soup objects of every table on the page.
+    """
+    # beautiful soup is only imported once a page needs parsing
+    from bs4 import BeautifulSoup as soup, SoupStrainer
+
+    tables = soup(page_html, HTML_PARSER, parse_only=SoupStrainer("table"))
+    return tables.find_all("table")
+
+
+def _article_links(tag):
+    # links to Wikipedia articles, leaving out footnotes and missing articles
+    hrefs = [link.get("href") or "" for link in tag.find_all("a")]
+    return list(dict.fromkeys(href for href in hrefs
+                              if href.startswith("/wiki/")))
+
+
+def find_remake_links(table):
+    """
+    Find the original movie and every remake in each row of a table of
+    remakes.
+
+    The first cell of a row holds the original movie, and every article
+    linked in the other cells is one of its remakes. When the original's cell
+    spans several rows, the remakes in all of those rows belong to it. Rows
+    with a single cell take their first link as the original and any other
+    links as remakes.
+
+    Args:
+        table::beautiful soup Tag
+            A table from parse_remake_tables. Its first row is the header.
+    Returns:
+        rows::list of tuple
+            For each row, the link of the original movie (or None) and the
+            list of links of its remakes. Links are relative to
+            https://en.wikipedia.org.
+    """
+    rows = []
+    spanned = 0
+    for row in table.find_all("tr")[1:]:
+        cells = row.find_all(["td", "th"], recursive=False)
+        if spanned and rows:
+            # the original's cell from an earlier row covers this one
+            spanned -= 1
+            rows.append((rows[-1][0], _article_links(row)))
+            continue
+        if len(cells) > 1:
+            links = _article_links(cells[0])
+            original = links[0] if links else None
+            remakes = [link for cell in cells[1:]
+                       for link in _article_links(cell)]
+            rowspan = cells[0].get("rowspan", "1")
+            spanned = int(rowspan) - 1 if rowspan.isdigit() else 0
+        else:
+            links = _article_links(row)
+            original = links[0] if links else None
+            remakes = links[1:]
+        rows.append((original, remakes))
+    return rows